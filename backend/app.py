@@ -2,142 +2,454 @@
 
 import logging
 import os
-from fastapi import FastAPI, HTTPException, Depends
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List
-from .value import MarketValueService # <-- NUEVO IMPORT
+from typing import List, Optional
+from pydantic import BaseModel
 
 # Importa la configuración de BD (get_db, SessionLocal)
-from .db import get_db, SessionLocal
-# Importa el servicio de similitud
-from .similarity import SimilarityService
+from .db import get_db, SessionLocal, async_engine, pool_stats, PLAYERS_VIEW
+from .neighbors import PlayerFilters
+from .cache import cache_stats, data_version, market_version, player_details_cache
+from . import metrics
+from .search import PlayerSearchIndex, fallback_search_sql
+from .responses import ORJSONResponse, preferred_format, rows_response
+from .http_cache import cache_headers, is_not_modified, make_etag, newest, not_modified
+from .lifecycle import ArtifactWatcher, LazyService, Readiness, ServiceUnavailable
+from .pagination import (
+    CURSOR_RESTARTED_HEADER, NAME_ID_AFTER, NEXT_CURSOR_HEADER, decode_cursor,
+    decode_cursor_kind, encode_cursor, name_id_params, page_limit, split_page,
+)
 
 # Configura logging básico
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
 # --- Carga de Modelos ---
-log.info("Iniciando API y cargando modelos...")
-try:
-    similarity_service = SimilarityService(db_session_factory=SessionLocal)
-    log.info("Servicio de similitud cargado exitosamente.")
-except Exception as e:
-    log.error(f"Error fatal: No se pudo cargar el SimilarityService: {e}")
-    raise
-
-try:
-    value_service = MarketValueService()
-    log.info("Servicio de oportunidades de mercado cargado exitosamente.")
-except Exception as e:
-    log.error(f"Error: No se pudo cargar el MarketValueService: {e}")
-    # Nota: No lanzamos 'raise' aquí para que la API
-    # pueda funcionar incluso si este servicio falla.
-    value_service = None # Lo dejamos como None
+# Los servicios se construyen en segundo plano (ver backend/lifecycle.py):
+# el import no carga modelos, uvicorn hace bind enseguida y un error de
+# carga se responde con 503 en vez de matar el proceso.
+
+def _load_similarity():
+    from .similarity import SimilarityService
+    return SimilarityService(db_session_factory=SessionLocal)
+
+def _load_market_value():
+    from .value import MarketValueService
+    return MarketValueService()
+
+def _load_value_predictor():
+    from .value import ValuePredictor
+    return ValuePredictor()
+
+# Rutas de artefactos sin instanciar (el watcher reintenta un servicio que no cargó)
+def _similarity_artifacts():
+    from .similarity import SimilarityService
+    return SimilarityService.artifact_paths()
+
+def _market_value_artifacts():
+    from .value import MarketValueService
+    return MarketValueService.artifact_paths()
+
+def _value_predictor_artifacts():
+    from .value import ValuePredictor
+    return ValuePredictor.artifact_paths()
+
+similarity_loader = LazyService("similarity", _load_similarity, artifacts=_similarity_artifacts)
+# Opcional: la API funciona aunque este servicio falle
+value_loader = LazyService("market_value", _load_market_value, required=False,
+                           artifacts=_market_value_artifacts)
+predictor_loader = LazyService("value_model", _load_value_predictor, required=False,
+                               artifacts=_value_predictor_artifacts)
+model_loaders = [similarity_loader, value_loader, predictor_loader]
+
+# Índice de búsqueda por nombre (se construye en el warm-up o en la primera búsqueda)
+search_index = PlayerSearchIndex(db_session_factory=SessionLocal)
+
+
+def _warm_similarity():
+    similarity_loader.get().searcher.search(0, 5)
+
+def _warm_search_index():
+    with SessionLocal() as db:
+        search_index.search(db, "a", 1)
+
+readiness = Readiness(
+    model_loaders,
+    session_factory=SessionLocal,
+    warmups=[
+        ("data_version", data_version.token),
+        ("similarity", _warm_similarity),
+        ("search_index", _warm_search_index),
+    ],
+)
+
+# Recarga en caliente cuando los scripts de build reescriben models/
+artifact_watcher = ArtifactWatcher(model_loaders)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log.info("Iniciando API; modelos cargando en segundo plano...")
+    readiness.start()
+    artifact_watcher.start()
+    yield
+
 
 app = FastAPI(
     title="TPO Futbol API",
-    description="API para búsqueda de jugadores y similitud."
+    description="API para búsqueda de jugadores y similitud.",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
+
+metrics.COLLECTORS.append(metrics.cache_collector(cache_stats))
+metrics.COLLECTORS.append(metrics.pool_collector(pool_stats))
+
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    # Latencia por plantilla de ruta (no por URL: acota la cardinalidad)
+    # más el desglose por etapa que acumulan db/knn/serialize durante el request
+    stages = metrics.start_request()
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.finish_request(request.method, path, status, time.perf_counter() - t0, stages)
+
+
+@app.exception_handler(ServiceUnavailable)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailable):
+    return ORJSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "5"})
+
+
+# Variantes async (/async/...) si hay engine asyncpg; si no, sólo el camino sync
+if async_engine is not None:
+    from .async_api import build_async_router
+    app.include_router(build_async_router(similarity_loader, search_index))
+    log.info("Endpoints async montados en /async.")
+
 # --- Endpoints ---
 
 @app.get("/")
 def read_root():
     return {"status": "API de Similitud de Jugadores está en línea"}
 
+@app.get("/healthz")
+def healthz():
+    """
+    Liveness: el proceso responde (no mira modelos ni BD).
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """
+    Readiness: modelos cargados, BD alcanzable y primera consulta hecha.
+    503 mientras no esté listo (el balanceador no le manda tráfico).
+    """
+    readiness.start()
+    status = readiness.status()
+    return ORJSONResponse(status, status_code=200 if status["ready"] else 503)
+
 @app.get("/players/search")
 def search_players(
+    request: Request,
     query: str,
     limit: int = 10,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Busca jugadores por nombre (usa 'v_players_union_with_sort')
+    Busca jugadores por nombre con el índice en memoria (sin acentos,
+    ordenado por relevancia y valor de mercado). Si el índice no está
+    disponible, cae a la consulta ILIKE sobre PLAYERS_VIEW.
+    Paginado por cursor: la página siguiente se pide con el header X-Next-Cursor.
+    El índice y el SQL tienen cursores propios; si llega el del otro motor
+    (el índice se cayó o volvió) se reinicia en la página 1 con el header
+    X-Cursor-Restarted.
     """
+    limit = page_limit(limit)
     try:
-        # CORREGIDO: Usa 'v_players_union_with_sort' y las columnas 'player_id', 'player_name', 'Pos'
-        # Renombramos las columnas en la consulta para que la API sea consistente
-        sql = text("""
-            SELECT DISTINCT 
-                player_id AS player_uuid, 
-                player_name AS full_name, 
-                Pos AS primary_position 
-            FROM v_players_union_with_sort 
-            WHERE player_name ILIKE :query 
-            LIMIT :limit
-        """)
-        result = db.execute(sql, {"query": f"%{query}%", "limit": limit})
-        return result.mappings().all()
+        kind, values = decode_cursor_kind(cursor, ("search", "search_sql")) if cursor else (None, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        after = values if kind == "search" else None
+        players, last_key = search_index.search_page(db, query, limit, after)
+        headers = {NEXT_CURSOR_HEADER: encode_cursor("search", last_key)} if last_key else {}
+        if kind == "search_sql":
+            headers[CURSOR_RESTARTED_HEADER] = "1"
+        return rows_response(request, players, headers=headers)
+    except Exception as e:
+        log.error(f"Índice de búsqueda no disponible, usando SQL: {e}")
+        db.rollback()
+
+    # Fallback SQL: keyset sobre (player_name, player_id), cursor propio
+    try:
+        params = name_id_params(cursor, "search_sql") if kind == "search_sql" else {}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        sql = fallback_search_sql(keyset=bool(params))
+        result = db.execute(sql, {"query": f"%{query}%", "limit": limit + 1, **params})
+        players, headers = split_page(result.mappings().all(), limit, "search_sql")
+        if kind == "search":
+            headers[CURSOR_RESTARTED_HEADER] = "1"
+        return rows_response(request, players, headers=headers)
     except Exception as e:
         log.error(f"Error en search_players: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/player/{player_uuid}/details")
 def get_player_details(
+    request: Request,
     player_uuid: str, # <-- 1. Se quitó el parámetro 'season'
     db: Session = Depends(get_db)
 ):
     """
-    Obtiene los detalles de UN jugador (usa 'v_players_union_with_sort')
+    Obtiene los detalles de UN jugador (usa PLAYERS_VIEW)
     Devuelve TODAS las temporadas disponibles para ese jugador.
+    Responde 304 si el ETag (versión de datos) no cambió.
     """
+    etag = make_etag(data_version.token(db), preferred_format(request))
+    headers = {**cache_headers(etag, data_version.updated_at), "Vary": "Accept"}
+    if is_not_modified(request, etag, data_version.updated_at):
+        return not_modified(headers)
+
     try:
         # 2. CORREGIDO: Se quitó el filtro 'season_code'
-        sql = text("""
-            SELECT * FROM v_players_union_with_sort 
+        sql = text(f"""
+            SELECT * FROM {PLAYERS_VIEW} 
             WHERE player_id = :uuid
             ORDER BY season_code DESC
         """) # <-- Se agregó un ORDER BY para que la más reciente venga primero
         
         # 3. Se quita 'season' de los parámetros
         # 4. Usamos .all() para devolver una lista con todas sus temporadas
-        stats = db.execute(sql, {"uuid": player_uuid}).mappings().all()
+        # 5. Caché por versión de datos: sólo se consulta la BD en un miss
+        cache_key = (data_version.current(db), player_uuid)
+        stats = player_details_cache.get(cache_key)
+        if stats is None:
+            stats = [dict(r) for r in db.execute(sql, {"uuid": player_uuid}).mappings().all()]
+            player_details_cache.set(cache_key, stats)
         
         if not stats:
             raise HTTPException(status_code=404, detail="Estadísticas no encontradas")
         
-        return stats
+        return rows_response(request, stats, headers=headers)
     except Exception as e:
         log.error(f"Error en get_player_details: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/player/{player_uuid}/similar")
 def get_similar_players(
+    request: Request,
     player_uuid: str, # Este es el 'player_id'
     n: int = 5,
+    league: Optional[str] = None,
+    min_age: Optional[float] = None,
+    max_age: Optional[float] = None,
+    max_value: Optional[float] = None,
+    position: Optional[str] = None,
 ):
     """
     Encuentra jugadores similares.
+    Filtros opcionales (liga, edad, valor máximo, posición) aplicados antes del ranking.
+    El ETag combina la versión de datos y la huella de los artefactos del modelo.
     """
     if n > 20:
         raise HTTPException(status_code=400, detail="No se pueden pedir más de 20 similares")
+
+    similarity_service = similarity_loader.get()
+    etag = make_etag(data_version.token(), similarity_service.fingerprint, preferred_format(request))
+    last_modified = newest(data_version.updated_at, similarity_service.modified_at)
+    headers = {**cache_headers(etag, last_modified), "Vary": "Accept"}
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(headers)
         
     try:
         similar_players = similarity_service.find_similar_players(
             target_player_uuid=player_uuid, # Pasamos el ID al servicio
-            n_similar=n
+            n_similar=n,
+            filters=PlayerFilters(
+                league=league, min_age=min_age, max_age=max_age,
+                max_value=max_value, position=position,
+            ),
         )
-        return similar_players
+        return rows_response(request, similar_players, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         log.error(f"Error en get_similar_players: {e}")
         if "no encontrado en el índice" in str(e):
             raise HTTPException(status_code=404, detail=str(e))
         raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+
+
+class SimilarBatchRequest(BaseModel):
+    player_uuids: List[str]
+    n: int = 5
+    league: Optional[str] = None
+    min_age: Optional[float] = None
+    max_age: Optional[float] = None
+    max_value: Optional[float] = None
+    position: Optional[str] = None
+
+
+@app.post("/players/similar:batch")
+def get_similar_players_batch(body: SimilarBatchRequest):
+    """
+    Encuentra jugadores similares para una lista de jugadores en una sola llamada.
+    """
+    if body.n > 20:
+        raise HTTPException(status_code=400, detail="No se pueden pedir más de 20 similares")
+    if len(body.player_uuids) > 200:
+        raise HTTPException(status_code=400, detail="No se pueden pedir más de 200 jugadores por lote")
+
+    similarity_service = similarity_loader.get()
+    try:
+        results, not_found = similarity_service.find_similar_players_batch(
+            target_player_uuids=body.player_uuids,
+            n_similar=body.n,
+            filters=PlayerFilters(
+                league=body.league, min_age=body.min_age, max_age=body.max_age,
+                max_value=body.max_value, position=body.position,
+            ),
+        )
+        return ORJSONResponse({"results": results, "not_found": not_found})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        log.error(f"Error en get_similar_players_batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
     
 
+@app.get("/player/{player_uuid}/predicted-value")
+def get_predicted_value(player_uuid: str):
+    """
+    Valor de mercado predicho por el modelo de valor para cualquier
+    jugador indexado (más el valor real y la diferencia si se conocen).
+    """
+    similarity_service = similarity_loader.get()
+    predictor = predictor_loader.get()
+    try:
+        results, not_found = predictor.predict(
+            similarity_service.index, [player_uuid], data_version.token(),
+            attributes=similarity_service.attributes,
+            features_fingerprint=similarity_service.fingerprint,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not_found:
+        raise HTTPException(status_code=404, detail=f"Jugador {player_uuid} no encontrado en el índice del modelo")
+    return results[0]
+
+
+class PredictValueRequest(BaseModel):
+    player_uuids: List[str]
+
+
+@app.post("/predict-value")
+def predict_value_batch(body: PredictValueRequest):
+    """
+    Valor predicho para una lista de jugadores: una sola inferencia del
+    forest para todo el lote (los ya calculados salen de la memo).
+    """
+    if len(body.player_uuids) > 500:
+        raise HTTPException(status_code=400, detail="No se pueden pedir más de 500 jugadores por lote")
+    similarity_service = similarity_loader.get()
+    predictor = predictor_loader.get()
+    try:
+        results, not_found = predictor.predict(
+            similarity_service.index, body.player_uuids, data_version.token(),
+            attributes=similarity_service.attributes,
+            features_fingerprint=similarity_service.fingerprint,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return ORJSONResponse({"results": results, "not_found": not_found})
+
+
+@app.post("/admin/reload")
+def reload_models(
+    service: Optional[str] = None,
+    force: bool = False,
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    """
+    Carga los artefactos nuevos de models/ en segundo plano, los valida
+    y los pone en servicio sin cortar requests (requiere ADMIN_TOKEN).
+    force=true acepta un cambio en la lista de features. Cada servicio se
+    recarga por separado: uno rechazado no frena al resto y sigue con su
+    set anterior. Responde 409 si alguno falló, con el detalle en `failed`.
+    """
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Requiere X-Admin-Token (variable ADMIN_TOKEN).")
+    loaders = {l.name: l for l in model_loaders}
+    if service is not None and service not in loaders:
+        raise HTTPException(status_code=404, detail=f"Servicio desconocido: {service}")
+
+    results, failed = [], []
+    for name, loader in loaders.items():
+        if service is not None and name != service:
+            continue
+        try:
+            results.append(loader.reload(force=force))
+        except ValueError as e:
+            failed.append({"service": name, "error": str(e)})
+    return ORJSONResponse({"reloaded": results, "failed": failed}, status_code=409 if failed else 200)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Latencias por endpoint y etapa, SQL, checkout del pool y cachés en
+    formato de texto de Prometheus.
+    """
+    return Response(metrics.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """
+    Contadores de la caché en proceso (hits/misses/evictions por caché).
+    """
+    return cache_stats()
+
+
 @app.get("/leagues")
-def get_leagues(db: Session = Depends(get_db)):
+def get_leagues(request: Request, db: Session = Depends(get_db)):
     """
     Obtiene una lista de todas las ligas únicas desde la vista v_leagues.
+    Responde 304 si el ETag (versión de datos) no cambió.
     """
+    etag = make_etag(data_version.token(db))
+    headers = cache_headers(etag, data_version.updated_at)
+    if is_not_modified(request, etag, data_version.updated_at):
+        return not_modified(headers)
+
     try:
         # 1. Llama a la vista v_leagues que ya creaste
         sql = text("SELECT league_name FROM v_leagues ORDER BY league_name")
         result = db.execute(sql)
         
         # 2. Devuelve una lista simple de strings (nombres de ligas)
-        return [row['league_name'] for row in result.mappings().all()]
+        return ORJSONResponse([row['league_name'] for row in result.mappings().all()], headers=headers)
     
     except Exception as e:
         log.error(f"Error en get_leagues: {e}")
@@ -146,12 +458,19 @@ def get_leagues(db: Session = Depends(get_db)):
 
 @app.get("/leagues/{league_name}/clubs")
 def get_clubs_by_league(
+    request: Request,
     league_name: str,
     db: Session = Depends(get_db)
 ):
     """
     Obtiene los clubes de una liga específica desde la vista v_clubs_by_league.
+    Responde 304 si el ETag (versión de datos) no cambió.
     """
+    etag = make_etag(data_version.token(db))
+    headers = cache_headers(etag, data_version.updated_at)
+    if is_not_modified(request, etag, data_version.updated_at):
+        return not_modified(headers)
+
     try:
         # 1. Llama a la NUEVA vista v_clubs_by_league filtrando
         sql = text("""
@@ -171,7 +490,7 @@ def get_clubs_by_league(
             # Por ahora, solo devolvemos lista vacía.
             log.warning(f"No se encontraron clubes para la liga: {league_name}")
         
-        return clubs
+        return ORJSONResponse(clubs, headers=headers)
         
     except Exception as e:
         log.error(f"Error en get_clubs_by_league: {e}")
@@ -179,34 +498,49 @@ def get_clubs_by_league(
     
 @app.get("/clubs/{club_name}/players")
 def get_players_by_club(
+    request: Request,
     club_name: str,
+    limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     Obtiene la lista de jugadores de un club específico.
-    Usa la misma vista 'v_players_union_with_sort'.
+    Usa la misma vista materializada (PLAYERS_VIEW).
+    Paginado por cursor sobre (player_name, player_id): la página
+    siguiente se pide con el header X-Next-Cursor.
     """
+    limit = page_limit(limit)
+    try:
+        params = name_id_params(cursor, "club_players")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         # Usamos la misma lógica del endpoint /search
-        # para devolver un formato consistente
-        sql = text("""
-            SELECT DISTINCT 
+        # para devolver un formato consistente (un jugador por fila)
+        sql = text(f"""
+            SELECT 
                 player_id AS player_uuid, 
                 player_name AS full_name, 
-                Pos AS primary_position 
-            FROM v_players_union_with_sort 
+                MIN(Pos) AS primary_position 
+            FROM {PLAYERS_VIEW} 
             WHERE club ILIKE :club_name 
-            ORDER BY player_name
+              AND player_name IS NOT NULL
+            {NAME_ID_AFTER if params else ""}
+            GROUP BY player_name, player_id
+            ORDER BY player_name, player_id
+            LIMIT :limit
         """)
         
-        result = db.execute(sql, {"club_name": club_name})
-        players = result.mappings().all()
+        result = db.execute(sql, {"club_name": club_name, "limit": limit + 1, **params})
+        players, headers = split_page(result.mappings().all(), limit, "club_players")
         
         if not players:
             log.warning(f"No se encontraron jugadores para el club: {club_name}")
             # No es un error, puede ser un club sin jugadores en la vista
         
-        return players
+        return rows_response(request, players, headers=headers)
         
     except Exception as e:
         log.error(f"Error en get_players_by_club: {e}")
@@ -214,24 +548,74 @@ def get_players_by_club(
     
 @app.get("/market-opportunities")
 def get_market_opportunities(
-    limit: int = 50
+    request: Request,
+    limit: int = 50,
+    league: Optional[str] = None,
+    position: Optional[str] = None,
+    min_age: Optional[float] = None,
+    max_age: Optional[float] = None,
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
+    min_matches: Optional[float] = None,
+    sort_by: str = "value_diff_eur",
+    order: str = "desc",
+    include_overvalued: bool = False,
+    cursor: Optional[str] = None,
 ):
     """
     Obtiene una lista de jugadores "infravalorados" (oportunidades de mercado)
     basado en un modelo de predicción de valor.
+    Filtra y ordena en memoria sobre toda la población puntuada
+    (sort_by: value_diff_eur | value_ratio | predicted_value_eur).
+    Paginado por cursor: la página siguiente se pide con el header X-Next-Cursor.
+    El cursor vale para la tabla con la que se emitió: tras una recarga de
+    los artefactos responde 409 (volver a pedir la primera página).
     """
-    if not value_service:
-        raise HTTPException(
-            status_code=503, 
-            detail="El servicio de oportunidades de mercado no está disponible."
-        )
-        
-    if limit > 200: # El script solo guarda 200
-        limit = 200
+    # 503 si el servicio todavía carga o falló (handler de ServiceUnavailable)
+    value_service = value_loader.get()
+
+    if order not in ("desc", "asc"):
+        raise HTTPException(status_code=400, detail="order debe ser 'desc' o 'asc'")
+    limit = page_limit(limit)
+    after = None
+    if cursor:
+        try:
+            values = decode_cursor(cursor, "market")
+            if len(values) != 4:
+                raise ValueError("Cursor inválido.")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        c_sort, c_order, c_fingerprint, after = values
+        if (c_sort, c_order) != (sort_by, order):
+            raise HTTPException(status_code=400, detail="El cursor es de otro orden.")
+        # La posición es de la permutación de esa tabla: con otra, salta o repite filas
+        if c_fingerprint != value_service.fingerprint:
+            raise HTTPException(status_code=409, detail="Las oportunidades se recalcularon; el cursor ya no es válido.")
+
+    # Versión escrita por build_market_opportunities.py + huella de los artefactos cargados
+    etag = make_etag(market_version.token(), value_service.fingerprint, preferred_format(request))
+    last_modified = newest(market_version.updated_at, value_service.modified_at)
+    headers = {**cache_headers(etag, last_modified), "Vary": "Accept"}
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(headers)
         
     try:
-        players = value_service.get_opportunities(limit=limit)
-        return players
+        players, last = value_service.query(
+            filters=PlayerFilters(
+                league=league, min_age=min_age, max_age=max_age, max_value=max_value,
+                position=position, min_value=min_value, min_matches=min_matches,
+            ),
+            sort_by=sort_by,
+            descending=order == "desc",
+            limit=limit,
+            undervalued_only=not include_overvalued,
+            after=after,
+        )
+        if last is not None:
+            headers[NEXT_CURSOR_HEADER] = encode_cursor("market", [sort_by, order, value_service.fingerprint, last])
+        return rows_response(request, players, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         log.error(f"Error en get_market_opportunities: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
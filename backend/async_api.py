@@ -0,0 +1,213 @@
+# backend/async_api.py
+# ============================================================
+# Variantes async de los endpoints de lectura (prefijo /async)
+# ------------------------------------------------------------
+# Mismas respuestas que los endpoints sync de app.py, pero con
+# AsyncSession (asyncpg): la espera del round trip a Postgres no ocupa
+# un hilo del threadpool de Starlette. Se montan sólo si db.py pudo
+# crear el engine async; si no, queda el camino sync como fallback.
+# ============================================================
+
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import data_version, player_details_cache
+from .db import PLAYERS_VIEW, get_async_db
+from .neighbors import PlayerFilters
+from .pagination import (
+    CURSOR_RESTARTED_HEADER, NAME_ID_AFTER, NEXT_CURSOR_HEADER, decode_cursor_kind,
+    encode_cursor, name_id_params, page_limit, split_page,
+)
+from .responses import ORJSONResponse, preferred_format, rows_response
+from .http_cache import cache_headers, is_not_modified, make_etag, newest, not_modified
+from .search import fallback_search_sql
+
+log = logging.getLogger(__name__)
+
+
+def build_async_router(similarity_loader, search_index) -> APIRouter:
+    router = APIRouter(prefix="/async", tags=["async"])
+
+    async def players_version(db) -> str:
+        # Token cacheado (304 sin ir a la BD); sólo la primera vez se lee en línea
+        return data_version.peek() or await data_version.current_async(db)
+
+    @router.get("/players/search")
+    async def search_players(request: Request, query: str, limit: int = 10,
+                             cursor: Optional[str] = None,
+                             db: AsyncSession = Depends(get_async_db)):
+        # Mismos cursores y fallback ILIKE que /players/search
+        limit = page_limit(limit)
+        try:
+            kind, values = decode_cursor_kind(cursor, ("search", "search_sql")) if cursor else (None, None)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            after = values if kind == "search" else None
+            players, last_key = await search_index.search_page_async(db, query, limit, after)
+            headers = {NEXT_CURSOR_HEADER: encode_cursor("search", last_key)} if last_key else {}
+            if kind == "search_sql":
+                headers[CURSOR_RESTARTED_HEADER] = "1"
+            return rows_response(request, players, headers=headers)
+        except Exception as e:
+            log.error(f"Índice de búsqueda no disponible, usando SQL (async): {e}")
+            await db.rollback()
+
+        try:
+            params = name_id_params(cursor, "search_sql") if kind == "search_sql" else {}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            result = await db.execute(fallback_search_sql(keyset=bool(params)),
+                                      {"query": f"%{query}%", "limit": limit + 1, **params})
+            players, headers = split_page(result.mappings().all(), limit, "search_sql")
+            if kind == "search":
+                headers[CURSOR_RESTARTED_HEADER] = "1"
+            return rows_response(request, players, headers=headers)
+        except Exception as e:
+            log.error(f"Error en search_players (async): {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @router.get("/player/{player_uuid}/details")
+    async def get_player_details(request: Request, player_uuid: str,
+                                 db: AsyncSession = Depends(get_async_db)):
+        sql = text(f"""
+            SELECT * FROM {PLAYERS_VIEW} 
+            WHERE player_id = :uuid
+            ORDER BY season_code DESC
+        """)
+        # asyncpg tipa el parámetro: player_id es bigint. Un id que no entra
+        # no existe (404, como un id desconocido), no es un error del server
+        try:
+            uuid = int(player_uuid)
+        except ValueError:
+            uuid = None
+        if uuid is None or not -2**63 <= uuid < 2**63:
+            raise HTTPException(status_code=404, detail="Estadísticas no encontradas")
+
+        etag = make_etag(await players_version(db), preferred_format(request))
+        headers = {**cache_headers(etag, data_version.updated_at), "Vary": "Accept"}
+        if is_not_modified(request, etag, data_version.updated_at):
+            return not_modified(headers)
+        try:
+            cache_key = (await data_version.current_async(db), player_uuid)
+            stats = player_details_cache.get(cache_key)
+            if stats is None:
+                result = await db.execute(sql, {"uuid": uuid})
+                stats = [dict(r) for r in result.mappings().all()]
+                player_details_cache.set(cache_key, stats)
+        except Exception as e:
+            log.error(f"Error en get_player_details (async): {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        if not stats:
+            raise HTTPException(status_code=404, detail="Estadísticas no encontradas")
+        return rows_response(request, stats, headers=headers)
+
+    @router.get("/player/{player_uuid}/similar")
+    async def get_similar_players(
+        request: Request,
+        player_uuid: str,
+        n: int = 5,
+        league: Optional[str] = None,
+        min_age: Optional[float] = None,
+        max_age: Optional[float] = None,
+        max_value: Optional[float] = None,
+        position: Optional[str] = None,
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        if n > 20:
+            raise HTTPException(status_code=400, detail="No se pueden pedir más de 20 similares")
+        similarity_service = await similarity_loader.get_async()
+        # Mismo ETag que /player/{id}/similar: versión de datos + huella del modelo
+        etag = make_etag(await players_version(db), similarity_service.fingerprint, preferred_format(request))
+        last_modified = newest(data_version.updated_at, similarity_service.modified_at)
+        headers = {**cache_headers(etag, last_modified), "Vary": "Accept"}
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(headers)
+        try:
+            similar_players = await similarity_service.find_similar_players_async(
+                db,
+                target_player_uuid=player_uuid,
+                n_similar=n,
+                filters=PlayerFilters(
+                    league=league, min_age=min_age, max_age=max_age,
+                    max_value=max_value, position=position,
+                ),
+            )
+            return rows_response(request, similar_players, headers=headers)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            log.error(f"Error en get_similar_players (async): {e}")
+            if "no encontrado en el índice" in str(e):
+                raise HTTPException(status_code=404, detail=str(e))
+            raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+
+    @router.get("/leagues")
+    async def get_leagues(request: Request, db: AsyncSession = Depends(get_async_db)):
+        etag = make_etag(await players_version(db))
+        headers = cache_headers(etag, data_version.updated_at)
+        if is_not_modified(request, etag, data_version.updated_at):
+            return not_modified(headers)
+        try:
+            result = await db.execute(text("SELECT league_name FROM v_leagues ORDER BY league_name"))
+            return ORJSONResponse([row["league_name"] for row in result.mappings().all()], headers=headers)
+        except Exception as e:
+            log.error(f"Error en get_leagues (async): {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @router.get("/leagues/{league_name}/clubs")
+    async def get_clubs_by_league(request: Request, league_name: str,
+                                  db: AsyncSession = Depends(get_async_db)):
+        sql = text("""
+            SELECT team_name 
+            FROM v_clubs_by_league 
+            WHERE league_name ILIKE :league
+            ORDER BY team_name
+        """)
+        etag = make_etag(await players_version(db))
+        headers = cache_headers(etag, data_version.updated_at)
+        if is_not_modified(request, etag, data_version.updated_at):
+            return not_modified(headers)
+        try:
+            result = await db.execute(sql, {"league": league_name})
+            return ORJSONResponse([row["team_name"] for row in result.mappings().all()], headers=headers)
+        except Exception as e:
+            log.error(f"Error en get_clubs_by_league (async): {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @router.get("/clubs/{club_name}/players")
+    async def get_players_by_club(request: Request, club_name: str, limit: int = 100,
+                                  cursor: Optional[str] = None,
+                                  db: AsyncSession = Depends(get_async_db)):
+        limit = page_limit(limit)
+        try:
+            params = name_id_params(cursor, "club_players")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        sql = text(f"""
+            SELECT 
+                player_id AS player_uuid, 
+                player_name AS full_name, 
+                MIN(Pos) AS primary_position 
+            FROM {PLAYERS_VIEW} 
+            WHERE club ILIKE :club_name 
+              AND player_name IS NOT NULL
+            {NAME_ID_AFTER if params else ""}
+            GROUP BY player_name, player_id
+            ORDER BY player_name, player_id
+            LIMIT :limit
+        """)
+        try:
+            result = await db.execute(sql, {"club_name": club_name, "limit": limit + 1, **params})
+            players, headers = split_page(result.mappings().all(), limit, "club_players")
+            return rows_response(request, players, headers=headers)
+        except Exception as e:
+            log.error(f"Error en get_players_by_club (async): {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return router
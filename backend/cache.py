@@ -0,0 +1,197 @@
+# backend/cache.py
+# ============================================================
+# Caché en proceso (LRU + TTL) para resultados de la BD
+# ------------------------------------------------------------
+#   - TTLCache: acotada por cantidad de entradas, expira por TTL,
+#     thread-safe y con contadores hits/misses/evictions.
+#   - DataVersion: token de versión de datos leído de la tabla
+#     `data_version` (lo escriben upload_mv_to_supabase.py y
+#     build_market_opportunities.py). Va en las claves de caché y en los
+#     ETags: una carga nueva invalida las entradas viejas.
+# ============================================================
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from .db import SessionLocal
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "4096"))
+DATA_VERSION_CHECK_SECONDS = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "30"))
+
+_MISSING = object()
+
+VERSION_SQL = text("SELECT version, updated_at FROM data_version WHERE source = :source")
+
+
+class TTLCache:
+    def __init__(self, name: str, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires, value = item
+                if expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class DataVersion:
+    """
+    Token de versión de los datos. Se consulta a la BD como mucho una vez
+    cada DATA_VERSION_CHECK_SECONDS; si la tabla no existe se usa "0"
+    (el TTL de la caché sigue acotando la antigüedad).
+    """
+
+    def __init__(self, source: str = "players", check_every: float = DATA_VERSION_CHECK_SECONDS,
+                 session_factory=SessionLocal):
+        self.source = source
+        self.check_every = check_every
+        self.session_factory = session_factory
+        self.updated_at = None      # epoch de la última carga (Last-Modified)
+        self._token = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def current(self, db) -> str:
+        now = time.monotonic()
+        if self._fresh():
+            return self._token
+        with self._lock:
+            if self._token is None or now - self._checked_at >= self.check_every:
+                self._token, self.updated_at = self._read(db)
+                self._checked_at = now
+            return self._token
+
+    def peek(self):
+        """
+        Último token leído sin tocar la BD en el request (None si nunca se
+        leyó). Si está vencido se refresca en segundo plano: sirve para
+        validar ETags y responder 304 sin abrir conexión.
+        """
+        token = self._token
+        if token is not None and not self._fresh():
+            self._refresh_in_background()
+        return token
+
+    def token(self, db=None) -> str:
+        """peek() y, si nunca se leyó, lectura en línea (con db o una sesión propia)."""
+        token = self.peek()
+        if token is not None:
+            return token
+        if db is None:
+            with self.session_factory() as own_db:
+                return self.current(own_db)
+        return self.current(db)
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or self.session_factory is None:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                with self.session_factory() as db:
+                    token, updated_at = self._read(db)
+                with self._lock:
+                    self._token, self.updated_at = token, updated_at
+                    self._checked_at = time.monotonic()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=_run, name=f"data-version-{self.source}", daemon=True).start()
+
+    def _fresh(self) -> bool:
+        return self._token is not None and time.monotonic() - self._checked_at < self.check_every
+
+    @staticmethod
+    def _parse(row):
+        if not row:
+            return "0", None
+        updated_at = row[1].timestamp() if row[1] is not None else None
+        return str(row[0]), updated_at
+
+    def _read(self, db):
+        try:
+            return self._parse(db.execute(VERSION_SQL, {"source": self.source}).first())
+        except Exception as e:
+            logging.warning(f"No se pudo leer data_version ({e}); usando versión '0'.")
+            db.rollback()
+            return "0", None
+
+    async def current_async(self, db) -> str:
+        """Igual que current() pero con una AsyncSession."""
+        if self._fresh():
+            return self._token
+        try:
+            token, updated_at = self._parse((await db.execute(VERSION_SQL, {"source": self.source})).first())
+        except Exception as e:
+            logging.warning(f"No se pudo leer data_version ({e}); usando versión '0'.")
+            await db.rollback()
+            token, updated_at = "0", None
+        self._token, self.updated_at, self._checked_at = token, updated_at, time.monotonic()
+        return token
+
+
+data_version = DataVersion()
+# Lista de oportunidades (la escribe build_market_opportunities.py)
+market_version = DataVersion("market_opportunities")
+
+# Detalles de jugador (todas las temporadas) por player_id: /player/{id}/details
+player_details_cache = TTLCache("player_details")
+# Filas resumidas por player_id que devuelve SimilarityService._get_details_for_uuids
+similar_details_cache = TTLCache("similar_details")
+# Valor predicho por player_id (ValuePredictor), con la versión de datos y artefactos en la clave
+predicted_value_cache = TTLCache("predicted_value")
+
+CACHES = [player_details_cache, similar_details_cache, predicted_value_cache]
+
+
+def cache_stats() -> dict:
+    return {c.name: c.stats() for c in CACHES}
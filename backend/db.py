@@ -3,10 +3,14 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.orm import sessionmaker
 from urllib.parse import quote_plus
+from uuid import uuid4
 import logging
 
+from .metrics import instrument_engine
+
 # Carga las variables de entorno (ej: desde el archivo .env)
 load_dotenv()
 
@@ -16,25 +20,160 @@ DB_NAME = os.getenv("DB_NAME", "postgres")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_SSLMODE = os.getenv("DB_SSLMODE", "require") # Fundamental para Supabase Pooler
+DB_ASYNC = os.getenv("DB_ASYNC", "1") == "1"   # endpoints /async/* con asyncpg
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+# Pool de conexiones:
+#   queue -> pool propio en la app (conexión directa, puerto 5432)
+#   null  -> sin pool en la app: el pooler de Supabase (pgbouncer en modo
+#            transacción, puerto 6543) ya multiplexa. Sin pre_ping (sería un
+#            round trip extra por checkout) y sin prepared statements de
+#            servidor (no sobreviven al cambio de conexión en pgbouncer).
+#   auto  -> null si DB_PORT es 6543, queue en otro caso.
+TRANSACTION_POOLER_PORT = "6543"
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "auto").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # segundos; -1 desactiva
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"   # sólo modo queue
+
+# Modo offline: DB_BACKEND=duckdb sirve todo el API desde el archivo que
+# arma scripts/build_duckdb.py (mismas tablas y vistas que Postgres).
+# Sólo lectura: varios workers pueden abrir el mismo archivo.
+DB_BACKEND = os.getenv("DB_BACKEND", "auto").lower()
+DUCKDB_PATH = os.getenv("DUCKDB_PATH", "data/tpo.duckdb")
+DUCKDB_READ_ONLY = os.getenv("DUCKDB_READ_ONLY", "1") == "1"
 
-if not all([DB_HOST, DB_USER, DB_PASSWORD]):
-    logging.warning("ADVERTENCIA: Faltan variables de BD. Usando DuckDB como fallback.")
-    DB_URL = "duckdb:///data/tpo.duckdb" # Fallback local
+ASYNC_DB_URL = None
+if DB_BACKEND == "duckdb" or not all([DB_HOST, DB_USER, DB_PASSWORD]):
+    if DB_BACKEND != "duckdb":
+        logging.warning("ADVERTENCIA: Faltan variables de BD. Usando DuckDB como fallback.")
+    DB_URL = f"duckdb:///{DUCKDB_PATH}" # Fallback local (scripts/build_duckdb.py)
 else:
     # Construye la URL de conexión robusta para PostgreSQL
     pwd = quote_plus(DB_PASSWORD)
     DB_URL = f"postgresql+psycopg2://{DB_USER}:{pwd}@{DB_HOST}:{DB_PORT}/{DB_NAME}?sslmode={DB_SSLMODE}"
+    # asyncpg no entiende ?sslmode=: el modo va en connect_args
+    ASYNC_DB_URL = f"postgresql+asyncpg://{DB_USER}:{pwd}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Fuente de lectura de jugadores. En Postgres, la vista de 005 (existe en
+# toda base); con database/schema/006_players_matview.sql aplicado,
+# PLAYERS_VIEW=mv_players_union_with_sort lee la vista materializada e
+# indexada. El archivo DuckDB (scripts/build_duckdb.py) siempre la trae.
+PLAYERS_MATVIEW = "mv_players_union_with_sort"
+PLAYERS_VIEW = os.getenv("PLAYERS_VIEW") or (
+    PLAYERS_MATVIEW if DB_URL.startswith("duckdb") else "v_players_union_with_sort"
+)
+
+
+
+def resolve_pool_mode(mode: str = None, port: str = None) -> str:
+    mode = (mode or DB_POOL_MODE).lower()
+    if mode == "auto":
+        return "null" if str(port or DB_PORT) == TRANSACTION_POOLER_PORT else "queue"
+    if mode not in ("queue", "null"):
+        raise ValueError(f"DB_POOL_MODE inválido: {mode!r} (auto|queue|null)")
+    return mode
+
+
+def pool_kwargs(mode: str) -> dict:
+    """Argumentos de create_engine/create_async_engine para cada modo de pool."""
+    if mode == "null":
+        return {"poolclass": NullPool, "pool_pre_ping": False}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def make_engine(url: str = None, mode: str = None, **overrides):
+    url = url or DB_URL
+    if url.startswith("duckdb"):
+        return create_engine(url, connect_args={"read_only": DUCKDB_READ_ONLY})
+    mode = resolve_pool_mode(mode)
+    kwargs = {**pool_kwargs(mode), **overrides}
+    # psycopg2 no usa prepared statements de servidor: sirve igual detrás de pgbouncer
+    return create_engine(url, connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}, **kwargs)
+
+
+def make_async_engine(url: str = None, mode: str = None):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = url or ASYNC_DB_URL
+    mode = resolve_pool_mode(mode)
+    connect_args = {"ssl": DB_SSLMODE, "timeout": DB_CONNECT_TIMEOUT}
+    if mode == "null":
+        # asyncpg prepara cada sentencia: con pgbouncer en modo transacción
+        # se desactiva su caché y se usan nombres únicos para no chocar
+        url = f"{url}?prepared_statement_cache_size=0"
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+    return create_async_engine(url, connect_args=connect_args, **pool_kwargs(mode))
+
+
+def pool_status(eng) -> dict:
+    """Estado del pool: tamaño, conexiones en uso, overflow actual."""
+    pool = eng.pool
+    if isinstance(pool, NullPool):
+        return {"mode": "null"}
+    if not isinstance(pool, QueuePool):
+        return {"mode": type(pool).__name__}
+    return {
+        "mode": "queue",
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # Negativo mientras no se llenó el pool base; > 0 son conexiones de overflow
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+    }
+
 
 # Crea el 'engine'
-engine = create_engine(DB_URL, pool_pre_ping=True)
+engine = make_engine(DB_URL)
+# Tiempo de SQL y de checkout del pool por request (/metrics)
+instrument_engine(engine, "sync")
 
 # Crea una fábrica de sesiones que usará la API
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine async (asyncpg). Si no hay Postgres o falta asyncpg queda en None
+# y el API sólo expone los endpoints sync.
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DB_URL and DB_ASYNC:
+    try:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+        async_engine = make_async_engine(ASYNC_DB_URL)
+        instrument_engine(async_engine.sync_engine, "async")
+        AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    except Exception as e:
+        logging.warning(f"ADVERTENCIA: No se pudo crear el engine async ({e}). Sólo camino sync.")
+        async_engine = None
+
+def pool_stats() -> dict:
+    """pool_status() de los engines del API (para /metrics)."""
+    stats = {"sync": pool_status(engine)}
+    if async_engine is not None:
+        stats["async"] = pool_status(async_engine.sync_engine)
+    return stats
+
 # Dependencia de FastAPI (para inyectar en los endpoints)
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependencia async: no ocupa un hilo del threadpool durante el round trip
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -6,7 +6,7 @@
 #   Extrae estadísticas de jugadores desde FBref (vía LanusStats),
 #   hace pre-limpieza/normalización, uniones seguras por "Player",
 #   agrega métricas de arqueros (keepers/keepersadv) y serializa:
-#   - data/raw/raw_merged_<SEASON>.parquet (merge “bruto”)
+#   - data/raw/raw_merged_<LEAGUE>_<SEASON>.parquet (merge “bruto”)
 #   - data/processed/player_stats_<LEAGUE>_<SEASON>.clean.(csv|parquet)
 #
 # Entradas (flags/env)
@@ -16,19 +16,25 @@
 #   --season  : temporada en el formato que FBref/LanusStats espera.
 #               OJO: FBref usa 'YYYY-YYYY' para ligas europeas (p.ej. '2024-2025').
 #               Para ligas calendario (ARG), suele ser '2024'.
+#   --refresh : ignora la caché de extracción y vuelve a scrapear.
+#   --offline : sólo caché (aunque haya vencido); error si no hay tablas.
+#   FBREF_CACHE_DIR / FBREF_CACHE_TTL_HOURS: ubicación y vigencia de la caché.
 #
 # Salidas
-#   data/raw/raw_merged_<SEASON>.parquet         (todas las tablas unidas “as-is”)
+#   data/raw/raw_merged_<LEAGUE>_<SEASON>.parquet (todas las tablas unidas “as-is”)
 #   data/processed/player_stats_<LEAGUE>_<SEASON>.clean.csv/parquet
 #   Columnas base (mapeadas): Player, Nation, Pos, Squad, Age, Born,
 #     MatchesPlayed, Gls, Ast, xG, xAG, Shots, SoT, PassCmp, PassAtt,
 #     PassCmpPct, Tkl, TklW, Blocks, Int, y métricas GK_* cuando existan.
 #
 # Flujo (resumen)
-#   1) EXTRAER: Fbref().get_all_player_season_stats(league, season)
+#   1) EXTRAER: Fbref().get_all_player_season_stats(league, season), vía la
+#      caché en disco de backend/extract_cache.py (data/cache/fbref): si las
+#      tablas están vigentes no se scrapea y el transform lee de ahí.
 #   2) PREP: aplanar columnas, normalizar clave JOIN (Player), de-duplicar,
 #      prefijar columnas para evitar choques y guardar raw_merged.
-#   3) UNIR: reduce() con merge seguro (evita colisiones de nombres).
+#   3) UNIR: alineación única de todas las tablas por Player (align_tables),
+#      con los choques de nombres resueltos antes (<col>__r).
 #   4) MAPEO: seleccionar/renombrar métricas clave; tipado numérico seguro.
 #   5) GK: detectar keepers* en raw y agregar métricas GK_* (con %/derivadas).
 #   6) NORMALIZAR: IsGK, AgeYears, recalcular PassCmpPct, cap SoT<=Shots.
@@ -48,23 +54,31 @@
 #
 #   Argentina 2024:
 #     python backend/etl.py --league "ARG1" --season "2024"
+#
+#   Re-correr sólo el transform tras un cambio de código (sin scrapear):
+#     python backend/etl.py --league "ARG1" --season "2024" --offline
 # ============================================================
 
 
 import os
+import sys
 import argparse
 import uuid
 from typing import Optional, List
 
-import LanusStats as ls
 import pandas as pd
 from pandas.api import types as ptypes
 from pathlib import Path
 from functools import reduce
 import numpy as np
-import unicodedata
 import re
 
+# backend/etl.py se corre como script: la raíz del repo al path para backend.*
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from backend.normalize import name_cache, normalize_series  # noqa: E402
+from backend.etl_types import ETL_SCHEMA, parse_typed  # noqa: E402
+from backend.extract_cache import ExtractCache, extract_cache, lanusstats_fetcher  # noqa: E402
+
 # --- CONFIG POR DEFECTO ---
 RAW_DATA_PATH = Path("data/raw")
 PROCESSED_DATA_PATH = Path("data/processed")
@@ -100,15 +114,8 @@ USE_CLEAN_SUFFIX = True
 
 def normalize_key_series(s: pd.Series) -> pd.Series:
     """Normaliza la clave de unión: quita acentos, espacios extra y baja a minúsculas."""
-    def _norm(x):
-        if pd.isna(x):
-            return ""
-        x = str(x).strip()
-        x = "".join(ch for ch in x if ch.isprintable())
-        x = unicodedata.normalize("NFKD", x).encode("ascii", "ignore").decode("ascii")
-        x = re.sub(r"\s+", " ", x)
-        return x.lower()
-    return s.map(_norm)
+    # Un cálculo por nombre distinto, memo compartido en disco (backend/normalize.py)
+    return normalize_series(s, "key")
 
 
 def flatten_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -140,6 +147,15 @@ def ensure_unique(names):
     return result
 
 
+def major_prefix(columns) -> Optional[str]:
+    """Prefijo más frecuente ('stats', 'keepers', ...) entre columnas 'xxx_col'."""
+    prefixes = [re.match(r"([A-Za-z]+)_", c).group(1).lower()
+                for c in columns if re.match(r"([A-Za-z]+)_", c)]
+    if not prefixes:
+        return None
+    return max(set(prefixes), key=prefixes.count)
+
+
 def add_df_prefix(df: pd.DataFrame, prefix: str, keep_cols=None) -> pd.DataFrame:
     """
     Prefija columnas sin prefijo claro para evitar choques entre DFs.
@@ -148,11 +164,7 @@ def add_df_prefix(df: pd.DataFrame, prefix: str, keep_cols=None) -> pd.DataFrame
     if keep_cols is None:
         keep_cols = {JOIN_KEY}
 
-    prefixes = [re.match(r"([A-Za-z]+)_", c).group(1).lower()
-                for c in df.columns if re.match(r"([A-Za-z]+)_", c)]
-    major = None
-    if prefixes:
-        major = max(set(prefixes), key=prefixes.count)
+    major = major_prefix(df.columns)
 
     new_cols = {}
     for c in df.columns:
@@ -168,8 +180,87 @@ def add_df_prefix(df: pd.DataFrame, prefix: str, keep_cols=None) -> pd.DataFrame
     return df
 
 
+def safe_merge(left: pd.DataFrame, right: pd.DataFrame, key: str = JOIN_KEY) -> pd.DataFrame:
+    """Merge outer por `key`; las columnas de `right` que ya están en `left` pasan a <col>__r."""
+    overlap = [c for c in left.columns.intersection(right.columns) if c != key]
+    if overlap:
+        ren = {c: f"{c}__r" for c in overlap}
+        right = right.rename(columns=ren)
+    return pd.merge(left, right, on=key, how="outer")
+
+
+def merge_tables_chain(dfs: List[pd.DataFrame], key: str = JOIN_KEY) -> pd.DataFrame:
+    """
+    Unión anterior: reduce() de merges outer de a pares (copia la tabla ancha
+    en cada paso). Reemplazada por align_tables; queda como referencia para
+    scripts/bench_etl_merge.py.
+    """
+    return reduce(lambda left, right: safe_merge(left, right, key), dfs)
+
+
+def resolve_collisions(dfs: List[pd.DataFrame], key: str = JOIN_KEY) -> List[dict]:
+    """
+    Renombres de cada tabla antes de unir: una columna que ya apareció en una
+    tabla anterior pasa a <col>__r (como safe_merge); si <col>__r también está
+    tomada, <col>__r2, <col>__r3, ... (safe_merge dejaba ahí los _x/_y de pandas).
+    """
+    seen = {key}
+    renames = []
+    for df in dfs:
+        ren = {}
+        for c in df.columns:
+            if c == key:
+                continue
+            new = c
+            if new in seen:
+                new, n = f"{c}__r", 2
+                while new in seen:
+                    new, n = f"{c}__r{n}", n + 1
+                ren[c] = new
+            seen.add(new)
+        renames.append(ren)
+    return renames
+
+
+def align_tables(dfs: List[pd.DataFrame], key: str = JOIN_KEY) -> pd.DataFrame:
+    """
+    Unión outer de N tablas por `key` en una sola pasada: nombres resueltos de
+    antemano, cada tabla indexada por la clave una vez y todas alineadas con un
+    único concat. Mismo resultado que merge_tables_chain (filas ordenadas por
+    clave, clave en la posición que tenía en la primera tabla).
+    La clave tiene que ser única en cada tabla (run_etl ya desduplica).
+    """
+    frames = []
+    for df, ren in zip(dfs, resolve_collisions(dfs, key)):
+        frame = df.set_index(key).rename(columns=ren)
+        if not frame.index.is_unique:
+            raise ValueError(f"Clave '{key}' repetida en una tabla: desduplicar antes de align_tables.")
+        frames.append(frame)
+
+    # Unión de claves ordenada (como el merge outer) y una sola concatenación;
+    # la clave entra como columna más del concat (reset_index la insertaría
+    # en un frame ya ancho y fragmentado)
+    index = frames[0].index
+    for frame in frames[1:]:
+        index = index.union(frame.index)
+    key_col = pd.DataFrame({key: pd.Series(index, index=index).astype(dfs[0][key].dtype)})
+    merged = pd.concat([key_col] + [frame.reindex(index) for frame in frames], axis=1)
+    merged = merged.reset_index(drop=True)
+
+    pos = list(dfs[0].columns).index(key)
+    if pos:
+        cols = list(merged.columns[1:])
+        cols.insert(pos, key)
+        merged = merged[cols]
+    return merged
+
+
 def coerce_numeric(df: pd.DataFrame, text_cols: set):
-    """Convierte a numérico todas las columnas no textuales; limpia %, comas y espacios finos."""
+    """
+    Convierte a numérico todas las columnas no textuales; limpia %, comas y espacios finos.
+    (Reemplazada en run_etl por parse_typed de backend/etl_types.py; queda como referencia
+    para scripts/bench_etl_types.py.)
+    """
     for c in df.columns:
         if c in text_cols:
             df[c] = df[c].fillna("").astype(str)
@@ -234,6 +325,31 @@ def write_parquet_safe(df: pd.DataFrame, path: Path):
         df.to_parquet(path, index=False)
 
 
+# Columnas de RAW que pasan al dataset procesado (nombre final a la derecha)
+METRICS_MAP = {
+    "Player": "Player",
+    "stats_Nation": "Nation",
+    "stats_Pos": "Pos",
+    "stats_Squad": "Squad",
+    "stats_Age": "Age",
+    "stats_Born": "Born",
+    "stats_90s": "MatchesPlayed",
+    "stats_Gls": "Gls",
+    "stats_Ast": "Ast",
+    "stats_xG": "xG",
+    "stats_xAG": "xAG",
+    "shooting_Sh": "Shots",
+    "shooting_SoT": "SoT",
+    "passing_Cmp": "PassCmp",
+    "passing_Att": "PassAtt",
+    "passing_Cmp%": "PassCmpPct",
+    "defense_Tkl": "Tkl",
+    "defense_TklW": "TklW",
+    "defense_Blocks": "Blocks",
+    "defense_Int": "Int",
+}
+
+
 # ---- Métricas específicas de arqueros (mapping desde keepers/keepersadv) ----
 GK_METRICS_MAP = {
     # keepers (GK “clásico”)
@@ -269,41 +385,85 @@ GK_METRICS_MAP = {
 }
 
 
+# ---------- Extracción (con caché) ----------
+
+def extract_tables(league: str, season: str, fetcher=lanusstats_fetcher) -> list:
+    """
+    Corre el fetcher y deja cada tabla lista para cachear: (nombre, DF con
+    columnas aplanadas y sin duplicados). Nombre = posición + prefijo
+    mayoritario ("00_stats", "09_keepers", ...).
+    """
+    result = fetcher(league, season)
+    if not isinstance(result, (tuple, list)):
+        return []
+    tables = []
+    for i, df in enumerate(result):
+        if not isinstance(df, pd.DataFrame):
+            continue
+        df = flatten_columns(df)
+        df = df.loc[:, ~df.columns.duplicated()]
+        tables.append((f"{i:02d}_{major_prefix(df.columns) or f't{i}'}", df))
+    return tables
+
+
 # ---------- Pipeline ----------
 
-def run_etl():
+def resolve_league(league: str) -> str:
+    """Código (ARG1) o nombre -> nombre exacto que entiende LanusStats."""
+    league = str(league)
+    return LEAGUE_ALIASES.get(league.upper(), league)
+
+
+def run_etl(
+    league: str = None,
+    season: str = None,
+    refresh: bool = False,
+    offline: bool = False,
+    fetcher=lanusstats_fetcher,
+    cache: ExtractCache = None,
+) -> Optional[Path]:
     """
     Ejecuta el pipeline de ETL completo: Extract -> Transform -> Load.
+    Sin argumentos usa LEAGUE / SEASON_TO_FETCH. Devuelve el parquet limpio
+    (None si no hubo datos). No toca estado global: se puede correr en
+    paralelo para varias ligas/temporadas (scripts/run_etl_leagues.py).
+
+    La extracción pasa por la caché de backend/extract_cache.py: el
+    transform lee las tablas de ahí y sólo se scrapea si faltan o
+    vencieron (refresh=True fuerza, offline=True nunca scrapea).
     """
+    cache = cache or extract_cache
+    league = resolve_league(league or LEAGUE)
+    season = str(season or SEASON_TO_FETCH)
+    slug = league.replace(" ", "_")
     RAW_DATA_PATH.mkdir(parents=True, exist_ok=True)
     PROCESSED_DATA_PATH.mkdir(parents=True, exist_ok=True)
 
-    print(f"Iniciando ETL para '{LEAGUE}' - Temporada '{SEASON_TO_FETCH}'...")
+    print(f"Iniciando ETL para '{league}' - Temporada '{season}'...")
 
     try:
         # --- 1) EXTRACT ---
-        print("Paso 1: Extrayendo datos crudos...")
-        fbref = ls.Fbref()
-        tuple_of_dfs = fbref.get_all_player_season_stats(
-            league=LEAGUE,
-            season=SEASON_TO_FETCH
+        print("Paso 1: Extrayendo datos crudos (caché FBref)...")
+        hits = cache.hits
+        tables = cache.fetch(
+            league, season,
+            extract=lambda: extract_tables(league, season, fetcher),
+            refresh=refresh,
+            offline=offline,
         )
 
-        if not isinstance(tuple_of_dfs, tuple) or not tuple_of_dfs:
+        if not tables:
             print("La extracción no devolvió datos. Finalizando.")
             return
 
-        print(f"Se recibieron {len(tuple_of_dfs)} tablas desde LanusStats.")
+        origin = "caché" if cache.hits > hits else "LanusStats"
+        print(f"Se leyeron {len(tables)} tablas ({origin}).")
 
         # --- 2) TRANSFORM — Pre-limpieza por DF ---
+        # (las tablas ya vienen aplanadas y sin columnas repetidas: extract_tables)
         print("Paso 2a: Pre-limpieza individual por tabla...")
         cleaned_dfs = []
-        for i, df in enumerate(tuple_of_dfs):
-            if not isinstance(df, pd.DataFrame):
-                continue
-
-            df = flatten_columns(df)
-
+        for name, df in tables:
             if JOIN_KEY not in df.columns:
                 # si no trae Player, no sirve para unión principal
                 continue
@@ -311,14 +471,12 @@ def run_etl():
             # normaliza clave JOIN_KEY
             df[JOIN_KEY] = normalize_key_series(df[JOIN_KEY])
 
-            # desduplica columnas dentro del DF
-            df = df.loc[:, ~df.columns.duplicated()]
-
             # colapsa duplicados por jugador (evita joins cartesianos)
             df = df.drop_duplicates(subset=[JOIN_KEY])
 
             # agrega prefijo a columnas "genéricas"
-            df = add_df_prefix(df, prefix=f"t{i}", keep_cols={JOIN_KEY})
+            # (posición original en la tupla de LanusStats: "03_defense" -> t3)
+            df = add_df_prefix(df, prefix=f"t{int(name.split('_', 1)[0])}", keep_cols={JOIN_KEY})
 
             cleaned_dfs.append(df)
 
@@ -328,53 +486,25 @@ def run_etl():
 
         # --- 2) TRANSFORM — Unión controlada ---
         print("Paso 2b: Unión por Player con control de columnas.")
-        def safe_merge(left, right):
-            overlap = [c for c in left.columns.intersection(right.columns) if c != JOIN_KEY]
-            if overlap:
-                ren = {c: f"{c}__r" for c in overlap}
-                right = right.rename(columns=ren)
-            merged = pd.merge(left, right, on=JOIN_KEY, how="outer")
-            return merged
-
-        raw_df = reduce(safe_merge, cleaned_dfs)
+        # una sola alineación de todas las tablas (antes: reduce(safe_merge))
+        raw_df = align_tables(cleaned_dfs)
 
         if not raw_df.columns.is_unique:
             raw_df.columns = ensure_unique(list(raw_df.columns))
 
-        raw_path = RAW_DATA_PATH / f"raw_merged_{SEASON_TO_FETCH}.parquet"
+        # Con la liga en el nombre: corridas en paralelo de la misma temporada no se pisan
+        raw_path = RAW_DATA_PATH / f"raw_merged_{slug}_{season}.parquet"
         write_parquet_safe(raw_df, raw_path)
         print(f"Raw unido guardado en: {raw_path}")
 
         # --- 2) TRANSFORM — Selección, renombre y tipado ---
         print("Paso 2c: Seleccionando y normalizando métricas finales...")
-        metrics_map = {
-            "Player": "Player",
-            "stats_Nation": "Nation",
-            "stats_Pos": "Pos",
-            "stats_Squad": "Squad",
-            "stats_Age": "Age",
-            "stats_Born": "Born",
-            "stats_90s": "MatchesPlayed",
-            "stats_Gls": "Gls",
-            "stats_Ast": "Ast",
-            "stats_xG": "xG",
-            "stats_xAG": "xAG",
-            "shooting_Sh": "Shots",
-            "shooting_SoT": "SoT",
-            "passing_Cmp": "PassCmp",
-            "passing_Att": "PassAtt",
-            "passing_Cmp%": "PassCmpPct",
-            "defense_Tkl": "Tkl",
-            "defense_TklW": "TklW",
-            "defense_Blocks": "Blocks",
-            "defense_Int": "Int",
-        }
 
         # mapeo efectivo con fallback por sufijo
-        available = [c for c in metrics_map.keys() if c in raw_df.columns]
+        available = [c for c in METRICS_MAP.keys() if c in raw_df.columns]
         if not available:
             fallback = []
-            for want in metrics_map.keys():
+            for want in METRICS_MAP.keys():
                 base = want.split("_", 1)[-1] if "_" in want else want
                 cand = [c for c in raw_df.columns if c.endswith("_" + base)]
                 if cand:
@@ -382,7 +512,7 @@ def run_etl():
             available = list(set(available) | set(fallback))
 
         effective_map = {}
-        for src, dst in metrics_map.items():
+        for src, dst in METRICS_MAP.items():
             if src in raw_df.columns:
                 effective_map[src] = dst
             else:
@@ -397,9 +527,9 @@ def run_etl():
 
         df_processed = raw_df[list(effective_map.keys())].rename(columns=effective_map)
 
-        # tipado base (¡NO incluye GK_* todavía!)
-        text_cols = {"Player", "Nation", "Pos", "Squad", "Born"}
-        df_processed = coerce_numeric(df_processed, text_cols=text_cols)
+        # tipado base por esquema (¡NO incluye GK_* todavía!): int32/float32,
+        # sin pasar por str las columnas que ya vienen numéricas
+        df_processed = parse_typed(df_processed, ETL_SCHEMA)
 
         # -------------------------------------------------------
         # Añadir métricas de arqueros desde keepers/keepersadv (robusto)
@@ -470,9 +600,8 @@ def run_etl():
         # --- 3) LOAD ---
         print("Paso 3: Guardando dataset limpio en 'processed'...")
 
-        slug = LEAGUE.replace(" ", "_")
         suffix = ".clean" if USE_CLEAN_SUFFIX else ""
-        base = f"player_stats_{slug}_{SEASON_TO_FETCH}{suffix}"
+        base = f"player_stats_{slug}_{season}{suffix}"
 
         parquet_path = PROCESSED_DATA_PATH / f"{base}.parquet"
         write_parquet_safe(df_processed, parquet_path)
@@ -482,8 +611,12 @@ def run_etl():
             df_processed.to_csv(csv_path, index=False)
             print(f"   CSV:     {csv_path}")
 
+        # Nombres nuevos al memo en disco (lo reutilizan join y próximas corridas)
+        name_cache.save()
+
         print("\n✅ ETL finalizado correctamente.")
         print(f"   Parquet: {parquet_path}")
+        return parquet_path
 
     except Exception as e:
         print(f"\nOcurrió un error inesperado durante el ETL: {e}")
@@ -504,15 +637,12 @@ if __name__ == "__main__":
         help="Temporada, ej 2024",
         default=os.getenv("SEASON", DEFAULT_SEASON),
     )
+    parser.add_argument("--refresh", action="store_true", help="Ignorar la caché de extracción y scrapear de nuevo")
+    parser.add_argument("--offline", action="store_true", help="Usar sólo la caché de extracción (no scrapear)")
     args = parser.parse_args()
 
     # código -> nombre real que entiende LanusStats
-    league_arg = str(args.league)
-    league_name = LEAGUE_ALIASES.get(league_arg.upper(), league_arg)
-
-    # setear globals que usa run_etl()
-    LEAGUE = league_name
-    SEASON_TO_FETCH = str(args.season)
+    league_name = resolve_league(args.league)
 
-    print(f"[runner] LEAGUE='{LEAGUE}' | SEASON_TO_FETCH='{SEASON_TO_FETCH}'")
-    run_etl()
+    print(f"[runner] LEAGUE='{league_name}' | SEASON='{args.season}'")
+    run_etl(league_name, str(args.season), refresh=args.refresh, offline=args.offline)
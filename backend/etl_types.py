@@ -0,0 +1,101 @@
+# backend/etl_types.py
+# ============================================================
+# Tipado por esquema de las columnas que selecciona run_etl()
+# ------------------------------------------------------------
+#   - ETL_SCHEMA: tipo de cada columna final (text / int32 / float32).
+#   - parse_typed(): reemplaza a coerce_numeric():
+#       * columnas ya numéricas: no se tocan (sólo fillna(0) + dtype)
+#       * texto numérico ("1,234", "45.3%", espacio fino): una pasada
+#         con kernels de Arrow (regex de limpieza + validación + cast),
+#         sin astype(str) ni tres str.replace por columna
+#       * enteros a int32 y tasas a float32 (si un "entero" trae
+#         decimales queda en float32, sin perder datos)
+#   - Mismos valores que coerce_numeric (no numérico -> 0, texto -> "").
+# ============================================================
+
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.api import types as ptypes
+
+TEXT, INT32, FLOAT32 = "text", "int32", "float32"
+
+# Age queda como texto: FBref la trae como 'YY-DDD' (la parsea parse_age_like_fbref)
+ETL_SCHEMA = {
+    "Player": TEXT,
+    "Nation": TEXT,
+    "Pos": TEXT,
+    "Squad": TEXT,
+    "Age": TEXT,
+    "Born": TEXT,
+    "MatchesPlayed": FLOAT32,
+    "Gls": INT32,
+    "Ast": INT32,
+    "xG": FLOAT32,
+    "xAG": FLOAT32,
+    "Shots": INT32,
+    "SoT": INT32,
+    "PassCmp": INT32,
+    "PassAtt": INT32,
+    "PassCmpPct": FLOAT32,
+    "Tkl": INT32,
+    "TklW": INT32,
+    "Blocks": INT32,
+    "Int": INT32,
+}
+
+# Lo que limpiaba coerce_numeric ('%', separador de miles, thin space) en un solo regex
+_STRIP_RE = "[%,\u2009]"
+_NUMBER_RE = r"^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$"
+
+
+def _text_to_float(s: pd.Series) -> np.ndarray:
+    """Texto numérico -> float64 (NaN si no parsea) con kernels de Arrow."""
+    try:
+        arr = pa.array(s, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mezcla de str y números en una columna object
+        arr = pa.array(s.map(lambda x: None if pd.isna(x) else str(x)), type=pa.string(), from_pandas=True)
+    arr = pc.replace_substring_regex(arr, pattern=_STRIP_RE, replacement="")
+    try:
+        # Camino rápido: todo parsea
+        return pc.cast(arr, pa.float64()).to_numpy(zero_copy_only=False)
+    except pa.ArrowInvalid:
+        pass
+    # Vacíos / texto no numérico -> null (como errors="coerce")
+    valid = pc.match_substring_regex(arr, _NUMBER_RE)
+    arr = pc.if_else(valid, pc.utf8_trim_whitespace(arr), pa.scalar(None, pa.string()))
+    return pc.cast(arr, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def _compact(values: np.ndarray, dtype: str, name: str) -> np.ndarray:
+    values = np.nan_to_num(values.astype(np.float64, copy=False), nan=0.0)
+    if dtype == INT32:
+        if np.all(np.mod(values, 1) == 0) and np.all(np.abs(values) < 2**31):
+            return values.astype(np.int32)
+        logging.warning(f"Columna {name}: valores no enteros, queda en float32.")
+    return values.astype(np.float32)
+
+
+def parse_column(s: pd.Series, dtype: str) -> pd.Series:
+    if dtype == TEXT:
+        return s.fillna("").astype(str)
+    if ptypes.is_bool_dtype(s):
+        values = s.astype(np.float64).to_numpy()
+    elif ptypes.is_numeric_dtype(s):
+        values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        values = _text_to_float(s)
+    return pd.Series(_compact(values, dtype, s.name), index=s.index, name=s.name)
+
+
+def parse_typed(df: pd.DataFrame, schema: dict = None, default: str = FLOAT32) -> pd.DataFrame:
+    """Tipa cada columna según el esquema (las que no figuran: `default`)."""
+    schema = ETL_SCHEMA if schema is None else schema
+    return pd.DataFrame(
+        {c: parse_column(df[c], schema.get(c, default)) for c in df.columns},
+        index=df.index,
+    )
@@ -0,0 +1,207 @@
+# backend/extract_cache.py
+# ============================================================
+# Caché en disco de las tablas FBref que extrae LanusStats
+# ------------------------------------------------------------
+#   - Clave (liga, temporada, tabla). Cada DataFrame extraído se guarda
+#     como Parquet direccionado por contenido:
+#       data/cache/fbref/objects/<sha256>.parquet
+#     y un índice por (liga, temporada) lista sus tablas en orden:
+#       data/cache/fbref/<Liga>/<temporada>.json
+#     (tabla -> sha256, filas, columnas; fetched_at; fingerprint).
+#     Tablas idénticas entre corridas no se duplican en disco.
+#   - TTL (FBREF_CACHE_TTL_HOURS, default 168 = una semana; <= 0 no vence).
+#     Vencido o faltante -> se vuelve a scrapear. refresh=True fuerza la
+#     extracción; offline=True usa lo que haya (aunque esté vencido) y
+#     nunca scrapea.
+#   - Fetchers: callable (liga, temporada) -> secuencia de DataFrames, igual
+#     que Fbref().get_all_player_season_stats.
+#       lanusstats_fetcher  el real (importa LanusStats al usarse)
+#       LocalFetcher        sustituto local (dict en memoria o carpeta de
+#                           Parquet/CSV) para tests y corridas sin red
+# ============================================================
+
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+FBREF_CACHE_DIR = Path(os.getenv("FBREF_CACHE_DIR", "data/cache/fbref"))
+FBREF_CACHE_TTL_HOURS = float(os.getenv("FBREF_CACHE_TTL_HOURS", "168"))
+
+Table = Tuple[str, pd.DataFrame]
+
+
+class CacheMiss(LookupError):
+    """offline=True y no hay tablas en caché para (liga, temporada)."""
+
+
+def _slug(x) -> str:
+    return str(x).strip().replace(" ", "_").replace("/", "-")
+
+
+def _parquet_bytes(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    try:
+        df.to_parquet(buf, index=False, engine="pyarrow")
+    except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError):
+        # Columnas object con tipos mezclados (p.ej. '1,234' y 12): a texto.
+        # El tipado lo hace después parse_typed (backend/etl_types.py).
+        df = df.copy()
+        for c in df.columns[df.dtypes == object]:
+            df[c] = df[c].map(lambda x: None if pd.isna(x) else str(x)).astype("string")
+        buf = io.BytesIO()
+        df.to_parquet(buf, index=False, engine="pyarrow")
+    return buf.getvalue()
+
+
+# ---------- fetchers ----------
+
+def lanusstats_fetcher(league: str, season: str) -> Sequence[pd.DataFrame]:
+    import LanusStats as ls  # sólo al scrapear: caché y transform no lo necesitan
+
+    return ls.Fbref().get_all_player_season_stats(league=league, season=season)
+
+
+class LocalFetcher:
+    """
+    Sustituto de lanusstats_fetcher sin red.
+      - dict {(liga, temporada): [DataFrame, ...]}
+      - carpeta <root>/<Liga>/<temporada>/*.parquet|*.csv (en orden de nombre)
+    `calls` cuenta las extracciones (para verificar que la caché las evita).
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.calls = 0
+
+    def __call__(self, league: str, season: str) -> Tuple[pd.DataFrame, ...]:
+        self.calls += 1
+        if isinstance(self.source, dict):
+            frames = self.source.get((league, str(season)), ())
+            return tuple(df.copy() if isinstance(df, pd.DataFrame) else df for df in frames)
+        folder = Path(self.source) / _slug(league) / _slug(season)
+        frames = []
+        for path in sorted(folder.glob("*")):
+            if path.suffix == ".parquet":
+                frames.append(pd.read_parquet(path))
+            elif path.suffix == ".csv":
+                frames.append(pd.read_csv(path))
+        return tuple(frames)
+
+
+# ---------- caché ----------
+
+class ExtractCache:
+    def __init__(self, root: Path = None, ttl_hours: float = FBREF_CACHE_TTL_HOURS):
+        self.root = Path(root) if root else FBREF_CACHE_DIR
+        self.ttl = ttl_hours * 3600 if ttl_hours and ttl_hours > 0 else None
+        self.hits = 0
+        self.misses = 0
+
+    def _index_path(self, league: str, season: str) -> Path:
+        return self.root / _slug(league) / f"{_slug(season)}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / f"{digest}.parquet"
+
+    def entry(self, league: str, season: str) -> Optional[dict]:
+        """Índice de (liga, temporada) o None si no está cacheado."""
+        path = self._index_path(league, season)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Índice de caché ilegible {path} ({e}); se ignora.")
+            return None
+
+    def is_fresh(self, entry: dict) -> bool:
+        if self.ttl is None:
+            return True
+        return time.time() - float(entry.get("fetched_at", 0)) < self.ttl
+
+    def get(self, league: str, season: str, allow_stale: bool = False) -> Optional[List[Table]]:
+        """Tablas cacheadas en orden, o None si faltan/vencieron/están incompletas."""
+        entry = self.entry(league, season)
+        if entry is None or not (allow_stale or self.is_fresh(entry)):
+            return None
+        tables = []
+        for t in entry["tables"]:
+            path = self._object_path(t["sha256"])
+            try:
+                tables.append((t["name"], pd.read_parquet(path)))
+            except Exception as e:
+                logging.warning(f"Tabla cacheada ilegible {path} ({e}); se vuelve a extraer.")
+                return None
+        return tables
+
+    def put(self, league: str, season: str, tables: List[Table]) -> dict:
+        """Guarda las tablas (objetos por sha256) y reemplaza el índice de forma atómica."""
+        objects = self.root / "objects"
+        objects.mkdir(parents=True, exist_ok=True)
+        rows = []
+        for name, df in tables:
+            data = _parquet_bytes(df)
+            digest = hashlib.sha256(data).hexdigest()
+            path = self._object_path(digest)
+            if not path.exists():
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+            rows.append({"name": name, "sha256": digest, "rows": int(len(df)), "cols": int(df.shape[1])})
+
+        entry = {
+            "league": league,
+            "season": str(season),
+            "fetched_at": time.time(),
+            "tables": rows,
+            # huella de la extracción completa (la usa scripts/pipeline.py)
+            "fingerprint": hashlib.sha256("".join(t["sha256"] for t in rows).encode()).hexdigest(),
+        }
+        index = self._index_path(league, season)
+        index.parent.mkdir(parents=True, exist_ok=True)
+        tmp = index.with_name(f"{index.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry, indent=2), encoding="utf-8")
+        os.replace(tmp, index)
+        return entry
+
+    def fetch(
+        self,
+        league: str,
+        season: str,
+        extract: Callable[[], List[Table]],
+        refresh: bool = False,
+        offline: bool = False,
+    ) -> List[Table]:
+        """
+        Tablas de (liga, temporada): de la caché si están vigentes; si no,
+        corre `extract()` (lista de (nombre, DataFrame)) y las cachea.
+        """
+        if not refresh:
+            tables = self.get(league, season, allow_stale=offline)
+            if tables is not None:
+                self.hits += 1
+                logging.info(f"Caché FBref: {league} {season} ({len(tables)} tablas)")
+                return tables
+        if offline:
+            raise CacheMiss(f"Sin tablas en caché para {league} {season} ({self.root}).")
+
+        self.misses += 1
+        tables = extract()
+        if tables:
+            self.put(league, season, tables)
+        return tables
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# Caché compartida por el proceso (backend/etl.py)
+extract_cache = ExtractCache()
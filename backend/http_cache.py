@@ -0,0 +1,79 @@
+# backend/http_cache.py
+# ============================================================
+# GET condicional (ETag / Last-Modified) y Cache-Control
+# ------------------------------------------------------------
+#   - El ETag (fuerte) es un hash de la versión de datos (tabla
+#     data_version, ver backend/cache.py), la huella de los artefactos
+#     de models/ que sirve el endpoint y el formato de la respuesta.
+#   - If-None-Match / If-Modified-Since se validan antes de consultar
+#     la BD: un dashboard que repite la misma consulta recibe un 304.
+#   - Cache-Control public + max-age para que un reverse proxy cachee.
+# ============================================================
+
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import Response
+
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+
+
+def artifact_fingerprint(paths) -> tuple:
+    """(huella, mtime más reciente) de los archivos: mtime_ns + tamaño de cada uno."""
+    parts, newest = [], None
+    for p in paths:
+        try:
+            st = Path(p).stat()
+        except OSError:
+            parts.append(f"{Path(p).name}:-")
+            continue
+        parts.append(f"{Path(p).name}:{st.st_mtime_ns}:{st.st_size}")
+        newest = st.st_mtime if newest is None else max(newest, st.st_mtime)
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16], newest
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float = None) -> bool:
+    # If-None-Match manda; If-Modified-Since sólo si no vino (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cache_headers(etag: str, last_modified: float = None, max_age: int = HTTP_CACHE_MAX_AGE) -> dict:
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def newest(*timestamps):
+    """Máximo ignorando None (Last-Modified de varias fuentes)."""
+    known = [t for t in timestamps if t is not None]
+    return max(known) if known else None
@@ -0,0 +1,304 @@
+# backend/lifecycle.py
+# ============================================================
+# Carga diferida de servicios y estado de readiness
+# ------------------------------------------------------------
+#   - LazyService: construye el servicio (unpickle de sklearn, matriz,
+#     JSON) en un hilo de fondo. El import de backend.app ya no carga
+#     modelos: uvicorn hace bind al toque y un error de carga no mata
+#     el proceso (el endpoint responde 503).
+#   - Readiness: warm-up de fondo (servicios cargados, BD alcanzable,
+#     primera consulta hecha) que reporta /readyz. /healthz es sólo
+#     liveness.
+#   - Hot reload: LazyService.reload() construye un set nuevo de
+#     artefactos, lo valida y cambia la referencia de una vez. Los
+#     requests en curso ya tomaron el servicio viejo con get() y terminan
+#     con él. ArtifactWatcher lo dispara cuando cambian los archivos
+#     (también para un servicio cuya carga falló: así vuelve solo cuando
+#     el build deja artefactos nuevos).
+# ============================================================
+
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from .http_cache import artifact_fingerprint
+from starlette.concurrency import run_in_threadpool
+
+SERVICE_WAIT_SECONDS = float(os.getenv("SERVICE_WAIT_SECONDS", "30"))
+READY_DB_CHECK_SECONDS = float(os.getenv("READY_DB_CHECK_SECONDS", "10"))
+# Cada cuánto se miran los artefactos de models/ (0 = sin watcher, sólo /admin/reload)
+MODEL_WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "10"))
+
+log = logging.getLogger(__name__)
+
+
+class ServiceUnavailable(RuntimeError):
+    """El servicio todavía carga o falló al cargar (el API responde 503)."""
+
+
+class LazyService:
+    def __init__(self, name: str, factory, required: bool = True, artifacts=None):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        # callable -> rutas de los artefactos (huella sin instancia, p.ej. si falló la carga)
+        self.artifacts = artifacts
+        self.failed_fingerprint = None
+        self.load_seconds = None
+        self._value = None
+        self._error = None
+        self._loaded = threading.Event()
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._started = False
+        self.generation = 0
+        self.reloaded_at = None
+        self.last_reload_error = None
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._load, name=f"load-{self.name}", daemon=True).start()
+
+    def reload(self, force: bool = False) -> dict:
+        """
+        Construye el servicio de nuevo, lo valida (service.validate) y lo
+        calienta (service.warm_up) antes de reemplazar la referencia. Si
+        algo falla se lanza ValueError y sigue el set anterior.
+        """
+        self.start()
+        self.wait()
+        with self._reload_lock:
+            previous = self._value if self._error is None else None
+            t0 = time.perf_counter()
+            try:
+                candidate = self.factory()
+                if hasattr(candidate, "validate"):
+                    candidate.validate(previous=previous, force=force)
+                if hasattr(candidate, "warm_up"):
+                    candidate.warm_up()
+            except Exception as e:
+                self.last_reload_error = str(e)
+                log.error(f"Recarga de '{self.name}' rechazada: {e}")
+                raise ValueError(f"Recarga de '{self.name}' rechazada: {e}")
+            # Swap atómico de la referencia (los requests en curso tienen la vieja)
+            self._value, self._error = candidate, None
+            self.failed_fingerprint = None
+            self.generation += 1
+            self.reloaded_at = time.time()
+            self.last_reload_error = None
+            seconds = time.perf_counter() - t0
+            log.info(f"Servicio '{self.name}' recargado (generación {self.generation}) en {seconds:.2f}s.")
+            return {"service": self.name, "generation": self.generation, "seconds": round(seconds, 3)}
+
+    def _load(self):
+        t0 = time.perf_counter()
+        # Huella antes de construir: si el build escribe durante la carga, difiere
+        fingerprint = self.disk_fingerprint()
+        try:
+            self._value = self.factory()
+            log.info(f"Servicio '{self.name}' cargado en {time.perf_counter() - t0:.2f}s.")
+        except Exception as e:
+            self._error = e
+            self.failed_fingerprint = fingerprint
+            log.error(f"No se pudo cargar el servicio '{self.name}': {e}")
+        finally:
+            self.load_seconds = time.perf_counter() - t0
+            self._loaded.set()
+
+    def disk_fingerprint(self):
+        """Huella actual de los artefactos en disco o None si no se conocen."""
+        value = self._value
+        try:
+            if value is not None and hasattr(value, "artifact_paths"):
+                paths = value.artifact_paths()
+            elif self.artifacts is not None:
+                paths = self.artifacts()
+            else:
+                return None
+            return artifact_fingerprint(paths)[0]
+        except Exception as e:
+            log.warning(f"No se pudo calcular la huella de '{self.name}': {e}")
+            return None
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded.is_set() and self._error is None
+
+    @property
+    def loaded(self) -> bool:
+        """Terminó la carga inicial (con o sin error)."""
+        return self._loaded.is_set()
+
+    @property
+    def current(self):
+        """Servicio en uso o None (sin esperar la carga)."""
+        return self._value
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._loaded.wait(timeout)
+
+    def get(self, timeout: float = SERVICE_WAIT_SECONDS):
+        """El servicio cargado; espera hasta timeout si todavía está cargando."""
+        self.start()
+        if not self.wait(timeout):
+            raise ServiceUnavailable(f"El servicio '{self.name}' todavía se está cargando.")
+        if self._error is not None:
+            raise ServiceUnavailable(f"El servicio '{self.name}' no está disponible: {self._error}")
+        return self._value
+
+    async def get_async(self):
+        """get() sin bloquear el event loop mientras carga."""
+        if self.ready:
+            return self._value
+        return await run_in_threadpool(self.get)
+
+    def status(self) -> dict:
+        if not self._loaded.is_set():
+            state = "loading" if self._started else "pending"
+        else:
+            state = "error" if self._error is not None else "ready"
+        out = {"status": state, "required": self.required, "generation": self.generation}
+        if self.load_seconds is not None:
+            out["load_seconds"] = round(self.load_seconds, 3)
+        if self.last_reload_error is not None:
+            out["last_reload_error"] = self.last_reload_error
+        if self._error is not None:
+            out["error"] = str(self._error)
+        return out
+
+
+class Readiness:
+    """
+    Warm-up de fondo: carga los servicios, verifica la BD y ejecuta las
+    consultas de calentamiento. Después re-chequea la BD cada
+    READY_DB_CHECK_SECONDS para que /readyz refleje caídas.
+    """
+
+    def __init__(self, services, session_factory, warmups=()):
+        self.services = services
+        self.session_factory = session_factory
+        self.warmups = list(warmups)
+        self.db_ok = False
+        self.db_error = None
+        self.warmed = False
+        self.ready_seconds = None
+        self._t0 = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._t0 = time.perf_counter()
+        for svc in self.services:
+            svc.start()
+        threading.Thread(target=self._run, name="readiness", daemon=True).start()
+
+    def _check_db(self) -> bool:
+        try:
+            with self.session_factory() as db:
+                db.execute(text("SELECT 1"))
+            self.db_ok, self.db_error = True, None
+        except Exception as e:
+            self.db_ok, self.db_error = False, str(e)
+        return self.db_ok
+
+    def _run(self):
+        for svc in self.services:
+            svc.wait()
+        while not self._check_db():
+            log.warning(f"BD no disponible para readiness: {self.db_error}")
+            time.sleep(READY_DB_CHECK_SECONDS)
+        for name, fn in self.warmups:
+            t0 = time.perf_counter()
+            try:
+                fn()
+                log.info(f"Warm-up '{name}' en {time.perf_counter() - t0:.2f}s.")
+            except Exception as e:
+                # Un warm-up fallido no bloquea: la consulta real reintenta
+                log.warning(f"Warm-up '{name}' falló: {e}")
+        self.warmed = True
+        self.ready_seconds = time.perf_counter() - self._t0
+        log.info(f"API lista en {self.ready_seconds:.2f}s desde el arranque.")
+        while True:
+            time.sleep(READY_DB_CHECK_SECONDS)
+            self._check_db()
+
+    @property
+    def ready(self) -> bool:
+        services_ok = all(s.ready for s in self.services if s.required)
+        return services_ok and self.db_ok and self.warmed
+
+    def status(self) -> dict:
+        out = {
+            "ready": self.ready,
+            "services": {s.name: s.status() for s in self.services},
+            "db": {"ok": self.db_ok, **({"error": self.db_error} if self.db_error else {})},
+            "warmed": self.warmed,
+        }
+        if self.ready_seconds is not None:
+            out["ready_seconds"] = round(self.ready_seconds, 3)
+        return out
+
+
+class ArtifactWatcher:
+    """
+    Mira la huella (mtime/tamaño) de los artefactos de cada servicio y lo
+    recarga cuando cambian. Espera a que la huella quede estable entre dos
+    chequeos para no leer archivos a medio escribir por el build. Un
+    servicio cuya carga falló se compara con la huella con la que falló:
+    si los artefactos cambian se reintenta y el servicio vuelve.
+    """
+
+    def __init__(self, services, interval: float = MODEL_WATCH_SECONDS):
+        self.services = services
+        self.interval = interval
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="artifact-watcher", daemon=True).start()
+
+    def _on_disk(self, svc):
+        if svc.ready:
+            loaded = getattr(svc.current, "fingerprint", None)
+        else:
+            loaded = svc.failed_fingerprint
+        return loaded, svc.disk_fingerprint()
+
+    def _run(self):
+        pending = {}   # nombre -> huella vista en el chequeo anterior
+        rejected = {}  # nombre -> huella que no pasó la validación
+        while True:
+            time.sleep(self.interval)
+            for svc in self.services:
+                if not svc.loaded:
+                    continue  # todavía en la carga inicial
+                loaded, on_disk = self._on_disk(svc)
+                if on_disk is None or on_disk == loaded or on_disk == rejected.get(svc.name):
+                    pending.pop(svc.name, None)
+                    continue
+                if pending.get(svc.name) != on_disk:
+                    pending[svc.name] = on_disk       # cambió: esperar un chequeo más
+                    continue
+                pending.pop(svc.name, None)
+                try:
+                    svc.reload()
+                    rejected.pop(svc.name, None)
+                except ValueError:
+                    # Ya logueado; se reintenta cuando los archivos vuelvan a cambiar
+                    rejected[svc.name] = on_disk
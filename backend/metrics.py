@@ -0,0 +1,250 @@
+# backend/metrics.py
+# ============================================================
+# Métricas de latencia por request y por etapa (formato Prometheus)
+# ------------------------------------------------------------
+#   - Middleware: latencia total por endpoint (plantilla de ruta,
+#     método y status) y, para ese mismo request, el tiempo acumulado
+#     en cada etapa: db, pool (espera de checkout), knn, model, search,
+#     serialize.
+#   - Las etapas se acumulan en un dict por request (ContextVar): lo
+#     comparten el threadpool de los endpoints sync y el event loop.
+#   - DB: eventos before/after_cursor_execute de SQLAlchemy. Pool:
+#     tiempo dentro de pool.connect() (incluye la espera por conexión).
+#   - Cachés: hits/misses/evictions de backend/cache.py al scrapear.
+#   - Métricas por proceso: con varios workers, Prometheus scrapea cada uno.
+# ============================================================
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Etapas del request en curso: {"db": segundos, ...} (None fuera de un request)
+_stages: ContextVar = ContextVar("request_stages", default=None)
+
+
+def _fmt_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for n, v in zip(names, values):
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{n}="{v}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}      # labels -> [counts por bucket..., suma, cantidad]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for labels, series in sorted(items):
+            for upper, count in zip(self.buckets, series):
+                lbl = _fmt_labels(self.labelnames + ("le",), labels + (repr(upper),))
+                lines.append(f"{self.name}_bucket{lbl} {count}")
+            lbl = _fmt_labels(self.labelnames + ("le",), labels + ("+Inf",))
+            lines.append(f"{self.name}_bucket{lbl} {series[-1]}")
+            base = _fmt_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{base} {series[-2]}")
+            lines.append(f"{self.name}_count{base} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_fmt_labels(self.labelnames, k)} {v}" for k, v in items]
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Latencia total del request.", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram(
+    "http_request_stage_seconds", "Tiempo del request por etapa (db, pool, knn, model, search, serialize).",
+    ("route", "stage"),
+)
+DB_QUERIES = Counter("db_queries_total", "Sentencias SQL ejecutadas.", ("engine",))
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "Duración de cada sentencia SQL.", ("engine",))
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Tiempo hasta obtener una conexión del pool (incluye la espera).", ("engine",)
+)
+
+METRICS = [REQUEST_SECONDS, STAGE_SECONDS, DB_QUERIES, DB_QUERY_SECONDS, POOL_CHECKOUT_SECONDS]
+# Funciones que devuelven líneas extra al scrapear (cachés, pool, ...)
+COLLECTORS = []
+
+
+# ---------- etapas ----------
+
+def add_stage_time(name: str, seconds: float):
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(name, time.perf_counter() - t0)
+
+
+def start_request() -> dict:
+    stages = {}
+    _stages.set(stages)
+    return stages
+
+
+def finish_request(method: str, route: str, status: int, seconds: float, stages: dict):
+    REQUEST_SECONDS.observe((method, route, str(status)), seconds)
+    for name, value in stages.items():
+        STAGE_SECONDS.observe((route, name), value)
+
+
+# ---------- SQLAlchemy ----------
+
+def instrument_engine(engine, name: str):
+    """Tiempo de cada sentencia (etapa db) y del checkout del pool (etapa pool)."""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_metrics_t0")
+        if not starts:
+            return
+        dt = time.perf_counter() - starts.pop()
+        DB_QUERIES.inc((name,))
+        DB_QUERY_SECONDS.observe((name,), dt)
+        add_stage_time("db", dt)
+
+    def handle_error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("_metrics_t0"):
+            dt = time.perf_counter() - conn.info["_metrics_t0"].pop()
+            add_stage_time("db", dt)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+    # La espera del checkout se mide en la clase del pool, no en la instancia:
+    # engine.dispose() / pool.recreate() construyen el pool nuevo con
+    # self.__class__, así que la medición sobrevive a la recreación.
+    pool = engine.pool
+    if getattr(type(pool), "_metrics_name", None) is None:
+        pool.__class__ = _timed_pool_class(type(pool), name)
+
+
+_TIMED_POOLS = {}
+
+
+def _timed_pool_class(cls, name: str):
+    """Subclase de `cls` cuyo connect() registra la espera (etapa pool)."""
+    key = (cls, name)
+    if key not in _TIMED_POOLS:
+        def connect(self):
+            t0 = time.perf_counter()
+            try:
+                return cls.connect(self)
+            finally:
+                dt = time.perf_counter() - t0
+                POOL_CHECKOUT_SECONDS.observe((name,), dt)
+                add_stage_time("pool", dt)
+
+        _TIMED_POOLS[key] = type(f"Timed{cls.__name__}", (cls,), {"connect": connect, "_metrics_name": name})
+    return _TIMED_POOLS[key]
+
+
+# ---------- exposición ----------
+
+def cache_collector(stats_fn):
+    """Contadores de las TTLCache (backend/cache.py) como métricas."""
+
+    def collect() -> list:
+        stats = stats_fn()
+        lines = []
+        for metric, key, kind, help_text in (
+            ("cache_hits_total", "hits", "counter", "Aciertos de la caché en proceso."),
+            ("cache_misses_total", "misses", "counter", "Fallos de la caché en proceso."),
+            ("cache_evictions_total", "evictions", "counter", "Entradas desalojadas por LRU."),
+            ("cache_entries", "entries", "gauge", "Entradas vigentes."),
+            ("cache_hit_ratio", "hit_rate", "gauge", "hits / (hits + misses)."),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            lines += [f'{metric}{{cache="{name}"}} {s[key]}' for name, s in sorted(stats.items())]
+        return lines
+
+    return collect
+
+
+def pool_collector(stats_fn):
+    """Estado de los pools de conexiones (backend/db.py:pool_stats) como gauges."""
+
+    def collect() -> list:
+        stats = stats_fn()
+        lines = []
+        for metric, key, help_text in (
+            ("db_pool_size", "size", "Tamaño base del pool."),
+            ("db_pool_checked_out", "checked_out", "Conexiones en uso."),
+            ("db_pool_checked_in", "checked_in", "Conexiones libres en el pool."),
+            ("db_pool_overflow", "overflow", "Conexiones por encima de pool_size (negativo: pool base sin llenar)."),
+            ("db_pool_max_overflow", "max_overflow", "Límite de overflow."),
+        ):
+            values = [(name, s[key]) for name, s in sorted(stats.items()) if key in s]
+            if values:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+                lines += [f'{metric}{{engine="{name}"}} {v}' for name, v in values]
+        lines += ["# HELP db_pool_info Modo de pool de cada engine.", "# TYPE db_pool_info gauge"]
+        lines += [f'db_pool_info{{engine="{name}",mode="{s["mode"]}"}} 1' for name, s in sorted(stats.items())]
+        return lines
+
+    return collect
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for collect in COLLECTORS:
+        lines += collect()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,402 @@
+# backend/neighbors.py
+# ============================================================
+# Motor de búsqueda de vecinos en memoria (sin sklearn en el camino caliente)
+# ------------------------------------------------------------
+#   - Mapa hash player_id -> fila (O(1) en vez de list.index)
+#   - Matriz float32 contigua + normas precalculadas
+#   - Top-k vectorizado: una pasada de distancias + argpartition
+#
+# Las distancias son euclidianas al cuadrado (mismo orden que la
+# euclidiana); se devuelve la raíz sólo para los k elegidos.
+#
+# Filtros: columnas por jugador (liga, edad, valor, posición) guardadas
+# como arrays numpy junto a la matriz (<prefix>_player_attrs.npz). Se
+# evalúan vectorizados y sólo se buscan las filas elegibles.
+# ============================================================
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Bits de posición (un jugador "FW,MF" tiene FW|MF)
+POSITION_BITS = {"GK": 1, "DF": 2, "MF": 4, "FW": 8}
+
+# Con más de esta fracción de filas elegibles conviene una pasada completa
+# enmascarada antes que copiar el subconjunto.
+DENSE_MASK_FRACTION = 0.5
+
+
+def encode_positions(values) -> np.ndarray:
+    """'FW,MF' -> FW|MF como uint8 (0 si no hay posición)."""
+    out = np.zeros(len(values), dtype=np.uint8)
+    for i, v in enumerate(values):
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            continue
+        for part in str(v).upper().replace(" ", "").split(","):
+            out[i] |= POSITION_BITS.get(part, 0)
+    return out
+
+
+def build_player_attributes(df: "pd.DataFrame", league_col=None, age_col=None,
+                            value_col=None, pos_col=None, matches_col=None) -> dict:
+    """Arma las columnas de atributos (alineadas con las filas de `df`) para np.savez."""
+    import pandas as pd  # sólo en el build: el API no paga el import
+
+    n = len(df)
+    attrs = {}
+    if league_col:
+        codes, names = pd.factorize(df[league_col].fillna("").astype(str))
+        attrs["league"] = codes.astype(np.int16)
+        attrs["league_names"] = np.asarray(names, dtype=str)
+    if age_col:
+        attrs["age"] = pd.to_numeric(df[age_col], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+    if value_col:
+        attrs["value"] = pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    if pos_col:
+        attrs["pos"] = encode_positions(df[pos_col].tolist())
+    if matches_col:
+        attrs["matches"] = pd.to_numeric(df[matches_col], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+    for name, arr in attrs.items():
+        if name != "league_names" and len(arr) != n:
+            raise ValueError(f"Atributo {name} con largo {len(arr)} != {n}")
+    return attrs
+
+
+@dataclass
+class PlayerFilters:
+    league: Optional[str] = None
+    min_age: Optional[float] = None
+    max_age: Optional[float] = None
+    max_value: Optional[float] = None
+    position: Optional[str] = None
+    min_value: Optional[float] = None
+    min_matches: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return all(v is None for v in vars(self).values())
+
+
+class PlayerAttributes:
+    """Columnas de atributos por fila de la matriz, para filtrar sin post-filtrado."""
+
+    def __init__(self, columns: dict, n_rows: int):
+        self.columns = columns
+        for name, arr in columns.items():
+            if name != "league_names" and len(arr) != n_rows:
+                raise ValueError(f"Atributo {name} con largo {len(arr)} != {n_rows} filas")
+        self._league_code = {}
+        if "league_names" in columns:
+            self._league_code = {
+                str(name).lower(): code for code, name in enumerate(columns["league_names"])
+            }
+
+    @classmethod
+    def load(cls, path, n_rows: int):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files}, n_rows)
+
+    def _require(self, name: str):
+        if name not in self.columns:
+            raise ValueError(f"El filtro por '{name}' no está disponible en los artefactos del modelo")
+        return self.columns[name]
+
+    def mask(self, filters: PlayerFilters) -> np.ndarray:
+        """Máscara booleana de filas elegibles (NaN nunca cumple un filtro numérico)."""
+        mask = None
+
+        def _and(m):
+            nonlocal mask
+            mask = m if mask is None else (mask & m)
+
+        if filters.league is not None:
+            league = self._require("league")
+            code = self._league_code.get(filters.league.strip().lower())
+            _and(league == code if code is not None else np.zeros(len(league), dtype=bool))
+        if filters.min_age is not None:
+            _and(self._require("age") >= filters.min_age)
+        if filters.max_age is not None:
+            _and(self._require("age") <= filters.max_age)
+        if filters.min_value is not None:
+            _and(self._require("value") >= filters.min_value)
+        if filters.max_value is not None:
+            _and(self._require("value") <= filters.max_value)
+        if filters.min_matches is not None:
+            _and(self._require("matches") >= filters.min_matches)
+        if filters.position is not None:
+            bit = POSITION_BITS.get(filters.position.strip().upper())
+            if bit is None:
+                raise ValueError(f"Posición desconocida: {filters.position}")
+            _and((self._require("pos") & bit) != 0)
+        return mask
+
+
+def compact_ids(ids) -> np.ndarray:
+    """Ids como int64 si son todos numéricos (lo habitual), si no como unicode fijo."""
+    ids = [str(i) for i in ids]
+    if all(i.isdigit() for i in ids):
+        return np.asarray(ids, dtype=np.int64)
+    return np.asarray(ids, dtype=str)
+
+
+def _save_npy_atomic(path, arr):
+    # Archivo nuevo + rename: un API con el .npy viejo mapeado sigue leyendo
+    # el inode viejo (sobrescribir en el lugar lo truncaría bajo sus pies)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def save_npz_atomic(path, **arrays):
+    """np.savez a un .tmp + rename: el watcher del API nunca ve un .npz a medio escribir."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def save_mmap_artifacts(model_dir, prefix: str, matrix, ids):
+    """Escribe <prefix>_features_matrix.npy (float32) y <prefix>_player_ids.npy para np.load(mmap_mode='r')."""
+    model_dir = Path(model_dir)
+    _save_npy_atomic(model_dir / f"{prefix}_features_matrix.npy", np.ascontiguousarray(matrix, dtype=np.float32))
+    _save_npy_atomic(model_dir / f"{prefix}_player_ids.npy", compact_ids(ids))
+
+
+class NeighborIndex:
+    def __init__(self, matrix, ids):
+        # Si `matrix` ya es float32 contigua (p.ej. un memmap) no se copia:
+        # todos los workers comparten las mismas páginas del page cache.
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.ids = ids if isinstance(ids, np.ndarray) else np.asarray([str(i) for i in ids])
+
+        if self.matrix.ndim != 2 or self.matrix.shape[0] != len(self.ids):
+            raise ValueError(
+                f"Matriz {self.matrix.shape} no coincide con el índice ({len(self.ids)} ids)"
+            )
+
+        # Primera aparición gana (mismo criterio que list.index)
+        self.row_of = {}
+        for row, pid in enumerate(self.ids.tolist()):
+            self.row_of.setdefault(str(pid), row)
+
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def row(self, player_id) -> int:
+        """Fila del jugador en la matriz; KeyError si no está indexado."""
+        return self.row_of[str(player_id)]
+
+    def id_at(self, row: int) -> str:
+        return str(self.ids[row])
+
+    def search(self, row: int, k: int, mask: Optional[np.ndarray] = None):
+        """
+        Devuelve (filas, distancias) de los k vecinos más cercanos a `row`,
+        excluyendo la propia fila, ordenados de menor a mayor distancia.
+        Con `mask` sólo se consideran las filas elegibles.
+        """
+        q = self.matrix[row]
+        if mask is not None and mask.mean() < DENSE_MASK_FRACTION:
+            cand = np.flatnonzero(mask)
+            cand = cand[cand != row]
+            d2 = self.sq_norms[cand] - 2.0 * (self.matrix[cand] @ q) + self.sq_norms[row]
+            order, dist = self._top_k(d2, k)
+            return cand[order], dist
+
+        d2 = self.sq_norms - 2.0 * (self.matrix @ q) + self.sq_norms[row]
+        if mask is not None:
+            d2[~mask] = np.inf
+        d2[row] = np.inf
+        return self._top_k(d2, k)
+
+    def search_many(self, rows, k: int, mask: Optional[np.ndarray] = None, chunk: int = 256):
+        """
+        Versión batch de `search`: una multiplicación matriz×matriz por bloque
+        de consultas. Devuelve una lista de (filas, distancias) en el orden de `rows`.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        # Filtro selectivo: sólo las columnas elegibles (como en search)
+        cand = None
+        if mask is not None and mask.mean() < DENSE_MASK_FRACTION:
+            cand = np.flatnonzero(mask)
+        out = []
+        for start in range(0, len(rows), chunk):
+            block = rows[start:start + chunk]
+            if cand is not None:
+                d2 = self.sq_norms[cand][None, :] - 2.0 * (self.matrix[block] @ self.matrix[cand].T)
+                d2 += self.sq_norms[block][:, None]
+                d2[cand[None, :] == block[:, None]] = np.inf
+                for i in range(len(block)):
+                    order, dist = self._top_k(d2[i], k)
+                    out.append((cand[order], dist))
+                continue
+            d2 = self.sq_norms[None, :] - 2.0 * (self.matrix[block] @ self.matrix.T)
+            d2 += self.sq_norms[block][:, None]
+            if mask is not None:
+                d2[:, ~mask] = np.inf
+            d2[np.arange(len(block)), block] = np.inf
+            out.extend(self._top_k(d2[i], k) for i in range(len(block)))
+        return out
+
+    @staticmethod
+    def _top_k(d2, k: int):
+        """Los k menores de d2 ordenados (descarta los inf: filas excluidas)."""
+        k = min(k, int(np.count_nonzero(np.isfinite(d2))))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        part = np.argpartition(d2, k - 1)[:k]
+        order = part[np.argsort(d2[part], kind="stable")]
+        dist = np.sqrt(np.maximum(d2[order], 0.0))
+        return order, dist
+
+
+# ============================================================
+# Índice aproximado IVF (inverted file) en numpy
+# ------------------------------------------------------------
+# Build: k-means (Lloyd) sobre la matriz -> centroides + listas de filas.
+# Query: se eligen los `nprobe` centroides más cercanos y se rankea en
+# forma exacta sólo sobre las filas de esas listas.
+# ============================================================
+
+def _nearest_centroid(matrix, centroids, chunk: int = 65536):
+    c_norms = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], chunk):
+        block = matrix[start:start + chunk]
+        d2 = c_norms[None, :] - 2.0 * (block @ centroids.T)
+        labels[start:start + chunk] = np.argmin(d2, axis=1)
+    return labels
+
+
+def build_ivf(matrix, n_lists: int = 0, n_iter: int = 20, seed: int = 42,
+              max_train_per_list: int = 64) -> dict:
+    """
+    Entrena el IVF y devuelve los arrays para np.savez:
+    centroids (n_lists×d), order (filas agrupadas por lista) y offsets (n_lists+1).
+    n_lists=0 -> 4·sqrt(n) (regla habitual). El k-means se entrena sobre una
+    muestra de hasta `max_train_per_list` filas por lista; luego se asignan todas.
+    """
+    X = np.ascontiguousarray(matrix, dtype=np.float32)
+    n = X.shape[0]
+    if n_lists <= 0:
+        n_lists = int(4 * np.sqrt(n))
+    n_lists = max(1, min(n_lists, n))
+
+    rng = np.random.default_rng(seed)
+    n_train = min(n, n_lists * max_train_per_list)
+    train = X[rng.choice(n, size=n_train, replace=False)] if n_train < n else X
+    centroids = train[rng.choice(n_train, size=n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _nearest_centroid(train, centroids)
+        counts = np.bincount(labels, minlength=n_lists).astype(np.float32)
+        sums = np.stack(
+            [np.bincount(labels, weights=train[:, j], minlength=n_lists) for j in range(X.shape[1])],
+            axis=1,
+        ).astype(np.float32)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Listas vacías: se re-siembran con filas al azar
+        if empty.any():
+            centroids[empty] = train[rng.choice(n_train, size=int(empty.sum()), replace=False)]
+
+    labels = _nearest_centroid(X, centroids)
+    order = np.argsort(labels, kind="stable").astype(np.int64)
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+    return {"centroids": centroids, "order": order, "offsets": offsets}
+
+
+class IVFIndex:
+    """Búsqueda aproximada sobre un NeighborIndex (misma interfaz search/search_many)."""
+
+    def __init__(self, base: NeighborIndex, centroids, order, offsets, nprobe: int = 8):
+        if len(order) != len(base) or offsets[-1] != len(base):
+            raise ValueError(f"IVF con {len(order)} filas no coincide con la matriz ({len(base)})")
+        self.base = base
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.order = np.asarray(order, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.nprobe = max(1, min(nprobe, len(self.centroids)))
+        self.c_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        # Lista de cada fila (search_many arma la máscara por consulta con esto)
+        self.labels = np.empty(len(base), dtype=np.int32)
+        self.labels[self.order] = np.repeat(np.arange(len(self.centroids), dtype=np.int32), np.diff(self.offsets))
+
+    @classmethod
+    def load(cls, path, base: NeighborIndex, nprobe: int = 8):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(base, data["centroids"], data["order"], data["offsets"], nprobe=nprobe)
+
+    def _candidates(self, q):
+        d2 = self.c_norms - 2.0 * (self.centroids @ q)
+        probe = np.argpartition(d2, self.nprobe - 1)[:self.nprobe]
+        return np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probe])
+
+    def search(self, row: int, k: int, mask: Optional[np.ndarray] = None):
+        base = self.base
+        q = base.matrix[row]
+        cand = self._candidates(q)
+        if mask is not None:
+            cand = cand[mask[cand]]
+        cand = cand[cand != row]
+        if len(cand) < k:
+            # Pocas filas en las listas sondeadas (filtro muy selectivo): exacto
+            return base.search(row, k, mask=mask)
+        d2 = base.sq_norms[cand] - 2.0 * (base.matrix[cand] @ q) + base.sq_norms[row]
+        order, dist = base._top_k(d2, k)
+        return cand[order], dist
+
+    def search_many(self, rows, k: int, mask: Optional[np.ndarray] = None, chunk: int = 256):
+        """
+        Versión batch de `search`. Por bloque de consultas: centroides de
+        todas en una matmul y, por cada lista sondeada, una matmul con las
+        consultas que la sondean (top-k parcial por lista). Después se
+        juntan los nprobe×k parciales de cada consulta. Las que tienen menos
+        de k candidatos van a la búsqueda exacta (en lote).
+        """
+        base = self.base
+        rows = np.asarray(rows, dtype=np.int64)
+        out = [None] * len(rows)
+        short = []
+        for start in range(0, len(rows), chunk):
+            block = rows[start:start + chunk]
+            q = base.matrix[block]
+            cd2 = self.c_norms[None, :] - 2.0 * (q @ self.centroids.T)
+            probes = np.argpartition(cd2, self.nprobe - 1, axis=1)[:, :self.nprobe]
+
+            best_d = np.full((len(block), self.nprobe, k), np.inf, dtype=np.float32)
+            best_i = np.zeros((len(block), self.nprobe, k), dtype=np.int64)
+            for l in np.unique(probes):
+                qs, slot = np.nonzero(probes == l)
+                cand = self.order[self.offsets[l]:self.offsets[l + 1]]
+                if mask is not None:
+                    cand = cand[mask[cand]]
+                if len(cand) == 0:
+                    continue
+                d2 = base.sq_norms[cand][None, :] - 2.0 * (q[qs] @ base.matrix[cand].T)
+                d2 += base.sq_norms[block[qs]][:, None]
+                d2[cand[None, :] == block[qs][:, None]] = np.inf
+                kk = min(k, len(cand))
+                top = np.argpartition(d2, kk - 1, axis=1)[:, :kk]
+                best_d[qs, slot, :kk] = np.take_along_axis(d2, top, axis=1)
+                best_i[qs, slot, :kk] = cand[top]
+
+            best_d = best_d.reshape(len(block), -1)
+            best_i = best_i.reshape(len(block), -1)
+            for i in range(len(block)):
+                order, dist = base._top_k(best_d[i], k)
+                if len(order) < k:
+                    # Pocas filas en las listas sondeadas (filtro muy selectivo): exacto
+                    short.append(start + i)
+                    continue
+                out[start + i] = (best_i[i][order], dist)
+        if short:
+            for i, found in zip(short, base.search_many(rows[short], k, mask=mask)):
+                out[i] = found
+        return out
@@ -0,0 +1,223 @@
+# backend/normalize.py
+# ============================================================
+# Normalización de nombres de jugador/club compartida por ETL y join
+# ------------------------------------------------------------
+#   - Reglas (una sola definición para todo el pipeline):
+#       key         clave de unión de backend/etl.py (sin acentos, sin
+#                   espacios extra, minúsculas)
+#       name        norm_txt de scripts/join_tm_fbref.py (además quita
+#                   paréntesis, "club atletico", "c.a." y signos)
+#       first_last  primer + último token de un nombre ya normalizado
+#       club        name + alias canónicos de clubes (CANON)
+#   - normalize_series(): trabaja sobre la Serie entera. Los nombres se
+#     repiten mucho entre tablas y temporadas: se normalizan sólo los
+#     valores únicos que no estén en el memo (raw -> normalizado).
+#   - NameCache: el memo persiste en data/cache/name_norm_v<N>.parquet y lo
+#     reutilizan todas las etapas. Cambiar una regla (o CANON/STOPWORDS)
+#     => subir NORMALIZE_VERSION para no leer resultados viejos.
+# ============================================================
+
+import logging
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+from unidecode import unidecode
+
+NORMALIZE_VERSION = 1
+NAME_CACHE_DIR = Path(os.getenv("NAME_CACHE_DIR", "data/cache"))
+
+_RE_SPACES = re.compile(r"\s+")
+_RE_PARENS = re.compile(r"\([^)]*\)")                 # (LP), (SdE), etc.
+_RE_CLUB_ATLETICO = re.compile(r"\bclub\s+atletico\b")
+_RE_CA = re.compile(r"\bc\.?a\.?\b")                  # "c.a." / "ca"
+_RE_SIGNS = re.compile(r"[^a-z0-9\s]")
+
+STOPWORDS = {"de", "del", "da", "do", "das", "dos", "la", "las", "los", "san", "santa", "club", "atletico"}
+
+CANON = {
+    "boca juniors": "boca juniors", "boca": "boca juniors",
+    "river plate": "river plate", "river": "river plate",
+    "racing club": "racing club", "racing": "racing club", "racing avellaneda": "racing club",
+    "independiente": "independiente",
+    "san lorenzo": "san lorenzo", "san lorenzo de almagro": "san lorenzo",
+    "velez sarsfield": "velez sarsfield", "velez": "velez sarsfield", "velez sarfield": "velez sarsfield",
+    "lanus": "lanus", "ca lanus": "lanus",
+    "huracan": "huracan",
+    "argentinos juniors": "argentinos juniors", "argentinos": "argentinos juniors",
+    "estudiantes lp": "estudiantes lp", "estudiantes de la plata": "estudiantes lp", "estudiantes": "estudiantes lp",
+    "gimnasia lp": "gimnasia lp", "gimnasia la plata": "gimnasia lp", "gimnasia": "gimnasia lp",
+    "newells old boys": "newells old boys", "newell s old boys": "newells old boys", "newells": "newells old boys",
+    "rosario central": "rosario central",
+    "talleres": "talleres", "talleres de cordoba": "talleres", "ca talleres": "talleres",
+    "banfield": "banfield",
+    "defensa y justicia": "defensa y justicia", "defensa y just": "defensa y justicia",
+    "godoy cruz": "godoy cruz",
+    "platense": "platense", "club atletico platense": "platense",
+    "sarmiento": "sarmiento",
+    "barracas central": "barracas central",
+    "central cordoba sde": "central cordoba sde", "central cordoba": "central cordoba sde",
+    "tigre": "tigre",
+    "union": "union", "union santa fe": "union",
+    "atletico tucuman": "atletico tucuman",
+    "belgrano": "belgrano",
+    "instituto": "instituto",
+    "independiente rivadavia": "independiente rivadavia",
+    "deportivo riestra": "deportivo riestra",
+}
+
+
+# ---------- reglas (un valor) ----------
+
+def key_txt(x) -> str:
+    """Clave de unión por "Player" (backend/etl.py)."""
+    if x is None or (isinstance(x, float) and np.isnan(x)):
+        return ""
+    x = str(x).strip()
+    x = "".join(ch for ch in x if ch.isprintable())
+    x = unicodedata.normalize("NFKD", x).encode("ascii", "ignore").decode("ascii")
+    x = _RE_SPACES.sub(" ", x)
+    return x.lower()
+
+
+def norm_txt(x) -> str:
+    """Nombre sin acentos, minúsculas y sin signos (join FBref ↔ TM, búsqueda)."""
+    if x is None:
+        return ""
+    t = unidecode(str(x)).lower()
+    t = _RE_PARENS.sub(" ", t)
+    t = _RE_CLUB_ATLETICO.sub(" ", t)
+    t = _RE_CA.sub(" ", t)
+    t = _RE_SIGNS.sub(" ", t)
+    return _RE_SPACES.sub(" ", t).strip()
+
+
+def first_last_key(name_norm: str) -> str:
+    if name_norm is None:
+        return ""
+    toks = [t for t in str(name_norm).split() if t not in STOPWORDS]
+    if not toks:
+        return name_norm
+    if len(toks) == 1:
+        return toks[0]
+    return f"{toks[0]} {toks[-1]}"
+
+
+def canon_club(x) -> str:
+    k = norm_txt(x)
+    return CANON.get(k, k)
+
+
+NORMALIZERS = {
+    "key": key_txt,
+    "name": norm_txt,
+    "first_last": first_last_key,
+    "club": canon_club,
+}
+
+
+# ---------- memo persistente ----------
+
+class NameCache:
+    """
+    Memo raw -> normalizado por regla, cargado de/guardado en Parquet.
+    save() mezcla con lo que haya en disco (otras etapas/procesos pudieron
+    agregar nombres) y reemplaza el archivo de forma atómica.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path) if path else NAME_CACHE_DIR / f"name_norm_v{NORMALIZE_VERSION}.parquet"
+        self._memo = {kind: {} for kind in NORMALIZERS}
+        self._new = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _read_disk(self) -> dict:
+        import pandas as pd
+
+        memo = {kind: {} for kind in NORMALIZERS}
+        if not self.path.exists():
+            return memo
+        try:
+            df = pd.read_parquet(self.path)
+        except Exception as e:
+            logging.warning(f"No se pudo leer la caché de nombres {self.path} ({e}); se reconstruye.")
+            return memo
+        for kind, group in df.groupby("kind", sort=False):
+            if kind in memo:
+                memo[kind] = dict(zip(group["raw"].tolist(), group["normalized"].tolist()))
+        return memo
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            for kind, values in self._read_disk().items():
+                values.update(self._memo[kind])
+                self._memo[kind] = values
+            self._loaded = True
+
+    def lookup(self, kind: str, raws) -> list:
+        """Normalizados de una lista de strings únicos (calcula y memoriza los que falten)."""
+        self.load()
+        memo = self._memo[kind]
+        fn = NORMALIZERS[kind]
+        out = []
+        for raw in raws:
+            value = memo.get(raw)
+            if value is None:
+                value = memo[raw] = fn(raw)
+                self._new += 1
+            out.append(value)
+        return out
+
+    def save(self):
+        import pandas as pd
+
+        with self._lock:
+            if not self._new:
+                return
+            merged = self._read_disk()
+            for kind, values in self._memo.items():
+                merged[kind].update(values)
+            rows = [(kind, raw, norm) for kind, values in merged.items() for raw, norm in values.items()]
+            df = pd.DataFrame(rows, columns=["kind", "raw", "normalized"])
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, self.path)
+            self._new = 0
+
+    def stats(self) -> dict:
+        return {kind: len(values) for kind, values in self._memo.items()}
+
+
+# Memo compartido por el proceso (ETL, join, ...)
+name_cache = NameCache()
+
+
+# ---------- Series ----------
+
+def normalize_series(s, kind: str = "name", cache: NameCache = None):
+    """
+    Aplica la regla `kind` a una Serie normalizando cada valor distinto
+    una sola vez. Mismo resultado que s.map(NORMALIZERS[kind]) salvo los
+    nulos (None/NaN/NA), que dan "". Cambio de comportamiento: antes
+    s.map(norm_txt) convertía NaN en "nan", así que un nombre faltante
+    ahora tiene clave de join "" en vez de "nan".
+    """
+    import pandas as pd
+
+    cache = cache or name_cache
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    # Los no-str (números) se normalizan igual que antes: sobre su str()
+    raws = [u if isinstance(u, str) else str(u) for u in uniques]
+    values = np.empty(len(uniques), dtype=object)
+    values[:] = cache.lookup(kind, raws)
+    out = values[codes] if len(values) else np.full(len(s), None, dtype=object)
+    # Nulos (None/NaN/NA): lo que la regla da para None ("")
+    out[codes < 0] = NORMALIZERS[kind](None)
+    return pd.Series(out, index=s.index, name=s.name, dtype=object)
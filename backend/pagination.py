@@ -0,0 +1,77 @@
+# backend/pagination.py
+# ============================================================
+# Paginación por cursor (keyset) para endpoints de listas
+# ------------------------------------------------------------
+#   - El cursor es opaco para el cliente: base64url de
+#     {"k": tipo, "v": [valores de la última fila]}.
+#   - La página siguiente se pide con ?cursor=<X-Next-Cursor>; el
+#     header no viene en la última página.
+#   - En SQL la página sigue con (player_name, player_id) > (:a, :b)
+#     sobre un índice con ese orden: la página N cuesta lo mismo que
+#     la 1 (sin OFFSET).
+#   - Un endpoint con dos motores (índice en memoria / SQL) acepta los
+#     cursores de ambos: si llega el del otro motor, la respuesta empieza
+#     de nuevo en la página 1 y lo avisa con X-Cursor-Restarted.
+# ============================================================
+
+import base64
+import json
+import os
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CURSOR_RESTARTED_HEADER = "X-Cursor-Restarted"
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Condición keyset común a las consultas ordenadas por (player_name, player_id)
+NAME_ID_AFTER = "AND (player_name, player_id) > (:after_name, :after_id)"
+
+
+def encode_cursor(kind: str, values) -> str:
+    raw = json.dumps({"k": kind, "v": list(values)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor_kind(cursor: str, kinds) -> tuple:
+    """(tipo, valores) de un cursor de alguno de `kinds`; ValueError si no."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = data["v"]
+    except Exception:
+        raise ValueError("Cursor inválido.")
+    if data.get("k") not in kinds or not isinstance(values, list):
+        raise ValueError("Cursor inválido para este endpoint.")
+    return data["k"], values
+
+
+def decode_cursor(cursor: str, kind: str) -> list:
+    """Valores del cursor; ValueError si es inválido o de otro endpoint."""
+    return decode_cursor_kind(cursor, (kind,))[1]
+
+
+def page_limit(limit: int) -> int:
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def name_id_params(cursor, kind: str) -> dict:
+    """Parámetros de NAME_ID_AFTER a partir del cursor (vacío en la 1ra página)."""
+    if not cursor:
+        return {}
+    values = decode_cursor(cursor, kind)
+    if len(values) != 2:
+        raise ValueError("Cursor inválido.")
+    return {"after_name": values[0], "after_id": values[1]}
+
+
+def split_page(rows, limit: int, kind: str):
+    """
+    Las consultas piden limit + 1 filas: si sobra una hay otra página.
+    Devuelve (filas de la página, headers con el cursor siguiente).
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, {}
+    page = rows[:limit]
+    last = page[-1]
+    cursor = encode_cursor(kind, [last["full_name"], last["player_uuid"]])
+    return page, {NEXT_CURSOR_HEADER: cursor}
@@ -0,0 +1,94 @@
+# backend/responses.py
+# ============================================================
+# Serialización rápida de respuestas
+# ------------------------------------------------------------
+#   - ORJSONResponse: JSON con orjson (Decimal/numpy/fechas incluidos).
+#   - rows_response: negociación por Accept para endpoints de listas:
+#       application/json (default)            -> orjson
+#       application/x-ndjson                  -> una fila JSON por línea
+#       application/vnd.apache.arrow.stream   -> Arrow IPC stream
+#     Devuelve un Response directo: FastAPI no pasa las filas por
+#     jsonable_encoder.
+# ============================================================
+
+from decimal import Decimal
+
+import numpy as np
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from .metrics import stage
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+NDJSON = "application/x-ndjson"
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, "_mapping"):          # Row de SQLAlchemy
+        return dict(obj._mapping)
+    if hasattr(obj, "keys") and hasattr(obj, "__getitem__"):  # RowMapping
+        return dict(obj)
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        with stage("serialize"):
+            return dumps(content)
+
+
+def _as_dicts(rows):
+    return [r if isinstance(r, dict) else dict(r) for r in rows]
+
+
+def _arrow_bytes(rows) -> bytes:
+    import pyarrow as pa
+
+    table = pa.Table.from_pylist(_as_dicts(rows))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _ndjson_bytes(rows) -> bytes:
+    if not rows:
+        return b""
+    return b"\n".join(dumps(r) for r in rows) + b"\n"
+
+
+def preferred_format(request: Request) -> str:
+    accept = request.headers.get("accept", "")
+    if ARROW_STREAM in accept:
+        return ARROW_STREAM
+    if NDJSON in accept:
+        return NDJSON
+    return "application/json"
+
+
+def rows_response(request: Request, rows, status_code: int = 200, headers: dict = None) -> Response:
+    """Lista de filas en JSON, NDJSON o Arrow según el header Accept."""
+    fmt = preferred_format(request)
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if fmt == ARROW_STREAM:
+        with stage("serialize"):
+            body = _arrow_bytes(rows)
+        return Response(body, status_code=status_code, media_type=ARROW_STREAM, headers=headers)
+    if fmt == NDJSON:
+        with stage("serialize"):
+            body = _ndjson_bytes(rows)
+        return Response(body, status_code=status_code, media_type=NDJSON, headers=headers)
+    return ORJSONResponse(rows, status_code=status_code, headers=headers)
@@ -0,0 +1,250 @@
+# backend/search.py
+# ============================================================
+# Índice en memoria para /players/search (reemplaza ILIKE '%q%')
+# ------------------------------------------------------------
+#   - Nombres normalizados con norm_txt (backend/normalize.py), igual
+#     que en el join FBref ↔ TM
+#     (sin acentos, minúsculas, sin signos).
+#   - Índice invertido de trigramas (consultas >= 3 letras) y lista
+#     ordenada de tokens para prefijos cortos (1–2 letras).
+#   - Ranking: exacto > prefijo del nombre > prefijo de un token >
+#     substring; desempate por valor de mercado (desc), nombre e id.
+#   - Se construye en la primera búsqueda y se reconstruye (en segundo
+#     plano) cuando cambia la versión de datos (ver backend/cache.py).
+# ============================================================
+
+import bisect
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from .cache import data_version
+from .db import PLAYERS_VIEW
+from .metrics import stage
+from .normalize import norm_txt
+from .pagination import NAME_ID_AFTER
+
+# Un jugador por player_id (nombre/posición de cualquier temporada, valor máximo)
+SEARCH_SOURCE_SQL = f"""
+    SELECT
+        player_id,
+        MIN(player_name) AS player_name,
+        MIN(pos) AS pos,
+        MAX(latest_mv_eur) AS value_eur
+    FROM {PLAYERS_VIEW}
+    WHERE player_name IS NOT NULL
+    GROUP BY player_id
+"""
+
+
+def fallback_search_sql(keyset: bool):
+    """
+    ILIKE sobre PLAYERS_VIEW cuando el índice no está disponible (sync y
+    async). Keyset sobre (player_name, player_id): cursor 'search_sql'.
+    """
+    return text(f"""
+        SELECT 
+            player_id AS player_uuid, 
+            player_name AS full_name, 
+            MIN(Pos) AS primary_position 
+        FROM {PLAYERS_VIEW} 
+        WHERE player_name ILIKE :query 
+        {NAME_ID_AFTER if keyset else ""}
+        GROUP BY player_name, player_id
+        ORDER BY player_name, player_id
+        LIMIT :limit
+    """)
+
+
+def normalize_name(x) -> str:
+    """Misma normalización que el join FBref ↔ TM (backend/normalize.py)."""
+    return norm_txt(x)
+
+
+def trigrams(s: str) -> set:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class PlayerSearchIndex:
+    def __init__(self, db_session_factory):
+        self.db_session_factory = db_session_factory
+        self._state = None          # (version, datos del índice)
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    # ---------- construcción ----------
+
+    def _build(self, db, version: str):
+        rows = db.execute(text(SEARCH_SOURCE_SQL)).all()
+        ids = [r[0] for r in rows]
+        names = [r[1] for r in rows]
+        positions = [r[2] for r in rows]
+        norms = [normalize_name(n) for n in names]
+        values = np.array(
+            [float(r[3]) if r[3] is not None else np.nan for r in rows], dtype=np.float64
+        )
+
+        postings = {}
+        tokens = []
+        for i, norm in enumerate(norms):
+            for tri in trigrams(norm):
+                postings.setdefault(tri, []).append(i)
+            for tok in set(norm.split()):
+                tokens.append((tok, i))
+        postings = {k: np.asarray(v, dtype=np.int32) for k, v in postings.items()}
+        tokens.sort()
+
+        state = {
+            "ids": ids,
+            "names": names,
+            "positions": positions,
+            "norms": norms,
+            # Orden de desempate: mayor valor primero (NaN al final)
+            "neg_values": np.where(np.isnan(values), np.inf, -values),
+            "postings": postings,
+            "token_keys": [t for t, _ in tokens],
+            "token_rows": np.asarray([i for _, i in tokens], dtype=np.int32),
+        }
+        logging.info(f"Índice de búsqueda construido: {len(ids)} jugadores, {len(postings)} trigramas.")
+        return version, state
+
+    def _rebuild_in_background(self, version: str):
+        def _run():
+            try:
+                with self.db_session_factory() as db:
+                    self._state = self._build(db, version)
+            except Exception as e:
+                logging.error(f"Error al reconstruir el índice de búsqueda: {e}")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=_run, name="search-index-rebuild", daemon=True).start()
+
+    def _build_first(self, version: str, db=None):
+        # Primera vez: se construye en línea (sin índice no hay qué servir)
+        with self._lock:
+            if self._state is None:
+                if db is None:
+                    with self.db_session_factory() as own_db:
+                        self._state = self._build(own_db, version)
+                else:
+                    self._state = self._build(db, version)
+            return self._state[1]
+
+    def _refresh_if_stale(self, state, version: str):
+        if state[0] != version:
+            with self._lock:
+                if not self._rebuilding:
+                    self._rebuilding = True
+                    self._rebuild_in_background(version)
+        return state[1]
+
+    def _current(self, db):
+        version = data_version.current(db)
+        state = self._state
+        if state is None:
+            return self._build_first(version, db)
+        return self._refresh_if_stale(state, version)
+
+    async def _current_async(self, db):
+        version = await data_version.current_async(db)
+        state = self._state
+        if state is None:
+            # El build usa su propia sesión sync, fuera del event loop
+            return await run_in_threadpool(self._build_first, version)
+        return self._refresh_if_stale(state, version)
+
+    # ---------- consulta ----------
+
+    def _candidates(self, st, q: str) -> np.ndarray:
+        rows = None
+        for tok in q.split():
+            if len(tok) >= 3:
+                lists = sorted((st["postings"].get(t) for t in trigrams(tok)), key=lambda a: 0 if a is None else len(a))
+                if lists[0] is None:
+                    return np.empty(0, dtype=np.int32)
+                cand = lists[0]
+                for other in lists[1:]:
+                    cand = np.intersect1d(cand, other, assume_unique=True)
+            else:
+                keys = st["token_keys"]
+                lo = bisect.bisect_left(keys, tok)
+                hi = bisect.bisect_left(keys, tok + "\x7f")
+                cand = np.unique(st["token_rows"][lo:hi])
+            rows = cand if rows is None else np.intersect1d(rows, cand, assume_unique=True)
+            if len(rows) == 0:
+                break
+        return rows if rows is not None else np.empty(0, dtype=np.int32)
+
+    def ranked(self, db, query: str):
+        """Todas las coincidencias ordenadas: lista de (clave_de_orden, fila)."""
+        st = self._current(db)
+        return st, self._rank(st, query)
+
+    def _rank(self, st, query: str):
+        with stage("search"):
+            return self._rank_matches(st, query)
+
+    def _rank_matches(self, st, query: str):
+        q = normalize_name(query)
+        if not q:
+            return []
+
+        q_tokens = q.split()
+        norms = st["norms"]
+        out = []
+        for i in self._candidates(st, q).tolist():
+            norm = norms[i]
+            if not all(t in norm for t in q_tokens):
+                continue
+            if norm == q:
+                bucket = 0
+            elif norm.startswith(q):
+                bucket = 1
+            elif any(tok.startswith(q_tokens[0]) for tok in norm.split()):
+                bucket = 2
+            else:
+                bucket = 3
+            key = (bucket, float(st["neg_values"][i]), st["names"][i] or "", str(st["ids"][i]))
+            out.append((key, i))
+        out.sort()
+        return out
+
+    def search(self, db, query: str, limit: int = 10):
+        return self.search_page(db, query, limit)[0]
+
+    async def search_async(self, db, query: str, limit: int = 10):
+        return (await self.search_page_async(db, query, limit))[0]
+
+    def search_page(self, db, query: str, limit: int = 10, after=None):
+        """(filas, clave de la última fila o None si no hay más páginas)."""
+        st, ranked = self.ranked(db, query)
+        return self._page(st, ranked, limit, after)
+
+    async def search_page_async(self, db, query: str, limit: int = 10, after=None):
+        st = await self._current_async(db)
+        # El ranking es CPU: fuera del event loop
+        ranked = await run_in_threadpool(self._rank, st, query)
+        return self._page(st, ranked, limit, after)
+
+    def _page(self, st, ranked, limit: int, after):
+        # Keyset sobre la clave de orden: bisect en vez de recorrer las
+        # páginas anteriores (las claves son únicas por el id)
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(ranked, (tuple(after), float("inf")))
+        chunk = ranked[start:start + limit]
+        rows = [self._row(st, i) for _, i in chunk]
+        more = chunk and start + len(chunk) < len(ranked)
+        return rows, (list(chunk[-1][0]) if more else None)
+
+    @staticmethod
+    def _row(st, i: int) -> dict:
+        return {
+            "player_uuid": st["ids"][i],
+            "full_name": st["names"][i],
+            "primary_position": st["positions"][i],
+        }
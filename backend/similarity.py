@@ -4,14 +4,45 @@ import joblib
 import pandas as pd
 from pathlib import Path
 from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from starlette.concurrency import run_in_threadpool
 import numpy as np
 import logging
 import os
 import json
 
+from .cache import data_version, similar_details_cache
+from .db import PLAYERS_VIEW
+from .http_cache import artifact_fingerprint
+from .metrics import stage
+from .neighbors import IVFIndex, NeighborIndex, PlayerAttributes, PlayerFilters
+
 MODEL_DIR = Path("models")
 
+# "exact" (default) o "ivf" (aproximado; requiere field_ivf.npz del build)
+SIMILARITY_INDEX = os.getenv("SIMILARITY_INDEX", "exact").lower()
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+# Detalles resumidos de una lista de jugadores (todas las temporadas)
+DETAILS_SQL = text(f"""
+    SELECT 
+        player_id AS player_uuid,
+        player_name AS full_name,
+        pos AS primary_position, 
+        season_code AS season_id,
+        league_name,
+        club AS team_name,
+        latest_mv_eur AS value_eur,
+        "Gls",
+        "Ast",
+        "xG",
+        "Tkl"
+    FROM 
+        {PLAYERS_VIEW}
+    WHERE 
+        player_id IN :uuids
+""").bindparams(bindparam("uuids", expanding=True))  # IN expandido: vale en Postgres y DuckDB
+
 class SimilarityService:
     def __init__(self, db_session_factory: sessionmaker):
         logging.info("Cargando artefactos del modelo de similitud...")
@@ -20,15 +51,47 @@ class SimilarityService:
         try:
             # Carga los artefactos de JUGADORES DE CAMPO
             self.scaler = joblib.load(MODEL_DIR / "field_scaler.joblib")
-            self.model = joblib.load(MODEL_DIR / "field_knn_model.joblib")
-            self.features_matrix = joblib.load(MODEL_DIR / "field_features_matrix.joblib")
-            
-            # Carga el índice de jugadores (que es un JSON)
-            with open(MODEL_DIR / "field_player_index.json", "r") as f:
-                self.player_index = json.load(f)
+            # Huella de los artefactos (ETag de /player/{id}/similar y hot reload)
+            self.fingerprint, self.modified_at = artifact_fingerprint(self.artifact_paths())
+            self.feature_names = [str(c) for c in getattr(self.scaler, "feature_names_in_", [])]
+
+            matrix_npy = MODEL_DIR / "field_features_matrix.npy"
+            ids_npy = MODEL_DIR / "field_player_ids.npy"
+            if matrix_npy.exists() and ids_npy.exists():
+                # float32 mapeado en memoria: una sola copia en el page cache para todos los workers
+                features_matrix = np.load(matrix_npy, mmap_mode="r")
+                player_ids = np.load(ids_npy, mmap_mode="r")
+            else:
+                # Artefactos viejos (sólo joblib/JSON): copia privada por proceso
+                logging.warning("No se encontraron los .npy del modelo; cargando joblib (sin memoria compartida).")
+                features_matrix = joblib.load(MODEL_DIR / "field_features_matrix.joblib")
+                with open(MODEL_DIR / "field_player_index.json", "r") as f:
+                    player_ids = json.load(f)
+
+            # Motor de vecinos en memoria (reemplaza NearestNeighbors.kneighbors)
+            self.index = NeighborIndex(features_matrix, player_ids)
+            self.features_matrix = self.index.matrix
+
+            # Índice que responde las búsquedas: exacto o IVF aproximado
+            self.searcher = self.index
+            ivf_path = MODEL_DIR / "field_ivf.npz"
+            if SIMILARITY_INDEX == "ivf":
+                if ivf_path.exists():
+                    self.searcher = IVFIndex.load(ivf_path, self.index, nprobe=IVF_NPROBE)
+                    logging.info(f"Usando índice IVF ({len(self.searcher.centroids)} listas, nprobe={self.searcher.nprobe}).")
+                else:
+                    logging.warning(f"SIMILARITY_INDEX=ivf pero no existe {ivf_path}: usando búsqueda exacta.")
+
+            # Columnas de atributos para filtros (opcional: artefactos viejos no lo traen)
+            attrs_path = MODEL_DIR / "field_player_attrs.npz"
+            self.attributes = None
+            if attrs_path.exists():
+                self.attributes = PlayerAttributes.load(attrs_path, len(self.index))
+            else:
+                logging.warning(f"No se encontró {attrs_path}: búsqueda con filtros deshabilitada.")
             
             self.db_session_factory = db_session_factory
-            logging.info(f"✅ Artefactos cargados. {len(self.player_index)} jugadores indexados.")
+            logging.info(f"✅ Artefactos cargados. {len(self.index)} jugadores indexados.")
 
         except FileNotFoundError as e:
             logging.error(f"Error: No se encontró el archivo del modelo: {e}")
@@ -39,56 +102,192 @@ class SimilarityService:
             raise
         # --- FIN DEL BLOQUE CORREGIDO ---
         
-    def find_similar_players(self, target_player_uuid: str, n_similar: int = 5):
+    @staticmethod
+    def artifact_paths():
+        # Sólo lo que carga __init__ (field_knn_model.joblib, gk_* y los .tmp
+        # del build no cambian la huella)
+        paths = [
+            MODEL_DIR / "field_scaler.joblib",
+            MODEL_DIR / "field_features_matrix.npy",
+            MODEL_DIR / "field_player_ids.npy",
+            MODEL_DIR / "field_features_matrix.joblib",
+            MODEL_DIR / "field_player_index.json",
+            MODEL_DIR / "field_player_attrs.npz",
+        ]
+        if SIMILARITY_INDEX == "ivf":
+            paths.append(MODEL_DIR / "field_ivf.npz")
+        return paths
+
+    def validate(self, previous=None, force: bool = False):
+        """
+        Chequea que el set de artefactos sea coherente antes de ponerlo en
+        servicio (hot reload). ValueError si no: se sigue con el anterior.
+        """
+        n_rows, n_features = self.index.matrix.shape
+        if n_rows == 0:
+            raise ValueError("La matriz de features está vacía.")
+        expected = getattr(self.scaler, "n_features_in_", n_features)
+        if n_features != expected:
+            raise ValueError(f"La matriz tiene {n_features} features y el scaler {expected}.")
+        if self.feature_names and len(self.feature_names) != n_features:
+            raise ValueError("La lista de features del scaler no coincide con la matriz.")
+        if not np.isfinite(self.index.matrix).all():
+            raise ValueError("La matriz de features tiene valores no finitos.")
+        if isinstance(self.searcher, IVFIndex) and len(self.searcher.order) != n_rows:
+            raise ValueError("field_ivf.npz no está alineado con la matriz.")
+        if previous is not None and not force:
+            old = getattr(previous, "feature_names", [])
+            if old and self.feature_names and old != self.feature_names:
+                raise ValueError(
+                    f"Cambió la lista de features ({old} -> {self.feature_names}); usar force para aceptarla."
+                )
+
+    def warm_up(self):
+        # Trae las páginas de la matriz antes del swap
+        self.searcher.search(0, 5)
+
+    def _filter_mask(self, filters: PlayerFilters = None):
+        """Máscara de filas elegibles (None = sin filtros). ValueError si no se puede filtrar."""
+        if filters is None or filters.is_empty():
+            return None
+        if self.attributes is None:
+            raise ValueError(
+                "Filtros no disponibles: ejecutá 'python scripts/build_similarity_model.py' "
+                "para generar field_player_attrs.npz"
+            )
+        return self.attributes.mask(filters)
+
+    def _neighbor_uuids(self, target_player_uuid: str, n_similar: int, filters: PlayerFilters = None):
         try:
-            target_idx = self.player_index.index(str(target_player_uuid))
-        except ValueError:
+            target_idx = self.index.row(target_player_uuid)
+        except KeyError:
             raise Exception(f"Jugador {target_player_uuid} no encontrado en el índice del modelo")
-        except Exception as e:
-            raise
 
-        target_features = self.features_matrix[target_idx].reshape(1, -1)
-        distances, indices = self.model.kneighbors(target_features, n_neighbors=n_similar + 1)
-        similar_indices = indices[0][1:]
-        similar_uuids = [self.player_index[i] for i in similar_indices]
+        mask = self._filter_mask(filters)
+        with stage("knn"):
+            similar_indices, _ = self.searcher.search(target_idx, n_similar, mask=mask)
+        similar_uuids = [self.index.id_at(i) for i in similar_indices]
         
         logging.info(f"Jugadores similares a {target_player_uuid}: {similar_uuids}")
+        return similar_uuids
+
+    def find_similar_players(self, target_player_uuid: str, n_similar: int = 5,
+                             filters: PlayerFilters = None):
+        similar_uuids = self._neighbor_uuids(target_player_uuid, n_similar, filters)
 
         with self.db_session_factory() as db:
             return self._get_details_for_uuids(db, similar_uuids) 
 
+    async def find_similar_players_async(self, db, target_player_uuid: str, n_similar: int = 5,
+                                         filters: PlayerFilters = None):
+        """
+        Igual que find_similar_players pero con una AsyncSession (endpoints
+        /async). El KNN corre en el threadpool: no frena el event loop.
+        """
+        similar_uuids = await run_in_threadpool(self._neighbor_uuids, target_player_uuid, n_similar, filters)
+        return await self._get_details_for_uuids_async(db, similar_uuids)
+
+    def find_similar_players_batch(self, target_player_uuids: list, n_similar: int = 5,
+                                   filters: PlayerFilters = None):
+        """
+        Vecinos de varios jugadores a la vez: una sola pasada de distancias
+        (matriz×matriz) y una sola consulta a la BD para todos los detalles.
+        Devuelve (resultados, no_encontrados).
+        """
+        mask = self._filter_mask(filters)
+        targets, rows, not_found = [], [], []
+        for uuid in dict.fromkeys(str(u) for u in target_player_uuids):
+            row = self.index.row_of.get(uuid)
+            if row is None:
+                not_found.append(uuid)
+            else:
+                targets.append(uuid)
+                rows.append(row)
+
+        with stage("knn"):
+            found = self.searcher.search_many(rows, n_similar, mask=mask)
+        neighbors = {}
+        for uuid, (similar_indices, _) in zip(targets, found):
+            neighbors[uuid] = [self.index.id_at(i) for i in similar_indices]
+
+        all_uuids = list(dict.fromkeys(u for uids in neighbors.values() for u in uids))
+        details_by_uuid = {}
+        if all_uuids:
+            with self.db_session_factory() as db:
+                for row in self._get_details_for_uuids(db, all_uuids):
+                    details_by_uuid.setdefault(str(row["player_uuid"]), []).append(row)
+
+        results = [
+            {
+                "player_uuid": uuid,
+                "similar": [r for u in neighbors[uuid] for r in details_by_uuid.get(u, [])],
+            }
+            for uuid in targets
+        ]
+        return results, not_found
+
+    # ---------- detalles (con caché por versión de datos) ----------
+
+    @staticmethod
+    def _split_cached(version: str, uuids: list):
+        cached, missing = {}, []
+        for uid in dict.fromkeys(str(u) for u in uuids):
+            rows = similar_details_cache.get((version, uid))
+            if rows is None:
+                missing.append(uid)
+            else:
+                cached[uid] = rows
+        return cached, missing
+
+    @staticmethod
+    def _store_fetched(version: str, missing: list, fetched, cached: dict):
+        if fetched is None:
+            return
+        for uid in missing:
+            cached[uid] = fetched.get(uid, [])
+            similar_details_cache.set((version, uid), cached[uid])
+
+    @staticmethod
+    def _group_rows(rows) -> dict:
+        by_uuid = {}
+        for row in rows:
+            by_uuid.setdefault(str(row["player_uuid"]), []).append(dict(row))
+        return by_uuid
+
     def _get_details_for_uuids(self, db: Session, uuids: list):
         """
         Obtiene los detalles de una lista de UUIDs.
         CORREGIDO: Se quitó el filtro 'AND season_code = :season'
+        Usa la caché por versión de datos: sólo consulta los UUIDs que faltan.
         """
-        
-        sql = text("""
-            SELECT 
-                player_id AS player_uuid,
-                player_name AS full_name,
-                pos AS primary_position, 
-                season_code AS season_id,
-                league_name,
-                club AS team_name,
-                latest_mv_eur AS value_eur,
-                "Gls",
-                "Ast",
-                "xG",
-                "Tkl"
-            FROM 
-                v_players_union_with_sort
-            WHERE 
-                player_id = ANY(:uuids)
-        """) # <-- SE QUITÓ EL FILTRO DE SEASON_CODE
-        
+        version = data_version.current(db)
+        cached, missing = self._split_cached(version, uuids)
+        if missing:
+            self._store_fetched(version, missing, self._query_details_for_uuids(db, missing), cached)
+        return [row for uid in dict.fromkeys(str(u) for u in uuids) for row in cached.get(uid, [])]
+
+    async def _get_details_for_uuids_async(self, db, uuids: list):
+        version = await data_version.current_async(db)
+        cached, missing = self._split_cached(version, uuids)
+        if missing:
+            fetched = None
+            try:
+                result = await db.execute(DETAILS_SQL, {"uuids": [int(uid) for uid in missing]})
+                fetched = self._group_rows(result.mappings().all())
+            except Exception as e:
+                logging.error(f"Error al consultar detalles de UUIDs en la BD: {e}")
+            self._store_fetched(version, missing, fetched, cached)
+        return [row for uid in dict.fromkeys(str(u) for u in uuids) for row in cached.get(uid, [])]
+
+    def _query_details_for_uuids(self, db: Session, uuids: list):
+        """Consulta la BD y agrupa las filas por UUID (None si la consulta falla)."""
         try:
             uuids_as_int = [int(uid) for uid in uuids]
             
             # Pasamos la lista de integers a la consulta (sin season)
-            result = db.execute(sql, {"uuids": uuids_as_int})
-            return result.mappings().all()
+            result = db.execute(DETAILS_SQL, {"uuids": uuids_as_int})
+            return self._group_rows(result.mappings().all())
         except Exception as e:
             logging.error(f"Error al consultar detalles de UUIDs en la BD: {e}")
-            logging.warning("Asegúrate que la vista 'v_players_union_with_sort' exista.")
-            return []
\ No newline at end of file
+            logging.warning(f"Asegúrate que la vista '{PLAYERS_VIEW}' exista (database/schema/006_players_matview.sql).")
+            return None
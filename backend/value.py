@@ -1,38 +1,309 @@
 # backend/value.py
+# ============================================================
+# Oportunidades de mercado: motor de consulta en memoria
+# ------------------------------------------------------------
+#   - models/market_scores.npz (build_market_opportunities.py): toda la
+#     población puntuada por el modelo de valor, en columnas tipadas.
+#   - Filtros vectorizados con PlayerAttributes (liga, posición, edad,
+#     valor, partidos) y orden con permutaciones precalculadas por
+#     value_diff_eur / value_ratio / predicted_value_eur: una consulta
+#     es una máscara + un recorrido de la permutación.
+#   - Sin el .npz (artefactos viejos) se arma la misma tabla con las
+#     200 filas de market_opportunities.json.
+#   - ValuePredictor: el RandomForest de field_value_model.joblib sobre
+#     las filas de la matriz compartida (NeighborIndex), para cualquier
+#     jugador indexado. Un predict() por lote y memo por versión.
+# ============================================================
 
 import logging
 import json
+import os
 from pathlib import Path
 
+import numpy as np
+
+from .http_cache import artifact_fingerprint
+from .metrics import stage
+from .neighbors import PlayerAttributes, PlayerFilters
+
 MODEL_DIR = Path("models")
 OPPORTUNITIES_FILE = MODEL_DIR / "market_opportunities.json"
+SCORES_FILE = MODEL_DIR / "market_scores.npz"
+VALUE_MODEL_FILE = MODEL_DIR / "field_value_model.joblib"
+# Hilos del forest en predict(): con lotes chicos 1 evita el overhead de joblib
+VALUE_MODEL_JOBS = int(os.getenv("VALUE_MODEL_JOBS", "1"))
+
+# Columnas que devuelve la API (mismas claves que market_opportunities.json)
+TEXT_COLUMNS = ["player_uuid", "full_name", "primary_position", "team_name", "league_name", "season_code"]
+NUMERIC_COLUMNS = [
+    "age", "actual_value_eur", "predicted_value_eur", "value_diff_eur", "value_ratio", "MatchesPlayed",
+]
+RESULT_COLUMNS = [
+    "player_uuid", "full_name", "primary_position", "team_name", "league_name", "age", "season_code",
+    "actual_value_eur", "predicted_value_eur", "value_diff_eur", "value_ratio", "MatchesPlayed",
+]
+SORT_KEYS = ("value_diff_eur", "value_ratio", "predicted_value_eur")
+ATTR_KEYS = ("league", "league_names", "age", "value", "pos", "matches")
+
+
+def _sort_orders(columns: dict) -> dict:
+    """Permutaciones estables desc/asc por cada clave de orden (NaN siempre al final)."""
+    orders = {}
+    for key in SORT_KEYS:
+        values = np.asarray(columns[key], dtype=np.float64)
+        nan = np.isnan(values)
+        desc = np.lexsort((np.where(nan, 0.0, -values), nan))
+        asc = np.lexsort((np.where(nan, 0.0, values), nan))
+        orders[f"order_desc__{key}"] = desc.astype(np.int32)
+        orders[f"order_asc__{key}"] = asc.astype(np.int32)
+    return orders
+
+
+def build_score_table(df) -> dict:
+    """
+    Arrays para np.savez a partir de un DataFrame con las columnas de
+    RESULT_COLUMNS (la población completa con sus predicciones).
+    """
+    import pandas as pd
+    from .neighbors import build_player_attributes
+
+    table = {}
+    for col in TEXT_COLUMNS:
+        table[col] = np.asarray(["" if pd.isna(v) else str(v) for v in df[col]], dtype=str)
+    for col in NUMERIC_COLUMNS:
+        table[col] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    attrs = build_player_attributes(
+        df, league_col="league_name", age_col="age", value_col="actual_value_eur",
+        pos_col="primary_position", matches_col="MatchesPlayed",
+    )
+    table.update({f"attr__{k}": v for k, v in attrs.items()})
+    table.update(_sort_orders(table))
+    return table
+
 
 class MarketValueService:
     def __init__(self):
         logging.info("Cargando servicio de oportunidades de mercado...")
-        
+        # Huella de los archivos servidos (ETag de /market-opportunities y hot reload)
+        self.fingerprint, self.modified_at = artifact_fingerprint(self.artifact_paths())
+
         try:
-            with open(OPPORTUNITIES_FILE, "r") as f:
-                # Cargamos toda la lista (son solo 200)
-                self.opportunities_cache = json.load(f)
-            
-            logging.info(f"✅ Oportunidades de mercado cargadas: {len(self.opportunities_cache)} jugadores.")
-        
+            if SCORES_FILE.exists():
+                with np.load(SCORES_FILE, allow_pickle=False) as data:
+                    self.table = {k: data[k] for k in data.files}
+                source = SCORES_FILE
+            else:
+                logging.warning(f"No se encontró {SCORES_FILE}: usando {OPPORTUNITIES_FILE} (sólo top 200).")
+                self.table = self._table_from_json()
+                source = OPPORTUNITIES_FILE
+
+            self.n_rows = len(self.table["player_uuid"])
+            self.undervalued = self.table["value_diff_eur"] > 0
+            self.attributes = PlayerAttributes(
+                {k: self.table[f"attr__{k}"] for k in ATTR_KEYS if f"attr__{k}" in self.table},
+                self.n_rows,
+            )
+            logging.info(f"✅ Oportunidades de mercado cargadas desde {source}: {self.n_rows} jugadores.")
+
         except FileNotFoundError:
             logging.error(f"Error: No se encontró el archivo '{OPPORTUNITIES_FILE}'.")
             logging.error("Asegúrate de haber ejecutado 'python scripts/build_market_opportunities.py' primero.")
-            self.opportunities_cache = [] # Iniciar vacío si falla
+            self.table = None # Iniciar vacío si falla
+            self.n_rows = 0
+            self.attributes = None
+            self.undervalued = None
         except Exception as e:
-            logging.error(f"Error al cargar {OPPORTUNITIES_FILE}: {e}")
-            self.opportunities_cache = []
+            logging.error(f"Error al cargar las oportunidades de mercado: {e}")
             raise
 
+    @staticmethod
+    def _table_from_json() -> dict:
+        import pandas as pd
+
+        with open(OPPORTUNITIES_FILE, "r") as f:
+            records = json.load(f)
+        if not isinstance(records, list):
+            raise ValueError(f"{OPPORTUNITIES_FILE} no es una lista de jugadores.")
+        df = pd.DataFrame.from_records(records)
+        for col in RESULT_COLUMNS:
+            if col not in df.columns:
+                df[col] = None
+        return build_score_table(df)
+
+    @staticmethod
+    def artifact_paths():
+        return [SCORES_FILE, OPPORTUNITIES_FILE]
+
+    def validate(self, previous=None, force: bool = False):
+        """Chequeo antes del hot reload: ValueError deja en servicio la tabla anterior."""
+        if self.table is None:
+            if previous is not None and previous.n_rows and not force:
+                raise ValueError("No hay oportunidades de mercado para cargar; usar force para aceptarlo.")
+            return
+        for col in RESULT_COLUMNS:
+            if col not in self.table or len(self.table[col]) != self.n_rows:
+                raise ValueError(f"Columna '{col}' ausente o desalineada en la tabla de oportunidades.")
+        for key in SORT_KEYS:
+            for direction in ("desc", "asc"):
+                order = self.table.get(f"order_{direction}__{key}")
+                if order is None or len(order) != self.n_rows:
+                    raise ValueError(f"Permutación de orden '{key}' ausente o desalineada.")
+
+    # ---------- consulta ----------
+
+    def query(self, filters: PlayerFilters = None, sort_by: str = "value_diff_eur", descending: bool = True,
+              limit: int = 50, undervalued_only: bool = True, after: int = None):
+        """
+        Filas filtradas y ordenadas: (filas, posición de la última fila en la
+        permutación o None si no hay más). `after` es esa posición de la
+        página anterior (keyset sobre la permutación, sin OFFSET); sólo
+        vale para esta misma tabla (self.fingerprint), el cursor la lleva.
+        ValueError si el orden o un filtro no es válido.
+        """
+        if self.table is None:
+            return [], None
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Orden desconocido: {sort_by} (opciones: {', '.join(SORT_KEYS)})")
+
+        order = self.table[f"order_{'desc' if descending else 'asc'}__{sort_by}"]
+        start = 0 if after is None else int(after) + 1
+
+        mask = None
+        if filters is not None and not filters.is_empty():
+            mask = self.attributes.mask(filters)
+        if undervalued_only:
+            mask = self.undervalued if mask is None else (mask & self.undervalued)
+
+        tail = order[start:]
+        if mask is None:
+            picked = np.arange(min(limit + 1, len(tail)))
+        else:
+            picked = self._scan(mask, tail, limit + 1)
+        more = len(picked) > limit
+        picked = picked[:limit]
+        rows = self._rows(tail[picked])
+        last = int(start + picked[-1]) if more else None
+        return rows, last
+
+    @staticmethod
+    def _scan(mask: np.ndarray, order: np.ndarray, need: int) -> np.ndarray:
+        # Recorre la permutación por bloques y corta al juntar `need` filas:
+        # con filtros poco selectivos no se toca toda la población
+        chunk = max(4 * need, 1024)
+        found = []
+        total = 0
+        for lo in range(0, len(order), chunk):
+            hits = np.flatnonzero(mask[order[lo:lo + chunk]]) + lo
+            found.append(hits)
+            total += len(hits)
+            if total >= need:
+                break
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)[:need]
+
+    def _rows(self, idx: np.ndarray) -> list:
+        columns = [self.table[c][idx].tolist() for c in RESULT_COLUMNS]
+        rows = [dict(zip(RESULT_COLUMNS, values)) for values in zip(*columns)]
+        for row in rows:
+            for c in NUMERIC_COLUMNS:
+                if row[c] != row[c]:      # NaN -> null
+                    row[c] = None
+        return rows
+
     def get_opportunities(self, limit: int = 50):
         """
-        Devuelve la lista pre-calculada de oportunidades de mercado.
+        Devuelve las mejores oportunidades (mayor diferencia valor predicho - real).
         """
-        if not self.opportunities_cache:
-            return []
-            
-        # Devuelve la cantidad pedida (hasta 50 por defecto)
-        return self.opportunities_cache[:limit]
\ No newline at end of file
+        return self.query(limit=limit)[0]
+
+
+class ValuePredictor:
+    """
+    Valor de mercado predicho on-line con el modelo de
+    build_market_opportunities.py (entrenado sobre log1p del valor, con
+    las filas escaladas de field_features_matrix).
+    """
+
+    def __init__(self):
+        import joblib
+        # Import diferido: build_market_opportunities.py usa este módulo sin conexión a la BD del API
+        from .cache import predicted_value_cache
+
+        logging.info("Cargando modelo de valor de mercado...")
+        self.cache = predicted_value_cache
+        self.fingerprint, self.modified_at = artifact_fingerprint(self.artifact_paths())
+        self.model = joblib.load(VALUE_MODEL_FILE)
+        if hasattr(self.model, "n_jobs"):
+            self.model.n_jobs = VALUE_MODEL_JOBS
+        self.n_features = getattr(self.model, "n_features_in_", None)
+        logging.info(f"✅ Modelo de valor cargado ({self.n_features} features).")
+
+    @staticmethod
+    def artifact_paths():
+        return [VALUE_MODEL_FILE]
+
+    def validate(self, previous=None, force: bool = False):
+        if not hasattr(self.model, "predict"):
+            raise ValueError(f"{VALUE_MODEL_FILE} no es un modelo con predict().")
+        if self.n_features is None:
+            raise ValueError(f"{VALUE_MODEL_FILE} no declara n_features_in_.")
+        if previous is not None and previous.n_features != self.n_features and not force:
+            raise ValueError(
+                f"Cambió la cantidad de features del modelo ({previous.n_features} -> {self.n_features}); "
+                "usar force para aceptarlo."
+            )
+
+    def warm_up(self):
+        self.model.predict(np.zeros((1, self.n_features), dtype=np.float32))
+
+    def predict(self, index, uuids: list, version: str, attributes=None, features_fingerprint: str = None):
+        """
+        (resultados, no encontrados) para una lista de player_id. Los que no
+        están en la memo se predicen juntos en una sola llamada al forest.
+        `features_fingerprint` es la huella de los artefactos de similitud que
+        dan las filas de `index`: un rebuild de la matriz invalida la memo.
+        """
+        if index.matrix.shape[1] != self.n_features:
+            raise ValueError(
+                f"La matriz tiene {index.matrix.shape[1]} features y el modelo de valor {self.n_features}."
+            )
+        rows, not_found = {}, []
+        for uid in dict.fromkeys(str(u) for u in uuids):
+            try:
+                rows[uid] = index.row(uid)
+            except KeyError:
+                not_found.append(uid)
+
+        prefix = (version, self.fingerprint, features_fingerprint, index.matrix.shape)
+        predicted, missing = {}, []
+        for uid in rows:
+            value = self.cache.get((prefix, uid))
+            if value is None:
+                missing.append(uid)
+            else:
+                predicted[uid] = value
+        if missing:
+            X = index.matrix[[rows[uid] for uid in missing]]
+            with stage("model"):
+                values = np.expm1(self.model.predict(X))
+            for uid, value in zip(missing, values.tolist()):
+                self.cache.set((prefix, uid), value)
+                predicted[uid] = value
+
+        actual = None
+        if attributes is not None and "value" in attributes.columns:
+            actual = attributes.columns["value"]
+        results = []
+        for uid, row in rows.items():
+            item = {"player_uuid": uid, "predicted_value_eur": predicted[uid]}
+            if actual is not None:
+                mv = float(actual[row])
+                if mv == mv:
+                    item.update({
+                        "actual_value_eur": mv,
+                        "value_diff_eur": predicted[uid] - mv,
+                        "value_ratio": predicted[uid] / (mv + 1),
+                    })
+            results.append(item)
+        return results, not_found
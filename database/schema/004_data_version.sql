@@ -0,0 +1,7 @@
+-- Versión de los datos por fuente (la escribe upload_mv_to_supabase.py).
+-- El API la incluye en las claves de caché: una carga nueva invalida lo viejo.
+create table if not exists data_version (
+  source text primary key,          -- ej: players
+  version text not null,
+  updated_at timestamptz not null default now()
+);
@@ -0,0 +1,46 @@
+-- Vistas de lectura que usa el API (backend/app.py, similarity.py, search.py)
+-- sobre las tablas consolidadas que crea scripts/upload_mv_to_supabase.py.
+-- Sirve también para levantar un Postgres local de prueba (load tests).
+
+-- Jugadores de campo + arqueros en una sola vista, ordenada por valor
+create or replace view v_players_union_with_sort as
+select
+  player_id, player_name, club, "Nation" as nation, "Pos" as pos, dob, age,
+  market_value_eur as latest_mv_eur,
+  league_code, season_code, league_name,
+  false as is_gk,
+  "MatchesPlayed", "Gls", "Ast", "xG", "xAG", "Shots", "SoT",
+  "PassCmp", "PassAtt", "PassCmpPct", "Tkl", "TklW", "Blocks", "Int",
+  null::int as "GK_GA", null::numeric as "GK_GA90", null::int as "GK_SoTA",
+  null::int as "GK_Saves", null::numeric as "GK_SavePct", null::int as "GK_CS",
+  null::numeric as "GK_PSxG", null::numeric as "GK_PSxG_PlusMinus",
+  null::numeric as "GK_PSxG_PlusMinus_per90", null::numeric as "GK_OPA90",
+  null::numeric as "GK_PassCmpPct"
+from field_players_all
+union all
+select
+  player_id, player_name, club, "Nation", "Pos", dob, age,
+  market_value_eur,
+  league_code, season_code, league_name,
+  true,
+  null::numeric, null::int, null::int, null::numeric, null::numeric, null::int, null::int,
+  null::int, null::int, null::numeric, null::int, null::int, null::int, null::int,
+  "GK_GA", "GK_GA90", "GK_SoTA",
+  "GK_Saves", "GK_SavePct", "GK_CS",
+  "GK_PSxG", "GK_PSxG_PlusMinus",
+  "GK_PSxG_PlusMinus_per90", "GK_OPA90",
+  "GK_PassCmpPct"
+from goalkeepers_all
+order by latest_mv_eur desc nulls last;
+
+-- Ligas disponibles
+create or replace view v_leagues as
+select league_name from field_players_all where league_name is not null
+union
+select league_name from goalkeepers_all where league_name is not null;
+
+-- Clubes por liga
+create or replace view v_clubs_by_league as
+select league_name, club as team_name from field_players_all where club is not null
+union
+select league_name, club from goalkeepers_all where club is not null;
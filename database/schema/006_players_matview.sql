@@ -0,0 +1,63 @@
+-- Versión materializada de v_players_union_with_sort (ver 005_players_views.sql).
+-- El API y los scripts leen de acá (PLAYERS_VIEW en backend/db.py): la unión
+-- + orden se calcula una vez por carga y no en cada consulta.
+-- scripts/upload_mv_to_supabase.py la refresca (concurrently) después de cada carga.
+-- El API la usa con PLAYERS_VIEW=mv_players_union_with_sort (default: la vista).
+
+create extension if not exists pg_trgm;
+
+-- Versión anterior: row_key = row_number() global, cambiaba en cada refresh
+-- (CONCURRENTLY veía casi todas las filas como cambiadas). Se recrea.
+do $$
+begin
+  if exists (
+    select 1 from pg_attribute
+    where attrelid = to_regclass('mv_players_union_with_sort')
+      and attname = 'row_key' and atttypid = 'bigint'::regtype
+  ) then
+    drop materialized view mv_players_union_with_sort;
+  end if;
+end $$;
+
+-- row_key estable entre refreshes: hash de (arquero, liga, temporada,
+-- jugador, nombre, club). El row_number sólo desempata filas repetidas
+-- dentro de esa misma clave (player_id puede faltar).
+create materialized view if not exists mv_players_union_with_sort as
+select
+  md5(concat_ws(chr(31),
+    v.is_gk::int, coalesce(v.league_code, ''), coalesce(v.season_code::text, ''),
+    coalesce(v.player_id::text, ''), coalesce(v.player_name, ''), coalesce(v.club, ''),
+    row_number() over (
+      partition by v.is_gk, v.league_code, v.season_code, v.player_id, v.player_name, v.club
+      order by v.latest_mv_eur desc nulls last, v.age
+    )
+  )) as row_key,
+  v.*
+from v_players_union_with_sort v
+order by latest_mv_eur desc nulls last;
+
+-- Índice único: requisito de REFRESH MATERIALIZED VIEW CONCURRENTLY
+create unique index if not exists ux_mv_players_row_key
+  on mv_players_union_with_sort (row_key);
+
+-- /player/{id}/details, similares (player_id IN (...)), índice de búsqueda
+create index if not exists ix_mv_players_player_id
+  on mv_players_union_with_sort (player_id, season_code desc);
+
+-- /clubs/{club}/players: igualdad usa el btree, ILIKE (ej. '%united%') el trigram
+create index if not exists ix_mv_players_club
+  on mv_players_union_with_sort (club);
+create index if not exists ix_mv_players_club_trgm
+  on mv_players_union_with_sort using gin (club gin_trgm_ops);
+
+-- Filtros por liga
+create index if not exists ix_mv_players_league_name
+  on mv_players_union_with_sort (league_name);
+
+-- Orden por valor de mercado (el "with_sort" de la vista)
+create index if not exists ix_mv_players_mv_eur
+  on mv_players_union_with_sort (latest_mv_eur desc nulls last);
+
+-- Búsqueda por nombre (player_name ILIKE '%q%', fallback de /players/search)
+create index if not exists ix_mv_players_name_trgm
+  on mv_players_union_with_sort using gin (player_name gin_trgm_ops);
@@ -0,0 +1,12 @@
+-- Índices para la paginación por cursor (keyset) de backend/pagination.py:
+-- las consultas siguen con (player_name, player_id) > (:after_name, :after_id)
+-- ORDER BY player_name, player_id, así que la página N es un range scan
+-- igual de barato que la primera.
+
+-- /players/search (fallback SQL)
+create index if not exists ix_mv_players_name_id
+  on mv_players_union_with_sort (player_name, player_id);
+
+-- /clubs/{club}/players con el nombre exacto del club
+create index if not exists ix_mv_players_club_name_id
+  on mv_players_union_with_sort (club, player_name, player_id);
@@ -0,0 +1,108 @@
+# scripts/bench_db_pool.py
+# ============================================================
+# Benchmark de modos de pool (backend/db.py) bajo concurrencia
+# ------------------------------------------------------------
+# Para cada modo y cada nivel de concurrencia, N hilos ejecutan la misma
+# consulta durante D segundos y se reporta:
+#   - ops/s y latencia p50/p95/p99 (checkout + consulta)
+#   - espera de checkout p50/p95 (tiempo hasta tener la conexión)
+#   - overflow máximo observado (sólo modo queue)
+#
+# Modos:
+#   queue        pool en la app con pre_ping (conexión directa, 5432)
+#   queue-noping pool en la app sin pre_ping
+#   null         NullPool: cada checkout abre conexión (pooler 6543)
+#
+# Ejemplos
+#   python scripts/bench_db_pool.py
+#   DB_PORT=6543 python scripts/bench_db_pool.py --modes null queue-noping --concurrency 1 8 32
+#   python scripts/bench_db_pool.py --sql "SELECT * FROM mv_players_union_with_sort LIMIT 50"
+# ============================================================
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import text
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from backend.db import DB_URL, make_engine, pool_status  # noqa: E402
+
+MODES = {
+    "queue": ("queue", {"pool_pre_ping": True}),
+    "queue-noping": ("queue", {"pool_pre_ping": False}),
+    "null": ("null", {}),
+}
+
+
+def worker(engine, sql, deadline, out):
+    lat, waits, overflow = [], [], -10**9
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        with engine.connect() as conn:
+            t1 = time.perf_counter()
+            conn.execute(sql).fetchall()
+        lat.append(time.perf_counter() - t0)
+        waits.append(t1 - t0)
+        overflow = max(overflow, pool_status(engine).get("overflow", overflow))
+    out.append((lat, waits, overflow))
+
+
+def run(mode: str, concurrency: int, seconds: float, sql) -> dict:
+    pool_mode, overrides = MODES[mode]
+    if pool_mode == "queue":
+        # Pool acotado a la concurrencia para que se vea la espera al saturar
+        overrides = {"pool_size": max(1, concurrency // 2), "max_overflow": max(0, concurrency // 4), **overrides}
+    engine = make_engine(DB_URL, pool_mode, **overrides)
+    try:
+        with engine.connect() as conn:      # calienta: primera conexión fuera de la medición
+            conn.execute(text("SELECT 1"))
+        out = []
+        deadline = time.perf_counter() + seconds
+        with ThreadPoolExecutor(max_workers=concurrency) as ex:
+            futures = [ex.submit(worker, engine, sql, deadline, out) for _ in range(concurrency)]
+            for f in futures:
+                f.result()
+    finally:
+        engine.dispose()
+
+    lat = np.concatenate([np.asarray(o[0]) for o in out]) * 1000
+    waits = np.concatenate([np.asarray(o[1]) for o in out]) * 1000
+    overflow = max(o[2] for o in out)
+    return {
+        "ops_s": len(lat) / seconds,
+        "p50": np.percentile(lat, 50), "p95": np.percentile(lat, 95), "p99": np.percentile(lat, 99),
+        "wait_p50": np.percentile(waits, 50), "wait_p95": np.percentile(waits, 95),
+        "overflow": overflow if overflow > -10**9 else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compara modos de pool de conexiones bajo concurrencia.")
+    ap.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    ap.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--sql", default="SELECT 1")
+    args = ap.parse_args()
+
+    if DB_URL.startswith("duckdb"):
+        raise SystemExit("Configurá DB_HOST/DB_USER/DB_PASSWORD: el benchmark mide Postgres/pgbouncer.")
+
+    sql = text(args.sql)
+    print(f"{'modo':<14}{'conc':>6}{'ops/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'wait p50':>10}{'wait p95':>10}{'overflow':>10}")
+    for mode in args.modes:
+        for c in args.concurrency:
+            r = run(mode, c, args.seconds, sql)
+            overflow = "-" if r["overflow"] is None else str(r["overflow"])
+            print(f"{mode:<14}{c:>6}{r['ops_s']:>10.1f}{r['p50']:>9.2f}{r['p95']:>9.2f}{r['p99']:>9.2f}"
+                  f"{r['wait_p50']:>10.2f}{r['wait_p95']:>10.2f}{overflow:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# scripts/bench_etl_merge.py
+# ============================================================
+# Benchmark: merge_tables_chain (antes) vs align_tables (después)
+# ------------------------------------------------------------
+# Une el juego de tablas FBref de una liga/temporada por "Player" con los
+# dos motores de backend/etl.py y reporta tiempo, pico de memoria y si el
+# resultado coincide. Memoria:
+#   pico py  tracemalloc (objetos Python + buffers numpy)
+#   pico RSS VmHWM del proceso (Linux) en un fork por motor: incluye los
+#            buffers de Arrow de las columnas str de pandas, que tracemalloc
+#            no ve
+#
+# Entrada
+#   --league/--season : tablas de la caché de extracción (data/cache/fbref,
+#                       backend/extract_cache.py), tal como las usa run_etl.
+#   Sin --league: juego sintético con la forma de get_all_player_season_stats
+#   (11 tablas: stats, shooting, passing, passing_types, gca, defense,
+#   possession, playingtime, misc, keepers, keepersadv) de --players jugadores.
+#   Antes de unir se aplica la misma pre-limpieza que run_etl (clave
+#   normalizada, desduplicado, prefijos).
+#
+# Ejemplos
+#   python scripts/bench_etl_merge.py
+#   python scripts/bench_etl_merge.py --players 3000 --runs 5
+#   python scripts/bench_etl_merge.py --league ARG1 --season 2024
+# ============================================================
+
+import argparse
+import gc
+import multiprocessing as mp
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from backend.etl import (  # noqa: E402
+    JOIN_KEY, add_df_prefix, align_tables, ensure_unique, merge_tables_chain,
+    normalize_key_series, resolve_league,
+)
+from backend.extract_cache import extract_cache  # noqa: E402
+
+# tabla -> (columnas numéricas, fracción de jugadores que aparecen)
+FBREF_TABLES = {
+    "stats": (30, 1.00),
+    "shooting": (20, 0.97),
+    "passing": (28, 0.97),
+    "passing_types": (24, 0.97),
+    "gca": (22, 0.97),
+    "defense": (24, 0.97),
+    "possession": (28, 0.97),
+    "playingtime": (26, 1.00),
+    "misc": (22, 0.97),
+    "keepers": (24, 0.08),
+    "keepersadv": (30, 0.08),
+}
+# Columnas de identificación que FBref repite en cada tabla
+ID_COLS = ["Nation", "Pos", "Squad", "Age", "Born", "90s"]
+
+
+def synthetic_tables(n_players: int) -> list:
+    rng = np.random.default_rng(0)
+    players = np.array([f"Jugador {i} Pérez" for i in range(n_players)], dtype=object)
+    tables = []
+    for name, (n_cols, share) in FBREF_TABLES.items():
+        n = max(1, int(n_players * share))
+        idx = np.sort(rng.choice(n_players, n, replace=False))
+        data = {"Player": players[idx]}
+        for c in ID_COLS:
+            data[f"{name}_{c}"] = rng.integers(0, 40, n).astype(str)
+        for j in range(n_cols):
+            col = rng.random(n) * 100
+            data[f"{name}_m{j}"] = np.round(col, 1) if j % 2 else col.astype(np.int64)
+        # columnas sin prefijo (FBref repite 'Matches'/'Rk'): run_etl les pone
+        # el prefijo mayoritario -> choques entre passing y passing_types
+        data["Matches"] = "Matches"
+        data["Rk"] = np.arange(n)
+        tables.append((name, pd.DataFrame(data)))
+    return tables
+
+
+def prepare(tables: list) -> list:
+    """La pre-limpieza de run_etl (Paso 2a) sobre (nombre, DF)."""
+    out = []
+    for i, (_name, df) in enumerate(tables):
+        if JOIN_KEY not in df.columns:
+            continue
+        df = df.copy()
+        df[JOIN_KEY] = normalize_key_series(df[JOIN_KEY])
+        df = df.loc[:, ~df.columns.duplicated()]
+        df = df.drop_duplicates(subset=[JOIN_KEY])
+        out.append(add_df_prefix(df, prefix=f"t{i}", keep_cols={JOIN_KEY}))
+    return out
+
+
+def _proc_status(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _rss_child(fn, dfs, conn):
+    gc.collect()
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")  # reinicia VmHWM
+    base = _proc_status("VmRSS")
+    fn(dfs)
+    conn.send(_proc_status("VmHWM") - base)
+    conn.close()
+
+
+def peak_rss(fn, dfs):
+    """Pico de RSS (MB) sobre el estado inicial, en un fork; None si no hay /proc."""
+    if not os.path.exists("/proc/self/clear_refs") or "fork" not in mp.get_all_start_methods():
+        return None
+    ctx = mp.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_rss_child, args=(fn, dfs, child))
+    proc.start()
+    try:
+        return parent.recv() / 2**20
+    except (EOFError, OSError):
+        return None
+    finally:
+        proc.join()
+
+
+def measure(fn, dfs, runs: int):
+    best, peak, out = float("inf"), 0, None
+    for _ in range(runs):
+        out = None
+        gc.collect()
+        t = time.perf_counter()
+        out = fn(dfs)
+        best = min(best, time.perf_counter() - t)
+    # pico de memoria en una corrida aparte (tracemalloc enlentece)
+    out = None
+    gc.collect()
+    tracemalloc.start()
+    out = fn(dfs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="merge_tables_chain vs align_tables sobre las tablas FBref de una liga.")
+    ap.add_argument("--league", help="Código o nombre de liga (lee de la caché de extracción).")
+    ap.add_argument("--season", help="Temporada como la usa FBref (ej: 2024, 2024-2025).")
+    ap.add_argument("--players", type=int, default=600, help="Jugadores del juego sintético (una liga ≈ 500-700).")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.league:
+        tables = extract_cache.get(resolve_league(args.league), str(args.season), allow_stale=True)
+        if tables is None:
+            sys.exit(f"No hay tablas en caché para {args.league} {args.season} (correr backend/etl.py antes).")
+    else:
+        tables = synthetic_tables(args.players)
+
+    dfs = prepare(tables)
+    print(f"{len(dfs)} tablas | filas {min(len(d) for d in dfs)}-{max(len(d) for d in dfs)} | "
+          f"columnas totales {sum(d.shape[1] for d in dfs)}")
+
+    t_old, mem_old, old = measure(merge_tables_chain, dfs, args.runs)
+    t_new, mem_new, new = measure(align_tables, dfs, args.runs)
+    rss_old, rss_new = peak_rss(merge_tables_chain, dfs), peak_rss(align_tables, dfs)
+
+    def fmt(x):
+        return f"{x:>13.1f}" if x is not None else f"{'-':>13}"
+
+    print(f"{'':<20}{'tiempo ms':>11}{'pico py MB':>13}{'pico RSS MB':>13}")
+    print(f"{'merge_tables_chain':<20}{t_old * 1000:>11.1f}{fmt(mem_old)}{fmt(rss_old)}")
+    print(f"{'align_tables':<20}{t_new * 1000:>11.1f}{fmt(mem_new)}{fmt(rss_new)}")
+    print(f"speedup x{t_old / t_new:.1f}")
+
+    # Mismo resultado (salvo nombres de choques múltiples: _x/_y antes, __r2 ahora)
+    old.columns = ensure_unique(list(old.columns))
+    same_cols = list(old.columns) == list(new.columns)
+    print(f"Resultado: {new.shape[0]} filas x {new.shape[1]} columnas | mismas columnas: {same_cols}")
+    if same_cols:
+        try:
+            pd.testing.assert_frame_equal(old, new)
+            print("Mismos valores y dtypes: sí")
+        except AssertionError as e:
+            print("Diferencias:", str(e).splitlines()[:3])
+    else:
+        print("Sólo antes:", sorted(set(old.columns) - set(new.columns))[:10])
+        print("Sólo ahora:", sorted(set(new.columns) - set(old.columns))[:10])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# scripts/bench_etl_types.py
+# ============================================================
+# Benchmark: coerce_numeric (antes) vs parse_typed (después)
+# ------------------------------------------------------------
+# Tipa las columnas que selecciona run_etl() (METRICS_MAP) sobre una tabla
+# RAW unida y reporta tiempo, memoria del resultado y diferencias.
+#
+# Entrada
+#   --raw : data/raw/raw_merged_<LEAGUE>_<SEASON>.parquet (salida de backend/etl.py).
+#           Sin --raw se arma una RAW sintética con las filas de
+#           data/processed/join_*_mv.csv en formato FBref (texto con
+#           separador de miles, edad 'YY-DDD', ...), repetida --repeat veces.
+#   --numeric : en la sintética deja las métricas como números (caso en que
+#               parse_typed no las convierte a texto).
+#
+# Ejemplos
+#   python scripts/bench_etl_types.py
+#   python scripts/bench_etl_types.py --repeat 50 --numeric
+#   python scripts/bench_etl_types.py --raw data/raw/raw_merged_Premier_League_2024-2025.parquet
+# ============================================================
+
+import argparse
+import glob
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from backend.etl import METRICS_MAP, coerce_numeric  # noqa: E402
+from backend.etl_types import ETL_SCHEMA, TEXT, parse_typed  # noqa: E402
+
+TEXT_COLS = {"Player", "Nation", "Pos", "Squad", "Born"}   # los de coerce_numeric en run_etl
+
+
+def synthetic_raw(repeat: int, numeric: bool) -> pd.DataFrame:
+    files = sorted(glob.glob(str(ROOT / "data/processed/join_*_mv.csv")))
+    src = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+    src = pd.concat([src] * repeat, ignore_index=True)
+    n = len(src)
+    rng = np.random.default_rng(0)
+
+    age = src["age"].fillna(25).astype(int)
+    raw = {
+        "Player": src["player_name"].fillna(""),
+        "stats_Nation": src["Nation"],
+        "stats_Pos": src["Pos"],
+        "stats_Squad": src["club"],
+        "stats_Age": age.astype(str) + "-" + pd.Series(rng.integers(0, 365, n)).astype(str).str.zfill(3),
+        "stats_Born": pd.to_datetime(src["dob"], errors="coerce").dt.year.astype("Int64").astype(str),
+    }
+    for final in ETL_SCHEMA:
+        src_col = next((k for k, v in METRICS_MAP.items() if v == final), None)
+        if src_col in raw or src_col is None or final not in src.columns:
+            continue
+        values = src[final]
+        if numeric:
+            raw[src_col] = values
+        elif final in ("PassCmp", "PassAtt"):
+            raw[src_col] = values.map(lambda x: "" if pd.isna(x) else f"{int(x):,}")
+        else:
+            raw[src_col] = values.map(lambda x: "" if pd.isna(x) else str(x))
+    return pd.DataFrame(raw)
+
+
+def select(raw: pd.DataFrame) -> pd.DataFrame:
+    cols = {src: dst for src, dst in METRICS_MAP.items() if src in raw.columns}
+    return raw[list(cols)].rename(columns=cols)
+
+
+def timed(fn, df, runs):
+    best, out = float("inf"), None
+    for _ in range(runs):
+        d = df.copy()
+        t = time.perf_counter()
+        out = fn(d)
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="coerce_numeric vs parse_typed sobre una RAW unida.")
+    ap.add_argument("--raw", help="Parquet raw_merged_*.parquet (default: RAW sintética).")
+    ap.add_argument("--repeat", type=int, default=20, help="Repeticiones de la RAW sintética.")
+    ap.add_argument("--numeric", action="store_true", help="RAW sintética con métricas ya numéricas.")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    raw = pd.read_parquet(args.raw) if args.raw else synthetic_raw(args.repeat, args.numeric)
+    df = select(raw)
+    print(f"Tabla: {len(df):,} filas x {df.shape[1]} columnas")
+
+    t_old, old = timed(lambda d: coerce_numeric(d, text_cols=TEXT_COLS), df, args.runs)
+    t_new, new = timed(lambda d: parse_typed(d, ETL_SCHEMA), df, args.runs)
+
+    mem_old = old.memory_usage(deep=True).sum() / 2**20
+    mem_new = new.memory_usage(deep=True).sum() / 2**20
+    print(f"{'':<16}{'tiempo s':>10}{'memoria MB':>12}")
+    print(f"{'coerce_numeric':<16}{t_old:>10.3f}{mem_old:>12.1f}")
+    print(f"{'parse_typed':<16}{t_new:>10.3f}{mem_new:>12.1f}")
+    print(f"speedup x{t_old / t_new:.1f}")
+
+    # Mismos valores (Age pasa a texto a propósito: ver backend/etl_types.py)
+    diffs = []
+    for c in df.columns:
+        if ETL_SCHEMA.get(c) == TEXT or c in TEXT_COLS:
+            continue
+        a = old[c].to_numpy(dtype=np.float64)
+        b = new[c].to_numpy(dtype=np.float64)
+        if not np.allclose(a, b, rtol=1e-6, atol=1e-6):
+            diffs.append(c)
+    print("Diferencias:", diffs or "ninguna")
+    print("dtypes:", dict(new.dtypes.astype(str)))
+
+
+if __name__ == "__main__":
+    main()
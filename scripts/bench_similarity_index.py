@@ -0,0 +1,95 @@
+# scripts/bench_similarity_index.py
+# ============================================================
+# Benchmark: índice exacto vs IVF aproximado (recall@k y latencia)
+# ------------------------------------------------------------
+# Usa la matriz de models/<prefix>_features_matrix.joblib, o una matriz
+# sintética (--synthetic N) para simular el catálogo completo.
+# Para cada nprobe reporta recall@k contra el exacto y p50/p99 por consulta.
+#
+# Ejemplos
+#   python scripts/bench_similarity_index.py
+#   python scripts/bench_similarity_index.py --synthetic 200000 --nprobe 4 8 16 32
+# ============================================================
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from backend.neighbors import IVFIndex, NeighborIndex, build_ivf
+
+MODEL_DIR = Path("models")
+
+
+def load_matrix(prefix: str):
+    matrix = joblib.load(MODEL_DIR / f"{prefix}_features_matrix.joblib")
+    with open(MODEL_DIR / f"{prefix}_player_index.json", "r") as f:
+        ids = json.load(f)
+    return matrix, ids
+
+
+def synthetic_matrix(n: int, dim: int, seed: int = 0):
+    # Mezcla de gaussianas: parecido a perfiles por posición/rol
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=3.0, size=(32, dim))
+    X = centers[rng.integers(0, len(centers), n)] + rng.normal(size=(n, dim))
+    return X, [str(i) for i in range(n)]
+
+
+def time_queries(searcher, rows, k):
+    lat, results = [], []
+    for r in rows:
+        t0 = time.perf_counter()
+        found, _ = searcher.search(int(r), k)
+        lat.append((time.perf_counter() - t0) * 1000)
+        results.append(found)
+    return np.array(lat), results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Recall@k y latencia del índice IVF vs exacto.")
+    ap.add_argument("--prefix", default="field", help="Prefijo de artefactos en models/ (field|gk).")
+    ap.add_argument("--synthetic", type=int, default=0, help="Usar N filas sintéticas en vez de models/.")
+    ap.add_argument("--dim", type=int, default=8, help="Dimensión de la matriz sintética.")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--n-lists", type=int, default=0, help="Listas IVF (0 = 4·sqrt(n)).")
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = ap.parse_args()
+
+    if args.synthetic:
+        matrix, ids = synthetic_matrix(args.synthetic, args.dim)
+    else:
+        matrix, ids = load_matrix(args.prefix)
+
+    exact = NeighborIndex(matrix, ids)
+    print(f"Matriz: {exact.matrix.shape[0]} filas × {exact.matrix.shape[1]} features")
+
+    t0 = time.perf_counter()
+    ivf = build_ivf(exact.matrix, n_lists=args.n_lists)
+    print(f"IVF: {len(ivf['centroids'])} listas, build {time.perf_counter() - t0:.2f}s\n")
+
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(exact), size=min(args.queries, len(exact)), replace=False)
+
+    lat_exact, truth = time_queries(exact, rows, args.k)
+    print(f"{'índice':<14}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'exacto':<14}{1.0:>10.3f}{np.percentile(lat_exact, 50):>10.3f}{np.percentile(lat_exact, 99):>10.3f}")
+
+    for nprobe in args.nprobe:
+        searcher = IVFIndex(exact, ivf["centroids"], ivf["order"], ivf["offsets"], nprobe=nprobe)
+        lat, found = time_queries(searcher, rows, args.k)
+        recall = np.mean([
+            len(set(f.tolist()) & set(t.tolist())) / max(len(t), 1) for f, t in zip(found, truth)
+        ])
+        label = f"ivf nprobe={searcher.nprobe}"
+        print(f"{label:<14}{recall:>10.3f}{np.percentile(lat, 50):>10.3f}{np.percentile(lat, 99):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
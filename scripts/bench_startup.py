@@ -0,0 +1,99 @@
+# scripts/bench_startup.py
+# ============================================================
+# Benchmark de arranque del API
+# ------------------------------------------------------------
+# Levanta uvicorn en un puerto libre y mide, desde el spawn del proceso:
+#   - import:  tiempo de `import backend.app` (proceso aparte)
+#   - healthz: primer 200 de /healthz (proceso escuchando)
+#   - readyz:  primer 200 de /readyz (modelos cargados, BD, warm-up)
+# y el detalle por servicio que reporta /readyz.
+#
+# Ejemplos
+#   python scripts/bench_startup.py
+#   python scripts/bench_startup.py --runs 5 --ready-timeout 120
+# ============================================================
+
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_import() -> float:
+    code = "import time; t = time.perf_counter(); import backend.app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(client, path, t0, timeout, proc):
+    while time.perf_counter() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn terminó con código {proc.returncode}")
+        try:
+            r = client.get(path)
+            if r.status_code == 200:
+                return time.perf_counter() - t0, r
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None, None
+
+
+def run_once(ready_timeout: float) -> dict:
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=2.0) as client:
+            healthz, _ = wait_for(client, "/healthz", t0, 60, proc)
+            readyz, r = wait_for(client, "/readyz", t0, ready_timeout, proc)
+            status = r.json() if r is not None else client.get("/readyz").json()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"healthz": healthz, "readyz": readyz, "status": status}
+
+
+def fmt(x):
+    return "   n/a" if x is None else f"{x:6.3f}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tiempo hasta liveness/readiness del API.")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--ready-timeout", type=float, default=60.0, help="Segundos máximos esperando /readyz.")
+    args = ap.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    print(f"import backend.app: p50 {np.median(imports):.3f}s\n")
+
+    print(f"{'run':<5}{'healthz s':>11}{'readyz s':>11}")
+    last = None
+    for i in range(args.runs):
+        res = run_once(args.ready_timeout)
+        print(f"{i + 1:<5}{fmt(res['healthz']):>11}{fmt(res['readyz']):>11}")
+        last = res["status"]
+
+    print("\nÚltimo /readyz:")
+    print(json.dumps(last, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
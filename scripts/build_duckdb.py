@@ -0,0 +1,206 @@
+# scripts/build_duckdb.py
+# ============================================================
+# Base local DuckDB para servir el API sin red (modo offline)
+# ------------------------------------------------------------
+# Construye data/tpo.duckdb directo de data/processed/join_*_mv.csv con el
+# scan nativo de DuckDB (read_csv_auto / read_parquet, sin pandas) y crea lo
+# mismo que lee el API en Postgres:
+#   - field_players_all / goalkeepers_all  (= upload_mv_to_supabase.py)
+#   - v_players_union_with_sort, v_leagues, v_clubs_by_league
+#     (database/schema/005_players_views.sql, ejecutado tal cual)
+#   - mv_players_union_with_sort: tabla (DuckDB no tiene vistas
+#     materializadas) con el mismo row_key y orden que 006_players_matview.sql
+#   - data_version con una versión nueva de "players"
+# Se escribe a un archivo temporal y se reemplaza al final.
+#
+# Servir el API desde el archivo:
+#   DB_BACKEND=duckdb uvicorn backend.app:app
+#
+# Ejemplos
+#   python scripts/build_duckdb.py
+#   python scripts/build_duckdb.py --source "data/processed/join_*_mv.parquet" --out /tmp/tpo.duckdb
+# ============================================================
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import duckdb
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from upload_mv_to_supabase import LEAGUE_NAMES, PLAYERS_MATVIEW  # noqa: E402
+
+SOURCE_GLOB = os.getenv("DUCKDB_SOURCE", "data/processed/join_*_mv.csv")
+OUT_PATH = os.getenv("DUCKDB_PATH", "data/tpo.duckdb")
+VIEWS_SQL = ROOT / "database" / "schema" / "005_players_views.sql"
+
+# Mismos tipos que el DDL de upload_mv_to_supabase.py (numeric -> DOUBLE)
+COMMON_COLUMNS = [
+    ("player_id", "BIGINT"), ("player_name", "VARCHAR"), ("club", "VARCHAR"),
+    ("Nation", "VARCHAR"), ("Pos", "VARCHAR"), ("dob", "DATE"), ("age", "INTEGER"),
+    ("market_value_eur", "DOUBLE"),
+]
+FIELD_COLUMNS = [
+    ("MatchesPlayed", "DOUBLE"), ("Gls", "INTEGER"), ("Ast", "INTEGER"), ("xG", "DOUBLE"),
+    ("xAG", "DOUBLE"), ("Shots", "INTEGER"), ("SoT", "INTEGER"), ("PassCmp", "INTEGER"),
+    ("PassAtt", "INTEGER"), ("PassCmpPct", "DOUBLE"), ("Tkl", "INTEGER"), ("TklW", "INTEGER"),
+    ("Blocks", "INTEGER"), ("Int", "INTEGER"),
+]
+GK_COLUMNS = [
+    ("GK_GA", "INTEGER"), ("GK_GA90", "DOUBLE"), ("GK_SoTA", "INTEGER"), ("GK_Saves", "INTEGER"),
+    ("GK_SavePct", "DOUBLE"), ("GK_CS", "INTEGER"), ("GK_CSPct", "DOUBLE"), ("GK_PKAtt", "INTEGER"),
+    ("GK_PKA", "INTEGER"), ("GK_PKsv", "INTEGER"), ("GK_PKm", "INTEGER"), ("GK_PSxG", "DOUBLE"),
+    ("GK_PSxG_per_SoT", "DOUBLE"), ("GK_PSxG_PlusMinus", "DOUBLE"), ("GK_PSxG_PlusMinus_per90", "DOUBLE"),
+    ("GK_PassCmp", "INTEGER"), ("GK_PassAtt", "INTEGER"), ("GK_PassCmpPct", "DOUBLE"),
+    ("GK_GKPassAtt", "INTEGER"), ("GK_Throws", "INTEGER"), ("GK_LaunchPct", "DOUBLE"),
+    ("GK_AvgLen", "DOUBLE"), ("GK_CrossesStp", "INTEGER"), ("GK_CrossesStpPct", "DOUBLE"),
+    ("GK_OPA", "INTEGER"), ("GK_OPA90", "DOUBLE"), ("GK_OPA_AvgDist", "DOUBLE"),
+]
+LEAGUE_COLUMNS = [("league_code", "VARCHAR"), ("season_code", "VARCHAR"), ("league_name", "VARCHAR")]
+
+
+def q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def scan_sql(source: str) -> str:
+    path = source.replace("'", "''")
+    if source.endswith(".parquet"):
+        return f"read_parquet('{path}', union_by_name = true, filename = true)"
+    return f"read_csv_auto('{path}', union_by_name = true, filename = true)"
+
+
+def stage_raw(con, source: str):
+    """
+    Todas las filas de todos los archivos con liga/temporada sacadas del
+    nombre (join_bel_2025_2026_mv.csv -> bel, 2025-2026), nombre/club
+    completados por player_id dentro del archivo e IsGK derivado de Pos
+    cuando falta (mismas reglas que clean_and_split).
+    """
+    con.execute("CREATE TEMP TABLE league_names (code VARCHAR, name VARCHAR)")
+    con.executemany("INSERT INTO league_names VALUES (?, ?)", list(LEAGUE_NAMES.items()))
+    con.execute(f"""
+        CREATE TEMP TABLE raw AS
+        WITH src AS (
+            SELECT
+                *,
+                lower(regexp_extract(parse_filename(filename, true), '^join_([^_]+)_(.*)_mv$', 1)) AS league_code,
+                replace(regexp_extract(parse_filename(filename, true), '^join_([^_]+)_(.*)_mv$', 2), '_', '-') AS season_code,
+                nullif(trim(CAST(player_name AS VARCHAR)), '') AS name_clean,
+                nullif(trim(CAST(club AS VARCHAR)), '') AS club_clean
+            FROM {scan_sql(source)}
+        )
+        SELECT
+            src.* EXCLUDE (player_name, club, name_clean, club_clean),
+            coalesce(name_clean, any_value(name_clean) OVER (PARTITION BY filename, player_id)) AS player_name,
+            coalesce(club_clean, any_value(club_clean) OVER (PARTITION BY filename, player_id)) AS club,
+            coalesce(ln.name, upper(src.league_code)) AS league_name,
+            CASE
+                WHEN nullif(trim(CAST("IsGK" AS VARCHAR)), '') IS NOT NULL
+                    THEN lower(trim(CAST("IsGK" AS VARCHAR))) IN ('true', '1', 't', 'yes', 'y')
+                WHEN "Pos" IS NOT NULL
+                    THEN list_contains(list_transform(string_split(upper("Pos"), ','), p -> trim(p)), 'GK')
+            END AS is_gk
+        FROM src
+        LEFT JOIN league_names ln ON ln.code = src.league_code
+        WHERE src.league_code <> ''
+    """)
+    cols = {r[0] for r in con.execute("DESCRIBE raw").fetchall()}
+    return cols
+
+
+def create_table(con, name: str, columns, is_gk: bool, available: set):
+    select = []
+    for col, typ in columns:
+        if col in available:
+            if typ in ("INTEGER", "BIGINT"):
+                # Los CSV traen enteros como 418560.0
+                expr = f"CAST(round(TRY_CAST({q(col)} AS DOUBLE)) AS {typ})"
+            else:
+                expr = f"TRY_CAST({q(col)} AS {typ})"
+        else:
+            expr = f"CAST(NULL AS {typ})"
+        select.append(f"{expr} AS {q(col)}")
+    con.execute(f"""
+        CREATE TABLE {name} AS
+        SELECT {", ".join(select)}
+        FROM raw
+        WHERE is_gk = {str(is_gk).upper()}
+    """)
+    return con.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+
+
+def build(source: str, out: str):
+    out_path = Path(out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    for p in (tmp, Path(str(tmp) + ".wal")):
+        if p.exists():
+            p.unlink()
+
+    t0 = time.perf_counter()
+    con = duckdb.connect(str(tmp))
+    try:
+        available = stage_raw(con, source)
+        files = con.execute("SELECT count(DISTINCT filename) FROM raw").fetchone()[0]
+        if not files:
+            raise SystemExit(f"No encontré archivos con patrón: {source}")
+
+        n_of = create_table(con, "field_players_all", COMMON_COLUMNS + FIELD_COLUMNS + LEAGUE_COLUMNS, False, available)
+        n_gk = create_table(con, "goalkeepers_all", COMMON_COLUMNS + GK_COLUMNS + LEAGUE_COLUMNS, True, available)
+        con.execute("DROP TABLE raw")
+
+        # Las mismas vistas que Postgres (el SQL de 005 corre tal cual en DuckDB)
+        con.execute(VIEWS_SQL.read_text(encoding="utf-8"))
+
+        # 006_players_matview.sql como tabla: mismo row_key y orden
+        con.execute(f"""
+            CREATE TABLE {PLAYERS_MATVIEW} AS
+            SELECT
+                md5(concat_ws(chr(31),
+                    v.is_gk::INT, coalesce(v.league_code, ''), coalesce(v.season_code::VARCHAR, ''),
+                    coalesce(v.player_id::VARCHAR, ''), coalesce(v.player_name, ''), coalesce(v.club, ''),
+                    row_number() OVER (
+                        PARTITION BY v.is_gk, v.league_code, v.season_code, v.player_id, v.player_name, v.club
+                        ORDER BY v.latest_mv_eur DESC NULLS LAST, v.age
+                    )
+                )) AS row_key,
+                v.*
+            FROM v_players_union_with_sort v
+            ORDER BY latest_mv_eur DESC NULLS LAST
+        """)
+        con.execute(f"CREATE INDEX ix_mv_players_player_id ON {PLAYERS_MATVIEW} (player_id)")
+
+        con.execute("""
+            CREATE TABLE data_version (
+                source VARCHAR PRIMARY KEY,
+                version VARCHAR NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )
+        """)
+        version = uuid.uuid4().hex
+        con.execute("INSERT INTO data_version VALUES ('players', ?, now()::TIMESTAMP)", [version])
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+
+    os.replace(tmp, out_path)
+    print(f"{files} archivos -> {out_path}  OF={n_of}  GK={n_gk}  "
+          f"data_version[players]={version}  ({time.perf_counter() - t0:.2f}s)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Construye la base DuckDB local desde los CSV/Parquet procesados.")
+    ap.add_argument("--source", default=SOURCE_GLOB, help="Glob de join_*_mv.csv o .parquet.")
+    ap.add_argument("--out", default=OUT_PATH, help="Archivo DuckDB de salida.")
+    args = ap.parse_args()
+    build(args.source, args.out)
+
+
+if __name__ == "__main__":
+    main()
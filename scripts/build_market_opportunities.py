@@ -10,9 +10,15 @@ from sqlalchemy import create_engine, text # <-- Import text
 from sqlalchemy.engine import URL
 from dotenv import load_dotenv
 import os
+import sys
+import uuid
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from backend.neighbors import save_npz_atomic
+from backend.value import RESULT_COLUMNS, SCORES_FILE, build_score_table
+
 # --- Configuración ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 log = logging.getLogger()
@@ -20,6 +26,8 @@ log = logging.getLogger()
 load_dotenv(override=True)
 
 MODEL_DIR = Path("models")
+# Misma fuente que el API (ver backend/db.py y database/schema/006_players_matview.sql)
+PLAYERS_VIEW = os.getenv("PLAYERS_VIEW", "v_players_union_with_sort")
 
 # --- Lógica de conexión ---
 DB_HOST = os.getenv("DB_HOST")
@@ -59,16 +67,41 @@ def get_db_connection():
         max_overflow=5,
     )
 
+def write_data_version(engine, source):
+    """
+    Versión nueva en la tabla data_version (ver database/schema/004_data_version.sql):
+    el API la usa en los ETags, así los clientes ven la lista nueva.
+    """
+    version = uuid.uuid4().hex
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                create table if not exists data_version (
+                  source text primary key,
+                  version text not null,
+                  updated_at timestamptz not null default now()
+                );
+            """))
+            conn.execute(text("""
+                insert into data_version (source, version, updated_at)
+                values (:s, :v, now())
+                on conflict (source) do update set version = excluded.version, updated_at = now();
+            """), {"s": source, "v": version})
+        log.info(f"data_version[{source}] = {version}")
+    except Exception as e:
+        # El JSON ya quedó escrito; el ETag igual cambia por la huella del archivo
+        log.warning(f"No se pudo escribir data_version[{source}]: {e}")
+
 def fetch_player_data(engine):
     """
     Obtiene todos los datos de la vista para compararlos
     """
-    log.info("Obteniendo todos los datos de v_players_union_with_sort...")
+    log.info(f"Obteniendo todos los datos de {PLAYERS_VIEW}...")
     
     # --- INICIO DE LA CORRECCIÓN ---
     # 1. Cambiamos "Min" por "MatchesPlayed"
     #    (Asegúrate de que 'v_players_union_with_sort' tiene la columna "MatchesPlayed")
-    sql = text("""
+    sql = text(f"""
     SELECT 
         player_id, 
         player_name, 
@@ -80,7 +113,7 @@ def fetch_player_data(engine):
         age, 
         "MatchesPlayed" 
     FROM 
-        v_players_union_with_sort
+        {PLAYERS_VIEW}
     WHERE
         pos != 'GK'
     """)
@@ -178,9 +211,21 @@ def main():
         })
         
         top_200_opportunities = opportunities.head(200)
+
+        # Población completa (no sólo el top 200) en columnas tipadas para
+        # el motor de consulta del API (backend/value.py)
+        scored = results_df.rename(columns={
+            'player_id': 'player_uuid',
+            'player_name': 'full_name',
+            'pos': 'primary_position',
+            'club': 'team_name',
+        })[RESULT_COLUMNS]
+        save_npz_atomic(SCORES_FILE, **build_score_table(scored))
+        log.info(f"Población puntuada guardada en '{SCORES_FILE}' ({len(scored)} jugadores).")
         
         output_path = MODEL_DIR / "market_opportunities.json"
         top_200_opportunities.to_json(output_path, orient='records', indent=2)
+        write_data_version(engine, "market_opportunities")
         
         log.info(f"✅ ¡Éxito! Lista de oportunidades de mercado guardada en '{output_path}'")
 
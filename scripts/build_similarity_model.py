@@ -1,7 +1,9 @@
 # scripts/build_similarity_model.py
 import os
+import sys
 import json
 import joblib
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from sqlalchemy import create_engine, text
@@ -10,6 +12,9 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.neighbors import NearestNeighbors
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from backend.neighbors import build_ivf, build_player_attributes, save_mmap_artifacts, save_npz_atomic
+
 # ======================
 # 0) Config & helpers
 # ======================
@@ -22,6 +27,10 @@ TARGET_SEASON = os.getenv("TARGET_SEASON", "2025")
 MIN_MINUTES_PLAYED = int(os.getenv("MIN_MINUTES_PLAYED", "500"))
 N_NEIGHBORS = int(os.getenv("N_NEIGHBORS", "10"))
 
+# Índice aproximado IVF opcional (el API lo usa con SIMILARITY_INDEX=ivf)
+BUILD_IVF = os.getenv("BUILD_IVF", "0") == "1"
+IVF_N_LISTS = int(os.getenv("IVF_N_LISTS", "0"))  # 0 = automático (4·sqrt(n))
+
 # Cols candidatas para CAMPO (según tu tabla public.field_players_all)
 FP_FEATURE_CANDIDATES = [
     "Min", "MatchesPlayed", "Gls", "Ast", "xG", "xAG",
@@ -39,6 +48,23 @@ GK_ID_CANDIDATES = ["player_id", "player_uuid"]
 
 SEASON_COL_CANDIDATES = ["season_code", "season_id", "season"]
 
+# Atributos por jugador para búsqueda filtrada (se guardan en <prefix>_player_attrs.npz)
+ATTR_COL_CANDIDATES = {
+    "league": ["league_name", "league_code"],
+    "age": ["age"],
+    "value": ["market_value_eur", "latest_mv_eur"],
+    "pos": ["Pos", "pos"],
+}
+
+def select_attr_cols(cols):
+    """{'league': 'league_name', ...} con la primera candidata existente de cada atributo."""
+    found = {}
+    for attr, candidates in ATTR_COL_CANDIDATES.items():
+        existing = [c for c in candidates if c in cols]
+        if existing:
+            found[attr] = existing[0]
+    return found
+
 def select_existing(cols, candidates):
     return [c for c in candidates if c in cols]
 
@@ -69,7 +95,7 @@ def read_table_columns(conn, schema, table):
     """), {"s": schema, "t": table}).fetchall()
     return [r[0] for r in rows]
 
-def build_and_save_knn(df, feature_cols, player_id_col, model_prefix):
+def build_and_save_knn(df, feature_cols, player_id_col, model_prefix, attr_cols=None):
     # Relleno de nulos
     df = df.copy()
     df[feature_cols] = df[feature_cols].fillna(0)
@@ -99,6 +125,24 @@ def build_and_save_knn(df, feature_cols, player_id_col, model_prefix):
     with open(MODEL_DIR / f"{model_prefix}_player_index.json", "w") as f:
         json.dump(player_index, f)
     joblib.dump(X_scaled, MODEL_DIR / f"{model_prefix}_features_matrix.joblib")
+    # Copia float32 cruda + ids compactos: el API los abre con np.load(mmap_mode="r")
+    save_mmap_artifacts(MODEL_DIR, model_prefix, X_scaled, player_index)
+
+    if attr_cols:
+        attrs = build_player_attributes(
+            df,
+            league_col=attr_cols.get("league"),
+            age_col=attr_cols.get("age"),
+            value_col=attr_cols.get("value"),
+            pos_col=attr_cols.get("pos"),
+        )
+        save_npz_atomic(MODEL_DIR / f"{model_prefix}_player_attrs.npz", **attrs)
+        print(f"→ {model_prefix}: atributos para filtros guardados: {sorted(attrs)}")
+
+    if BUILD_IVF:
+        ivf = build_ivf(X_scaled, n_lists=IVF_N_LISTS)
+        save_npz_atomic(MODEL_DIR / f"{model_prefix}_ivf.npz", **ivf)
+        print(f"→ {model_prefix}: índice IVF guardado ({len(ivf['centroids'])} listas)")
 
     print(f"✅ {model_prefix}: artefactos guardados en {MODEL_DIR}\n")
 
@@ -202,8 +246,12 @@ with engine.begin() as conn:
     else:
         print("⚠️  CAMPO sin columna de temporada; no se filtra.")
 
+    fp_attr_cols = select_attr_cols(fp_cols)
+    print("→ Atributos CAMPO para filtros:", fp_attr_cols)
+
     select_list_fp = ", ".join(
         [q(FP_ID), *[q(c) for c in fp_features]] + [q(c) for c in select_existing(fp_cols, SEASON_COL_CANDIDATES)]
+        + [q(c) for c in fp_attr_cols.values()]
     )
     sql_fp = f'SELECT {select_list_fp} FROM {q(fp_schema)}.{q(fp_table)} {season_filter_fp}'
     df_fp = pd.read_sql(text(sql_fp), conn, params={"season_val": TARGET_SEASON} if season_filter_fp else {})
@@ -216,6 +264,7 @@ with engine.begin() as conn:
     df_gk = None
     GK_ID = None
     gk_features = None
+    gk_attr_cols = None
 
     if gk_loc:
         gk_schema, gk_table = gk_loc
@@ -237,8 +286,10 @@ with engine.begin() as conn:
                 else:
                     print("⚠️  GK sin columna de temporada; no se filtra.")
 
+                gk_attr_cols = select_attr_cols(gk_cols)
                 select_list_gk = ", ".join(
                     [q(GK_ID), *[q(c) for c in gk_features]] + [q(c) for c in select_existing(gk_cols, SEASON_COL_CANDIDATES)]
+                    + [q(c) for c in gk_attr_cols.values()]
                 )
                 sql_gk = f'SELECT {select_list_gk} FROM {q(gk_schema)}.{q(gk_table)} {season_filter_gk}'
                 df_gk = pd.read_sql(text(sql_gk), conn, params={"season_val": TARGET_SEASON} if season_filter_gk else {})
@@ -254,14 +305,14 @@ with engine.begin() as conn:
 # 3) Entrenamiento CAMPO
 # ======================
 print("\n=== Entrenando modelo CAMPO ===")
-build_and_save_knn(df_fp, fp_features, FP_ID, model_prefix="field")
+build_and_save_knn(df_fp, fp_features, FP_ID, model_prefix="field", attr_cols=fp_attr_cols)
 
 # ======================
 # 4) Entrenamiento GK (si aplica)
 # ======================
 if isinstance(df_gk, pd.DataFrame) and GK_ID and gk_features:
     print("=== Entrenando modelo GK ===")
-    build_and_save_knn(df_gk, gk_features, GK_ID, model_prefix="gk")
+    build_and_save_knn(df_gk, gk_features, GK_ID, model_prefix="gk", attr_cols=gk_attr_cols)
 else:
     print("ℹ️  No se entrenó modelo GK (tabla/cols no detectadas).")
 
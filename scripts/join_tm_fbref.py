@@ -62,61 +62,17 @@
 # ============================================================
 
 
-import argparse, os, re
+import argparse, os, re, sys
+from pathlib import Path
 import pandas as pd
-from unidecode import unidecode
 from rapidfuzz import process, fuzz
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 # -------------------- normalización --------------------
-def norm_txt(x: str) -> str:
-    if x is None: return ""
-    t = unidecode(str(x)).lower()
-    t = re.sub(r"\([^)]*\)", " ", t)             # (LP), (SdE), etc.
-    t = re.sub(r"\bclub\s+atletico\b", " ", t)   # "club atletico"
-    t = re.sub(r"\bc\.?a\.?\b", " ", t)          # "c.a." / "ca"
-    t = re.sub(r"[^a-z0-9\s]", " ", t)           # signos
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
-
-STOPWORDS = {"de","del","da","do","das","dos","la","las","los","san","santa","club","atletico"}
-def first_last_key(name_norm: str) -> str:
-    toks = [t for t in name_norm.split() if t not in STOPWORDS]
-    if not toks: return name_norm
-    if len(toks) == 1: return toks[0]
-    return f"{toks[0]} {toks[-1]}"
-
-CANON = {
-    "boca juniors":"boca juniors","boca":"boca juniors",
-    "river plate":"river plate","river":"river plate",
-    "racing club":"racing club","racing":"racing club","racing avellaneda":"racing club",
-    "independiente":"independiente",
-    "san lorenzo":"san lorenzo","san lorenzo de almagro":"san lorenzo",
-    "velez sarsfield":"velez sarsfield","velez":"velez sarsfield","velez sarfield":"velez sarsfield",
-    "lanus":"lanus","ca lanus":"lanus",
-    "huracan":"huracan",
-    "argentinos juniors":"argentinos juniors","argentinos":"argentinos juniors",
-    "estudiantes lp":"estudiantes lp","estudiantes de la plata":"estudiantes lp","estudiantes":"estudiantes lp",
-    "gimnasia lp":"gimnasia lp","gimnasia la plata":"gimnasia lp","gimnasia":"gimnasia lp",
-    "newells old boys":"newells old boys","newell s old boys":"newells old boys","newells":"newells old boys",
-    "rosario central":"rosario central",
-    "talleres":"talleres","talleres de cordoba":"talleres","ca talleres":"talleres",
-    "banfield":"banfield",
-    "defensa y justicia":"defensa y justicia","defensa y just":"defensa y justicia",
-    "godoy cruz":"godoy cruz",
-    "platense":"platense","club atletico platense":"platense",
-    "sarmiento":"sarmiento",
-    "barracas central":"barracas central",
-    "central cordoba sde":"central cordoba sde","central cordoba":"central cordoba sde",
-    "tigre":"tigre",
-    "union":"union","union santa fe":"union",
-    "atletico tucuman":"atletico tucuman",
-    "belgrano":"belgrano",
-    "instituto":"instituto",
-    "independiente rivadavia":"independiente rivadavia",
-    "deportivo riestra":"deportivo riestra",
-}
-def canon_club(x: str) -> str:
-    k = norm_txt(x); return CANON.get(k, k)
+# Reglas compartidas con backend/etl.py y la búsqueda del API; sobre Series
+# se normaliza cada nombre distinto una vez (memo persistente en data/cache)
+from backend.normalize import name_cache, normalize_series  # noqa: E402
 
 def safe_int(x):
     try:
@@ -229,9 +185,9 @@ def main():
     if "player_id" in df_t.columns: df_t["player_id"] = pd.to_numeric(df_t["player_id"], errors="coerce").astype("Int64")
 
     # FBref norms
-    df_f["player_norm"] = df_f["Player"].apply(norm_txt)
-    df_f["player_fl"]   = df_f["player_norm"].apply(first_last_key)
-    df_f["club_norm"]   = df_f["Squad"].apply(canon_club)
+    df_f["player_norm"] = normalize_series(df_f["Player"], "name")
+    df_f["player_fl"]   = normalize_series(df_f["player_norm"], "first_last")
+    df_f["club_norm"]   = normalize_series(df_f["Squad"], "club")
 
     # Born → birth_year_fb y dob_fb
     if "Born" in df_f.columns:
@@ -250,9 +206,9 @@ def main():
             df_f.loc[df_f["birth_year_fb"].isna() & ages.notna(), "birth_year_fb"] = est
 
     # TM norms
-    df_t["player_norm"] = df_t["player_name"].apply(norm_txt)
-    df_t["player_fl"]   = df_t["player_norm"].apply(first_last_key)
-    df_t["club_norm"]   = df_t["club_name"].apply(canon_club)
+    df_t["player_norm"] = normalize_series(df_t["player_name"], "name")
+    df_t["player_fl"]   = normalize_series(df_t["player_norm"], "first_last")
+    df_t["club_norm"]   = normalize_series(df_t["club_name"], "club")
 
     df_t["birth_year_tm"] = df_t.get("dob", pd.Series([""]*len(df_t))).apply(year_from_dob)
     if "age" in df_t.columns:
@@ -349,7 +305,7 @@ def main():
 
     # -------- Salida
     if "player_fl" not in m.columns and "player_norm" in m.columns:
-        m["player_fl"] = m["player_norm"].apply(first_last_key)
+        m["player_fl"] = normalize_series(m["player_norm"], "first_last")
     if "player_id" in m.columns:
         m["player_id"] = pd.to_numeric(m["player_id"], errors="coerce").astype("Int64")
     if "market_value_eur" in m.columns:
@@ -364,6 +320,8 @@ def main():
     extra_cols = ["market_value_eur","player_id","dob","age","join_method"]
     out_cols   = [c for c in (base_cols + extra_cols) if c in m.columns]
 
+    name_cache.save()
+
     os.makedirs(os.path.dirname(args.out), exist_ok=True)
     m[out_cols].to_csv(args.out, index=False, encoding="utf-8-sig")
 
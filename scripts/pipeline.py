@@ -0,0 +1,513 @@
+# scripts/pipeline.py
+# ============================================================
+# Pipeline incremental (DAG) con huellas de contenido
+# ------------------------------------------------------------
+# Encadena los scripts del pipeline y sólo corre lo que cambió:
+#
+#   por liga/temporada (configs/leagues.yaml), en paralelo:
+#     etl   backend/etl.py            -> player_stats_<Liga>_<temp>.clean.csv
+#     join  scripts/join_tm_fbref.py  -> join_<liga>_<temp>.csv
+#     mv    scripts/make_mv_for_leagues.py --input -> join_<liga>_<temp>_mv.csv
+#   globales:
+#     upload         scripts/upload_mv_to_supabase.py --input <sólo los _mv que cambiaron>
+#     similarity     scripts/build_similarity_model.py
+#     opportunities  scripts/build_market_opportunities.py
+#
+# Manifest (data/pipeline_manifest.json, env PIPELINE_MANIFEST)
+#   Por nodo (etapa[/liga/temporada]) guarda el sha256 de sus entradas
+#   (archivos de datos + código de la etapa + parámetros) y de sus salidas.
+#   Un nodo corre si: no tiene registro, cambió o desapareció alguna entrada
+#   (p.ej. se borró el join_*_mv.csv de una liga), falta o se modificó
+#   alguna salida, o --force. Si corre pero la salida queda igual
+#   (mismo hash), los nodos de abajo no corren.
+#   Los hashes se reutilizan mientras el archivo no cambie de tamaño/mtime.
+#
+# Fuentes externas
+#   - FBref: la entrada de "etl" es la huella de la caché de extracción
+#     (backend/extract_cache.py). Sin caché o vencida (TTL) -> corre y scrapea.
+#   - Transfermarkt: data/processed/tm_values_<TM>_<año>_latest.csv (lo genera
+#     scripts/tm_pull_latest_values_playwright.py, a mano: necesita navegador).
+#     Si falta, esa partición queda "blocked" y el resto sigue.
+#   - similarity/opportunities leen la base: su entrada es el conjunto de
+#     join_*_mv.csv que subió "upload" (+ parámetros de entorno de cada script).
+#
+# Ejemplos
+#   python scripts/pipeline.py --dry-run
+#   python scripts/pipeline.py --workers 4
+#   python scripts/pipeline.py --only ARG1 --seasons 2024
+#   python scripts/pipeline.py --stages etl join mv          # sin tocar la base
+#   python scripts/pipeline.py --stages similarity --force
+# ============================================================
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from backend.etl import resolve_league  # noqa: E402
+from backend.extract_cache import ExtractCache  # noqa: E402
+from scripts.run_etl_leagues import DEFAULT_CONFIG, fbref_season  # noqa: E402
+
+PROCESSED = Path("data/processed")
+MODELS = Path("models")
+MANIFEST_PATH = Path(os.getenv("PIPELINE_MANIFEST", "data/pipeline_manifest.json"))
+LOG_DIR = Path(os.getenv("PIPELINE_LOG_DIR", "data/logs/pipeline"))
+
+STAGES = ["etl", "join", "mv", "upload", "similarity", "opportunities"]
+
+# código -> (código de liga en Transfermarkt, prefijo de los join_<x>_*.csv)
+# (en leagues.yaml se pueden pisar con tm_code / short)
+PARTITION_NAMES = {
+    "ARG1": ("AR1N", "arg"),
+    "BRA1": ("BRA1", "bra"),
+    "ENG1": ("GB1", "pl"),
+    "ESP1": ("ES1", "esp"),
+    "POR1": ("PO1", "por"),
+}
+
+# Código de cada etapa: si cambia, la etapa se vuelve a correr
+CODE = {
+    "etl": ["backend/etl.py", "backend/etl_types.py", "backend/normalize.py", "backend/extract_cache.py"],
+    "join": ["scripts/join_tm_fbref.py", "backend/normalize.py"],
+    "mv": ["scripts/make_mv_for_leagues.py"],
+    "upload": ["scripts/upload_mv_to_supabase.py"],
+    "similarity": ["scripts/build_similarity_model.py", "backend/neighbors.py"],
+    "opportunities": ["scripts/build_market_opportunities.py", "backend/value.py"],
+}
+
+# Variables de entorno que cambian la salida de las etapas globales
+PARAMS = {
+    "similarity": ["TARGET_SEASON", "MIN_MINUTES_PLAYED", "N_NEIGHBORS", "BUILD_IVF", "IVF_N_LISTS", "PLAYERS_VIEW"],
+    "opportunities": ["PLAYERS_VIEW"],
+}
+
+SIMILARITY_ARTIFACTS = ("scaler.joblib", "knn_model.joblib", "player_index.json", "features_matrix.joblib",
+                        "features_matrix.npy", "player_ids.npy")
+SIMILARITY_OUTPUTS = [MODELS / f"field_{name}" for name in SIMILARITY_ARTIFACTS]
+# build_similarity_model.py sólo arma el modelo de arqueros si hay suficientes
+SIMILARITY_OPTIONAL_OUTPUTS = [MODELS / f"gk_{name}" for name in SIMILARITY_ARTIFACTS]
+OPPORTUNITIES_OUTPUTS = [
+    MODELS / "field_value_model.joblib",
+    MODELS / "market_scores.npz",
+    MODELS / "market_opportunities.json",
+]
+
+
+# ---------- particiones ----------
+
+@dataclass
+class Partition:
+    code: str
+    year: str
+    tm_code: str
+    short: str
+
+    @property
+    def league(self) -> str:
+        return resolve_league(self.code)
+
+    @property
+    def season(self) -> str:
+        return fbref_season(self.code, self.year)
+
+    @property
+    def name(self) -> str:
+        return f"{self.code}/{self.year}"
+
+    @property
+    def clean_csv(self) -> Path:
+        return PROCESSED / f"player_stats_{self.league.replace(' ', '_')}_{self.season}.clean.csv"
+
+    @property
+    def tm_csv(self) -> Path:
+        return PROCESSED / f"tm_values_{self.tm_code}_{str(self.year)[:4]}_latest.csv"
+
+    @property
+    def join_csv(self) -> Path:
+        return PROCESSED / f"join_{self.short}_{self.season.replace('-', '_')}.csv"
+
+    @property
+    def mv_csv(self) -> Path:
+        return self.join_csv.with_name(f"{self.join_csv.stem}_mv.csv")
+
+
+def load_partitions(config: Path, only: List[str] = None, seasons: List[str] = None) -> List[Partition]:
+    with open(config, encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    only = {c.upper() for c in only} if only else None
+    seasons = {str(s) for s in seasons} if seasons else None
+
+    parts = []
+    for entry in cfg.get("leagues") or []:
+        code = str(entry["code"]).upper()
+        if only and code not in only:
+            continue
+        tm_code, short = PARTITION_NAMES.get(code, (code, code.lower()))
+        for year in entry.get("seasons") or []:
+            if seasons and str(year) not in seasons:
+                continue
+            parts.append(Partition(code, str(year), entry.get("tm_code", tm_code), entry.get("short", short)))
+    return parts
+
+
+# ---------- huellas ----------
+
+class Hasher:
+    """sha256 de archivos; reutiliza el hash guardado si no cambió tamaño/mtime."""
+
+    def __init__(self, known: dict):
+        self.known = known
+        self._lock = threading.Lock()
+
+    def file(self, path) -> Optional[str]:
+        path = Path(path)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        key = str(path)
+        with self._lock:
+            rec = self.known.get(key)
+        if rec and rec["size"] == st.st_size and rec["mtime_ns"] == st.st_mtime_ns:
+            return rec["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self.known[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+
+class Manifest:
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = path
+        data = {}
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                print(f"[!] Manifest ilegible ({path}); se corre todo.")
+        self.nodes: Dict[str, dict] = data.get("nodes", {})
+        self.hasher = Hasher(data.get("files", {}))
+        self._lock = threading.Lock()
+
+    def record(self, key: str, entry: dict):
+        with self._lock:
+            self.nodes[key] = entry
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        data = {"nodes": self.nodes, "files": self.hasher.known}
+        tmp.write_text(json.dumps(data, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+# ---------- nodos ----------
+
+@dataclass
+class Node:
+    key: str
+    stage: str
+    cmd: Callable[[List[str]], List[str]]     # recibe los inputs de datos que cambiaron
+    inputs: Callable[[], List[Path]]          # se resuelven al momento de correr
+    outputs: List[Path] = field(default_factory=list)
+    optional_outputs: List[Path] = field(default_factory=list)  # pueden no generarse
+    extra: Callable[[], Dict[str, str]] = dict  # huellas que no son archivos
+    deps: List[str] = field(default_factory=list)   # si alguna falla, este nodo no corre
+    after: List[str] = field(default_factory=list)  # esperar, pero correr igual con lo que haya
+    partial: bool = False                     # el comando acepta sólo los inputs cambiados
+    status: str = "pending"
+    reason: str = ""
+    seconds: float = 0.0
+
+
+def py(script: str, *args) -> List[str]:
+    return [sys.executable, script, *[str(a) for a in args]]
+
+
+def fbref_fingerprint(p: Partition) -> Dict[str, str]:
+    cache = ExtractCache()
+    entry = cache.entry(p.league, p.season)
+    if entry is None:
+        return {"fbref": "missing"}
+    state = "" if cache.is_fresh(entry) else "stale:"
+    return {"fbref": state + entry.get("fingerprint", "")}
+
+
+def env_params(stage: str) -> Dict[str, str]:
+    return {f"env:{k}": os.getenv(k, "") for k in PARAMS.get(stage, [])}
+
+
+def mv_files() -> List[Path]:
+    return sorted(PROCESSED.glob("join_*_mv.csv"))
+
+
+def build_nodes(parts: List[Partition]) -> List[Node]:
+    nodes = []
+    mv_keys = []
+    for p in parts:
+        etl, join, mv = f"etl/{p.name}", f"join/{p.name}", f"mv/{p.name}"
+        nodes.append(Node(
+            etl, "etl",
+            cmd=lambda _c, p=p: py("backend/etl.py", "--league", p.code, "--season", p.season),
+            inputs=lambda: [],
+            outputs=[p.clean_csv],
+            extra=lambda p=p: fbref_fingerprint(p),
+        ))
+        nodes.append(Node(
+            join, "join",
+            cmd=lambda _c, p=p: py("scripts/join_tm_fbref.py", "--fbref", p.clean_csv, "--tm", p.tm_csv,
+                                   "--out", p.join_csv, "--season-year", p.year[:4]),
+            inputs=lambda p=p: [p.clean_csv, p.tm_csv],
+            outputs=[p.join_csv],
+            deps=[etl],
+        ))
+        nodes.append(Node(
+            mv, "mv",
+            cmd=lambda _c, p=p: py("scripts/make_mv_for_leagues.py", "--input", p.join_csv),
+            inputs=lambda p=p: [p.join_csv],
+            outputs=[p.mv_csv],
+            deps=[join],
+        ))
+        mv_keys.append(mv)
+
+    nodes.append(Node(
+        "upload", "upload",
+        cmd=lambda changed: py("scripts/upload_mv_to_supabase.py", "--input", *changed),
+        inputs=mv_files,
+        after=mv_keys,
+        partial=True,
+    ))
+    nodes.append(Node(
+        "similarity", "similarity",
+        cmd=lambda _c: py("scripts/build_similarity_model.py"),
+        inputs=mv_files,
+        outputs=SIMILARITY_OUTPUTS,
+        optional_outputs=SIMILARITY_OPTIONAL_OUTPUTS,
+        extra=lambda: env_params("similarity"),
+        deps=["upload"],
+    ))
+    nodes.append(Node(
+        "opportunities", "opportunities",
+        cmd=lambda _c: py("scripts/build_market_opportunities.py"),
+        inputs=lambda: mv_files() + [MODELS / "field_scaler.joblib", MODELS / "field_features_matrix.joblib",
+                                     MODELS / "field_player_index.json"],
+        outputs=OPPORTUNITIES_OUTPUTS,
+        extra=lambda: env_params("opportunities"),
+        deps=["similarity"],
+    ))
+    return nodes
+
+
+# ---------- ejecución ----------
+
+class Runner:
+    def __init__(self, nodes: List[Node], manifest: Manifest, stages: List[str], force: bool,
+                 timeout: float, dry_run: bool):
+        self.nodes = {n.key: n for n in nodes}
+        self.manifest = manifest
+        self.stages = set(stages)
+        self.force = force
+        self.timeout = timeout or None
+        self.dry_run = dry_run
+
+    def fingerprint(self, node: Node) -> Dict[str, Optional[str]]:
+        h = self.manifest.hasher
+        fp = {f"code:{c}": h.file(c) for c in CODE[node.stage]}
+        fp.update({str(p): h.file(p) for p in node.inputs()})
+        fp.update(node.extra())
+        return fp
+
+    def plan(self, node: Node):
+        """(correr?, motivo, inputs de datos cambiados)."""
+        current = self.fingerprint(node)
+        missing = [k for k, v in current.items() if v is None]
+        if missing:
+            return None, "falta " + ", ".join(missing), []
+
+        data = [k for k in current if not k.startswith(("code:", "env:")) and k != "fbref"]
+        rec = self.manifest.nodes.get(node.key)
+        if self.force:
+            return True, "--force", data
+        if rec is None:
+            return True, "sin registro", data
+
+        prev = rec.get("inputs", {})
+        changed = [k for k, v in current.items() if prev.get(k) != v]
+        # El registro guarda el conjunto de entradas: una que ya no está es un cambio
+        removed = [k for k in prev if k not in current]
+        h = self.manifest.hasher
+        recorded = rec.get("outputs", {})
+        bad_out = [str(p) for p in node.outputs if h.file(p) is None or h.file(p) != recorded.get(str(p))]
+        # Las opcionales sólo cuentan si la corrida registrada las generó
+        bad_out += [str(p) for p in node.optional_outputs
+                    if recorded.get(str(p)) is not None and h.file(p) != recorded.get(str(p))]
+        if not changed and not removed and not bad_out:
+            return False, "al día", []
+
+        reason = ", ".join((changed + [f"quitado {k}" for k in removed] + [f"salida {o}" for o in bad_out])[:3])
+        if node.partial and not any(k.startswith(("code:", "env:")) for k in changed) and not bad_out:
+            # sólo los archivos de datos que cambiaron (upload por liga/temporada)
+            return True, reason, [k for k in changed if k in data]
+        return True, reason, data
+
+    def run_node(self, node: Node):
+        run, reason, changed = self.plan(node)
+        node.reason = reason
+        if run is None:
+            node.status = "blocked"
+            return
+        if not run or (node.partial and not changed):
+            node.status = "fresh"
+            node.reason = reason if not run else "sin archivos para procesar"
+            if run and not self.dry_run:
+                # Sólo se quitaron entradas: nada que procesar, pero el registro
+                # pasa a reflejar el conjunto actual
+                self.manifest.record(node.key, {**self.manifest.nodes.get(node.key, {}), "inputs": self.fingerprint(node)})
+            return
+        if self.dry_run:
+            node.status = "would-run"
+            return
+
+        cmd = node.cmd(changed)
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        log_path = LOG_DIR / f"{node.key.replace('/', '_')}.log"
+        print(f"[run] {node.key}: {reason}")
+        t0 = time.monotonic()
+        try:
+            with open(log_path, "w", encoding="utf-8") as log:
+                log.write(" ".join(cmd) + "\n\n")
+                log.flush()
+                proc = subprocess.run(cmd, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT, timeout=self.timeout)
+            code = proc.returncode
+        except subprocess.TimeoutExpired:
+            code = "timeout"
+        node.seconds = time.monotonic() - t0
+
+        h = self.manifest.hasher
+        missing_out = [str(p) for p in node.outputs if h.file(p) is None]
+        if code != 0 or missing_out:
+            node.status = "failed"
+            node.reason = f"exit {code}" if code != 0 else f"no generó {', '.join(missing_out[:2])}"
+            node.reason += f" (log: {log_path})"
+            return
+
+        # Se registra el estado después de correr (la caché FBref pudo renovarse)
+        self.manifest.record(node.key, {
+            "inputs": self.fingerprint(node),
+            "outputs": {str(p): h.file(p) for p in node.outputs + node.optional_outputs},
+            "ran_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seconds": round(node.seconds, 1),
+        })
+        node.status = "ran"
+
+    def ready(self, node: Node) -> Optional[bool]:
+        """True: puede correr; False: esperar; None: bloqueado por una dependencia."""
+        for key in node.deps + node.after:
+            dep = self.nodes.get(key)
+            if dep is None:
+                continue
+            if dep.status in ("pending", "running"):
+                return False
+        for key in node.deps:
+            dep = self.nodes.get(key)
+            if dep is not None and dep.status in ("failed", "blocked"):
+                return None
+        return True
+
+    def run(self, workers: int):
+        pending = list(self.nodes.values())
+        futures = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending or futures:
+                progressed = False
+                for node in list(pending):
+                    state = self.ready(node)
+                    if state is False:
+                        continue
+                    pending.remove(node)
+                    progressed = True
+                    if state is None:
+                        node.status, node.reason = "blocked", "falló una dependencia"
+                    elif node.stage not in self.stages:
+                        node.status, node.reason = "skipped", "etapa no seleccionada"
+                    elif self.dry_run and any(self.nodes[d].status == "would-run" for d in node.deps + node.after
+                                              if d in self.nodes):
+                        node.status, node.reason = "would-run", "cambia una dependencia"
+                    else:
+                        node.status = "running"
+                        futures[pool.submit(self.run_node, node)] = node
+                if not futures:
+                    if pending and not progressed:
+                        raise RuntimeError("Ciclo en el DAG: " + ", ".join(n.key for n in pending))
+                    continue
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    node = futures.pop(fut)
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        node.status, node.reason = "failed", f"{type(e).__name__}: {e}"
+                    if node.status in ("ran", "failed"):
+                        print(f"[{node.status}] {node.key} ({node.seconds:.0f}s) {node.reason if node.status == 'failed' else ''}")
+
+
+def print_summary(nodes: List[Node], wall: float):
+    print("\n=== Pipeline ===")
+    print(f"{'nodo':<26}{'estado':<11}{'tiempo s':>9}  motivo")
+    for n in nodes:
+        print(f"{n.key:<26}{n.status:<11}{n.seconds:>9.0f}  {n.reason}")
+    counts = {}
+    for n in nodes:
+        counts[n.status] = counts.get(n.status, 0) + 1
+    print("\n" + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())) + f" | {wall:.0f}s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pipeline incremental: corre sólo las etapas/particiones cuyas entradas cambiaron.")
+    ap.add_argument("--config", default=str(DEFAULT_CONFIG), help="YAML de ligas (default: configs/leagues.yaml).")
+    ap.add_argument("--only", nargs="*", help="Sólo estos códigos de liga (ej: ARG1 ENG1).")
+    ap.add_argument("--seasons", nargs="*", help="Sólo estas temporadas del YAML (ej: 2024).")
+    ap.add_argument("--stages", nargs="*", choices=STAGES, default=STAGES, help="Etapas a correr (default: todas).")
+    ap.add_argument("--force", action="store_true", help="Correr las etapas seleccionadas aunque estén al día.")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("PIPELINE_WORKERS", "4")),
+                    help="Nodos en paralelo (env PIPELINE_WORKERS, default 4).")
+    ap.add_argument("--timeout", type=float, default=float(os.getenv("PIPELINE_NODE_TIMEOUT", "3600")),
+                    help="Segundos por nodo; 0 = sin límite (env PIPELINE_NODE_TIMEOUT, default 3600).")
+    ap.add_argument("--dry-run", action="store_true", help="Sólo mostrar qué correría y por qué.")
+    args = ap.parse_args()
+
+    os.chdir(ROOT)  # rutas relativas (data/, models/) como el resto de los scripts
+    parts = load_partitions(Path(args.config), args.only, args.seasons)
+    nodes = build_nodes(parts)
+    manifest = Manifest()
+
+    print(f"{len(parts)} particiones, {len(nodes)} nodos | etapas: {' '.join(args.stages)}")
+    t0 = time.monotonic()
+    Runner(nodes, manifest, args.stages, args.force, args.timeout, args.dry_run).run(max(1, args.workers))
+    if not args.dry_run:
+        manifest.save()
+    print_summary(nodes, time.monotonic() - t0)
+    if any(n.status == "failed" for n in nodes):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# scripts/run_etl_leagues.py
+# ============================================================
+# Runner multi-liga del ETL FBref (backend/etl.py) en paralelo
+# ------------------------------------------------------------
+# Lee configs/leagues.yaml (código de liga × temporadas), arma un job por
+# (liga, temporada) y los corre en un pool de procesos:
+#   - cada intento es un proceso aparte (spawn): un scraper colgado se mata
+#     al vencer --timeout sin frenar al resto
+#   - --retries reintentos por job con espera creciente (--backoff)
+#   - log de cada job en data/logs/etl_<CODE>_<SEASON>.log (stdout del ETL)
+#   - resumen final por job (estado, intentos, tiempo, salida); exit code 1
+#     si alguno falló
+#
+# Temporadas
+#   En el YAML van como año de inicio (2024). Para ligas calendario
+#   (CALENDAR_LEAGUES: ARG1, BRA1, ...) se pasa '2024'; para el resto FBref
+#   espera '2024-2025'. Un string con '-' ('2024-2025') se usa tal cual.
+#
+# Ejemplos
+#   python scripts/run_etl_leagues.py
+#   python scripts/run_etl_leagues.py --workers 3 --timeout 1800 --retries 2
+#   python scripts/run_etl_leagues.py --only ARG1 ENG1 --seasons 2024
+#   python scripts/run_etl_leagues.py --offline      # transform desde la caché
+#   python scripts/run_etl_leagues.py --dry-run
+# ============================================================
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from backend.etl import resolve_league  # noqa: E402
+
+DEFAULT_CONFIG = ROOT / "configs" / "leagues.yaml"
+LOG_DIR = Path(os.getenv("ETL_LOG_DIR", "data/logs"))
+
+# Ligas que FBref indexa por año calendario
+CALENDAR_LEAGUES = {"ARG1", "LPA", "BRA1", "MLS"}
+
+
+@dataclass
+class Job:
+    code: str
+    league: str
+    season: str
+    attempts: int = 0
+    status: str = "pending"
+    seconds: float = 0.0
+    output: Optional[str] = None
+    error: Optional[str] = None
+    log: Optional[Path] = None
+    # estado del intento en curso
+    proc: Optional[mp.Process] = field(default=None, repr=False)
+    conn: Optional[object] = field(default=None, repr=False)
+    started: float = 0.0
+    not_before: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.code} {self.season}"
+
+
+def fbref_season(code: str, season) -> str:
+    season = str(season)
+    if "-" in season or code.upper() in CALENDAR_LEAGUES:
+        return season
+    start = int(season)
+    return f"{start}-{start + 1}"
+
+
+def load_jobs(config: Path, only: List[str] = None, seasons: List[str] = None) -> List[Job]:
+    with open(config, encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    only = {c.upper() for c in only} if only else None
+    seasons = {str(s) for s in seasons} if seasons else None
+
+    jobs = []
+    for entry in cfg.get("leagues") or []:
+        code = str(entry["code"]).upper()
+        if only and code not in only:
+            continue
+        for season in entry.get("seasons") or []:
+            if seasons and str(season) not in seasons:
+                continue
+            jobs.append(Job(code=code, league=resolve_league(code), season=fbref_season(code, season)))
+    return jobs
+
+
+# ---------- proceso hijo ----------
+
+def _child(league: str, season: str, log_path: str, conn, refresh: bool = False, offline: bool = False):
+    """Corre un run_etl con stdout/stderr al log del job y avisa el resultado por el pipe."""
+    os.chdir(ROOT)  # run_etl usa rutas relativas (data/raw, data/processed)
+    with open(log_path, "a", encoding="utf-8") as log:
+        sys.stdout = sys.stderr = log
+        try:
+            from backend.etl import run_etl
+
+            out = run_etl(league, season, refresh=refresh, offline=offline)
+            conn.send(("ok", str(out) if out else None))
+        except BaseException as e:
+            traceback.print_exc()
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            log.flush()
+            conn.close()
+
+
+# ---------- scheduler ----------
+
+def _start(ctx, job: Job, refresh: bool, offline: bool):
+    job.attempts += 1
+    job.status = "running"
+    job.log = LOG_DIR / f"etl_{job.code}_{job.season}.log"
+    with open(job.log, "a", encoding="utf-8") as log:
+        log.write(f"\n===== intento {job.attempts} {time.strftime('%Y-%m-%d %H:%M:%S')} =====\n")
+    parent, child = ctx.Pipe(duplex=False)
+    job.proc = ctx.Process(
+        target=_child, args=(job.league, job.season, str(job.log), child, refresh, offline),
+        name=f"etl-{job.code}-{job.season}", daemon=True,
+    )
+    job.conn = parent
+    job.started = time.monotonic()
+    job.proc.start()
+    child.close()
+    print(f"[start] {job.name} (intento {job.attempts})")
+
+
+def _finish(job: Job, result, retries: int, backoff: float) -> bool:
+    """Cierra el intento. True si el job quedó terminado (ok o sin reintentos)."""
+    job.seconds += time.monotonic() - job.started
+    job.proc = job.conn = None
+    status, detail = result
+    if status == "ok":
+        job.status, job.output, job.error = ("ok" if detail else "empty"), detail, None
+        print(f"[{job.status}] {job.name} en {job.seconds:.0f}s")
+        return True
+
+    job.error = detail
+    if job.attempts <= retries:
+        job.status = "pending"
+        job.not_before = time.monotonic() + backoff * job.attempts
+        print(f"[retry] {job.name}: {detail} (reintento en {backoff * job.attempts:.0f}s)")
+        return False
+    job.status = "timeout" if status == "timeout" else "failed"
+    print(f"[{job.status}] {job.name}: {detail}")
+    return True
+
+
+def run_jobs(jobs: List[Job], workers: int, timeout: float, retries: int, backoff: float,
+             refresh: bool = False, offline: bool = False) -> List[Job]:
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    ctx = mp.get_context("spawn")
+    pending = list(jobs)
+    running: List[Job] = []
+
+    while pending or running:
+        now = time.monotonic()
+        # lanzar hasta `workers` jobs listos
+        for job in [j for j in pending if j.not_before <= now]:
+            if len(running) >= workers:
+                break
+            pending.remove(job)
+            _start(ctx, job, refresh, offline)
+            running.append(job)
+
+        time.sleep(0.2)
+
+        for job in list(running):
+            result = None
+            if job.conn.poll():
+                try:
+                    result = job.conn.recv()
+                except EOFError:
+                    result = None
+                job.proc.join(timeout=5)
+            elif not job.proc.is_alive():
+                result = ("error", f"el proceso terminó sin resultado (exit code {job.proc.exitcode})")
+            elif timeout and time.monotonic() - job.started > timeout:
+                job.proc.terminate()
+                job.proc.join(timeout=5)
+                if job.proc.is_alive():
+                    job.proc.kill()
+                result = ("timeout", f"timeout tras {timeout:.0f}s")
+            else:
+                continue
+
+            if result is None:
+                result = ("error", f"el proceso terminó sin resultado (exit code {job.proc.exitcode})")
+            running.remove(job)
+            if not _finish(job, result, retries, backoff):
+                pending.append(job)
+
+    return jobs
+
+
+def print_summary(jobs: List[Job], wall: float):
+    print("\n=== Resumen ETL ===")
+    print(f"{'job':<16}{'estado':<10}{'intentos':>9}{'tiempo s':>10}  salida / error")
+    for j in jobs:
+        detail = j.output or j.error or ""
+        print(f"{j.name:<16}{j.status:<10}{j.attempts:>9}{j.seconds:>10.0f}  {detail}")
+    counts = {}
+    for j in jobs:
+        counts[j.status] = counts.get(j.status, 0) + 1
+    serial = sum(j.seconds for j in jobs)
+    print(f"\n{len(jobs)} jobs: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    print(f"Tiempo total {wall:.0f}s (suma de jobs {serial:.0f}s)")
+    print(f"Logs en {LOG_DIR}/")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Corre backend/etl.py para todas las ligas/temporadas de configs/leagues.yaml.")
+    ap.add_argument("--config", default=str(DEFAULT_CONFIG), help="YAML de ligas (default: configs/leagues.yaml).")
+    ap.add_argument("--only", nargs="*", help="Sólo estos códigos de liga (ej: ARG1 ENG1).")
+    ap.add_argument("--seasons", nargs="*", help="Sólo estas temporadas del YAML (ej: 2024).")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("ETL_WORKERS", "4")),
+                    help="Procesos en paralelo (env ETL_WORKERS, default 4).")
+    ap.add_argument("--timeout", type=float, default=float(os.getenv("ETL_JOB_TIMEOUT", "2700")),
+                    help="Segundos por intento antes de matarlo; 0 = sin límite (env ETL_JOB_TIMEOUT, default 2700).")
+    ap.add_argument("--retries", type=int, default=int(os.getenv("ETL_RETRIES", "2")),
+                    help="Reintentos por job tras error/timeout (env ETL_RETRIES, default 2).")
+    ap.add_argument("--backoff", type=float, default=30.0,
+                    help="Espera base entre reintentos en segundos (crece por intento).")
+    ap.add_argument("--refresh", action="store_true", help="Ignorar la caché de extracción (data/cache/fbref).")
+    ap.add_argument("--offline", action="store_true", help="Sólo caché de extracción: no scrapear.")
+    ap.add_argument("--dry-run", action="store_true", help="Sólo lista los jobs.")
+    args = ap.parse_args()
+
+    jobs = load_jobs(Path(args.config), args.only, args.seasons)
+    if not jobs:
+        print("No hay jobs para correr (revisá --config/--only/--seasons).")
+        return
+
+    print(f"{len(jobs)} jobs | workers={args.workers} timeout={args.timeout:.0f}s retries={args.retries}")
+    if args.dry_run:
+        for j in jobs:
+            print(f"  {j.code:<6} {j.league!r:<32} season={j.season}")
+        return
+
+    t0 = time.monotonic()
+    run_jobs(jobs, max(1, args.workers), args.timeout, max(0, args.retries), args.backoff,
+             refresh=args.refresh, offline=args.offline)
+    print_summary(jobs, time.monotonic() - t0)
+    if any(j.status not in ("ok", "empty") for j in jobs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
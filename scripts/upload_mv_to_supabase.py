@@ -2,18 +2,25 @@
 import os
 import sys
 import glob
+import argparse
+import uuid
 import pandas as pd
 from sqlalchemy import create_engine, text
 
 # ================== CONFIG ==================
 PASSWORD = os.environ.get("SUPABASE_DB_PASSWORD", "LettitPrime")
-DATABASE_URL = (
+# UPLOAD_DATABASE_URL permite cargar otra base (p.ej. un Postgres local para load tests)
+DATABASE_URL = os.environ.get("UPLOAD_DATABASE_URL") or (
     "postgresql://postgres.eaipsfbrivaiqumhijdc:{}"
     "@aws-1-sa-east-1.pooler.supabase.com:6543/postgres"
 ).format(PASSWORD)
 
 DATA_DIR = "data/processed"  # carpeta con join_*_mv.csv
 
+# Vista materializada de database/schema/006_players_matview.sql (se refresca
+# tras cada carga si existe; el API la lee con PLAYERS_VIEW=<este nombre>)
+PLAYERS_MATVIEW = os.environ.get("PLAYERS_MATVIEW", "mv_players_union_with_sort")
+
 # Mapeo código -> nombre visible de liga
 LEAGUE_NAMES = {
     # Sudamérica
@@ -156,8 +163,46 @@ def clean_and_split(df):
 
     return df_gk[cols_gk], df_of[cols_of]
 
+def bump_data_version(engine, source):
+    """Registra una versión nueva de datos: invalida las cachés del API."""
+    version = uuid.uuid4().hex
+    with engine.begin() as conn:
+        conn.execute(text("""
+            insert into data_version (source, version, updated_at)
+            values (:s, :v, now())
+            on conflict (source) do update set version = excluded.version, updated_at = now();
+        """), {"s": source, "v": version})
+    print(f"data_version[{source}] = {version}")
+
+def refresh_players_matview(engine, name=PLAYERS_MATVIEW):
+    """
+    Recalcula la vista materializada de jugadores. CONCURRENTLY no bloquea
+    las lecturas del API; si la vista nunca se pobló (o falta el índice
+    único) se hace un refresh normal.
+    """
+    with engine.connect() as conn:
+        exists = conn.execute(text("select to_regclass(:n) is not null"), {"n": name}).scalar()
+    if not exists:
+        print(f"Vista {name} no existe: correr database/schema/006_players_matview.sql")
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"refresh materialized view concurrently {name};"))
+        print(f"Vista {name} refrescada (concurrently).")
+    except Exception as e:
+        print(f"Refresh concurrently falló ({e}); refresh normal ...")
+        with engine.begin() as conn:
+            conn.execute(text(f"refresh materialized view {name};"))
+        print(f"Vista {name} refrescada.")
+    return True
+
 # ================== MAIN ==================
 def main():
+    ap = argparse.ArgumentParser(description="Sube data/processed/join_*_mv.csv a field_players_all / goalkeepers_all.")
+    ap.add_argument("--input", nargs="*", help="Sólo estos CSV join_*_mv.csv (default: todos los de data/processed). "
+                                               "Los demás pares liga/temporada quedan como están en la base.")
+    args = ap.parse_args()
+
     print("Conectando a Neon/Supabase ...")
     try:
         engine = create_engine(DATABASE_URL, connect_args={"connect_timeout": 10})
@@ -253,10 +298,18 @@ def main():
             create index if not exists idx_gk_all_key
               on goalkeepers_all (league_code, season_code, player_id, club);
         """))
+        # Versión de datos (la usa la caché del API para invalidar)
+        conn.execute(text("""
+            create table if not exists data_version (
+              source text primary key,
+              version text not null,
+              updated_at timestamptz not null default now()
+            );
+        """))
 
-    # Buscar archivos *_mv.csv
+    # Buscar archivos *_mv.csv (o los pedidos con --input, p.ej. desde scripts/pipeline.py)
     pattern = os.path.join(DATA_DIR, "join_*_mv.csv")
-    files = sorted(glob.glob(pattern))
+    files = sorted(args.input) if args.input else sorted(glob.glob(pattern))
     if not files:
         print("No encontré archivos con patrón:", pattern)
         sys.exit(0)
@@ -266,6 +319,8 @@ def main():
     print()
 
     # Procesar cada archivo: borrar liga+temporada y subir
+    uploaded = 0
+    failed = []
     for path in files:
         league, season = parse_league_season_from_filename(path)
         if not league:
@@ -277,6 +332,7 @@ def main():
             df = pd.read_csv(path)
         except Exception as e:
             print(f"[{league} {season}] Error leyendo {path}: {e}")
+            failed.append(path)
             continue
 
         df_gk, df_of = clean_and_split(df)
@@ -299,11 +355,22 @@ def main():
                     df_of.to_sql("field_players_all", conn, if_exists="append", index=False, method="multi", chunksize=1000)
 
             print(f"[{league} {season}] OK -> GK={len(df_gk)}  OF={len(df_of)}  ({lname})")
+            uploaded += 1
 
         except Exception as e:
             print(f"[{league} {season}] Error al subir: {e}")
+            failed.append(path)
+
+    if uploaded:
+        # Primero la vista: la versión nueva debe apuntar a datos ya visibles
+        refresh_players_matview(engine)
+        bump_data_version(engine, "players")
 
     print("\nProceso terminado.")
+    if failed:
+        # exit code != 0: scripts/pipeline.py no marca la carga como hecha
+        print(f"Fallaron {len(failed)} archivo(s): {', '.join(os.path.basename(f) for f in failed)}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()